@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from config.database import async_session_scope
+from app.schemas import TopAttributes, VolumeSeries
+from app.dependencies import get_current_user, require_company_id
+from app.services.user_cache import Principal
+from app.services.analytics_service import top_values, daily_volume
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# URL name -> GeneratedDesign attribute
+DIMENSIONS = {
+    "materials": "material",
+    "stones": "stone",
+    "themes": "gem_theme",
+    "styles": "style",
+    "finishes": "finish",
+    "jewelry-types": "jewelry_type",
+}
+
+@router.get("/top/{dimension}", response_model=TopAttributes)
+async def get_top_values(
+    dimension: str,
+    days: int = Query(30, ge=1, le=366),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Most used materials / stones / themes / styles / finishes / jewelry-types of the company.
+    """
+    attribute = DIMENSIONS.get(dimension)
+    if attribute is None:
+        raise HTTPException(status_code=404, detail=f"Unknown dimension. Use one of: {', '.join(DIMENSIONS)}")
+
+    async with async_session_scope() as db:
+        items = await top_values(db, require_company_id(current_user), attribute, days, limit)
+    return {"attribute": attribute, "days": days, "items": items}
+
+@router.get("/volume", response_model=VolumeSeries)
+async def get_volume(
+    days: int = Query(30, ge=1, le=366),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Generated designs per day.
+    """
+    async with async_session_scope() as db:
+        points = await daily_volume(db, require_company_id(current_user), days)
+    return {"days": days, "total": sum(p["count"] for p in points), "points": points}
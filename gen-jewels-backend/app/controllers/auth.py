@@ -1,6 +1,8 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from config.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import get_async_db
 from app.models import User, Company
 from app.schemas import UserCreate, UserLogin, Token
 from app.utils.security import get_hashed_password, verify_password, create_access_token
@@ -8,22 +10,23 @@ from app.utils.security import get_hashed_password, verify_password, create_acce
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 @router.post("/register", response_model=Token)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user exists
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
+    existing_user = (await db.execute(
+        select(User).where(User.username == user_data.username)
+    )).scalar_one_or_none()
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already taken")
 
-    # 1. Create User
+    # 1. Create User (bcrypt is deliberately slow: keep it off the event loop)
     new_user = User(
         username=user_data.username,
-        password_hash=get_hashed_password(user_data.password)
+        password_hash=await asyncio.to_thread(get_hashed_password, user_data.password)
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.flush()
 
-    # 2. Create Company Profile
+    # 2. Create Company Profile (same transaction as the user)
     new_company = Company(
         user_id=new_user.id,
         owner_name=user_data.owner_name,
@@ -32,17 +35,19 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         phone_number=user_data.phone_number
     )
     db.add(new_company)
-    db.commit()
+    await db.commit()
 
     # 3. Generate Token
     access_token = create_access_token(new_user.username)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/login", response_model=Token)
-def login(login_data: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == login_data.username).first()
-    if not user or not verify_password(login_data.password, user.password_hash):
+async def login(login_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(
+        select(User).where(User.username == login_data.username)
+    )).scalar_one_or_none()
+    if not user or not await asyncio.to_thread(verify_password, login_data.password, user.password_hash):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     
     access_token = create_access_token(user.username)
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    return {"access_token": access_token, "token_type": "bearer"}
@@ -1,131 +1,391 @@
+import os
+import json
+import uuid
 import asyncio
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from config.database import get_db
-from app.schemas import DesignRequest, DesignResponse, DesignHistoryItem
-from app.dependencies import get_current_user
-from app.models import User, GeneratedDesign
-from app.services.image_service import sd_service 
-
-# Import services
-from app.services.vision_service import analyze_design_dna
-from app.services.prompt_service import generate_enhanced_prompt, transform_design_prompt
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Header, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, JSONResponse
+from sqlalchemy import select, func, tuple_
+from typing import Optional
+from config.database import async_session_scope
+from config.settings import (
+    UPLOAD_DIR, MAX_VARIATIONS, SEED_RANGE, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE, HISTORY_PREVIEW_CHARS, SIMILAR_TOP_K
+)
+from app.schemas import (
+    DesignRequest, DesignHistoryItem, DesignHistoryPage, DesignDetail, SimilarDesigns,
+    FinalizeRequest, JobResponse, JobStatus
+)
+from app.dependencies import get_current_user, require_company_id
+from app.services.user_cache import Principal
+from app.models import GeneratedDesign
+from app.services.job_service import job_queue, load_job_status
+from app.services.event_bus import event_bus
+from app.services.history_service import history_versions, etag_matches, encode_cursor, decode_cursor
+from app.services.search_service import search_designs, InvalidSearch
+from app.services.similarity_service import vector_index, embed_file, embed_image
+from app.services.image_service import storage_path, random_seed
+from app.services.upload_service import save_upload, load_upload, UploadTooLarge, UnsupportedImage
+from app.services import generation_service  # noqa: F401 (registers job handlers)
 
 router = APIRouter(prefix="/generate", tags=["Jewelry Generation"])
 
-@router.get("/history", response_model=List[DesignHistoryItem])
-def get_user_history(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+@router.get("/history", response_model=DesignHistoryPage)
+async def get_user_history(
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_user),
 ):
-    designs = db.query(GeneratedDesign).filter(
-        GeneratedDesign.user_id == current_user.id
-    ).order_by(GeneratedDesign.created_at.desc()).all()
-    return designs
+    """
+    Newest-first gallery page. Pass next_cursor back as ?cursor= for older designs.
+    Unchanged pages answer 304 from the ETag alone (no database round trip).
+    """
+    etag = history_versions.etag(current_user.id, limit, cursor or "")
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
 
-@router.post("/", response_model=DesignResponse)
+    # 1. Slim projection: no ORM objects, only the first characters of the prompt
+    query = select(
+        GeneratedDesign.id, GeneratedDesign.jewelry_type, GeneratedDesign.material,
+        GeneratedDesign.stone, GeneratedDesign.image_path, GeneratedDesign.render_mode,
+        GeneratedDesign.created_at,
+        func.substr(GeneratedDesign.final_prompt, 1, HISTORY_PREVIEW_CHARS).label("prompt_preview"),
+    ).where(GeneratedDesign.user_id == current_user.id)
+
+    # 2. Keyset pagination on (created_at, id), served by ix_generated_designs_user_created
+    if cursor:
+        try:
+            created_at, design_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(tuple_(GeneratedDesign.created_at, GeneratedDesign.id) < (created_at, design_id))
+    query = query.order_by(GeneratedDesign.created_at.desc(), GeneratedDesign.id.desc()).limit(limit + 1)
+
+    async with async_session_scope() as db:
+        rows = (await db.execute(query)).mappings().all()
+
+    # 3. One extra row tells us whether an older page exists
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+    page = DesignHistoryPage(items=[DesignHistoryItem(**row) for row in rows], next_cursor=next_cursor)
+    return JSONResponse(jsonable_encoder(page), headers=headers)
+
+@router.get("/search", response_model=DesignHistoryPage)
+async def search_user_designs(
+    q: str = Query(..., min_length=1, max_length=200),
+    jewelry_type: Optional[str] = None,
+    style: Optional[str] = None,
+    material: Optional[str] = None,
+    stone: Optional[str] = None,
+    gem_theme: Optional[str] = None,
+    size_category: Optional[str] = None,
+    finish: Optional[str] = None,
+    render_mode: Optional[str] = None,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Full-text search over the prompt and the user's note, best match first,
+    optionally narrowed by the wizard fields. Pass next_cursor back as ?cursor=.
+    """
+    filters = {
+        "jewelry_type": jewelry_type, "style": style, "material": material, "stone": stone,
+        "gem_theme": gem_theme, "size_category": size_category, "finish": finish, "render_mode": render_mode,
+    }
+    try:
+        async with async_session_scope() as db:
+            rows, next_cursor = await search_designs(
+                db, current_user.id, q, filters, limit, cursor, HISTORY_PREVIEW_CHARS
+            )
+    except InvalidSearch as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": rows, "next_cursor": next_cursor}
+
+@router.get("/designs/{design_id}", response_model=DesignDetail)
+async def get_design_detail(
+    design_id: int,
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Full record (complete prompt, all wizard fields) for the gallery modal.
+    Designs never change after insert, so the ETag is stable; it is only
+    honoured once the design is known to belong to the caller.
+    """
+    async with async_session_scope() as db:
+        design = (await db.execute(
+            select(GeneratedDesign).where(
+                GeneratedDesign.id == design_id,
+                GeneratedDesign.user_id == current_user.id
+            )
+        )).scalar_one_or_none()
+        if not design:
+            raise HTTPException(status_code=404, detail="Design not found")
+
+        etag = f'"design-{current_user.id}-{design_id}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        detail = DesignDetail.model_validate(design)
+
+    return JSONResponse(jsonable_encoder(detail), headers=headers)
+
+@router.get("/designs/{design_id}/similar", response_model=SimilarDesigns)
+async def get_similar_designs(
+    design_id: int,
+    k: int = Query(SIMILAR_TOP_K, ge=1, le=100),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    "More like this": the company's designs that look closest to this one
+    (colour, texture and layout), so an existing asset can be reused instead of re-rendered.
+    """
+    company_id = require_company_id(current_user)
+    async with async_session_scope() as db:
+        image_path = (await db.execute(
+            select(GeneratedDesign.image_path).where(
+                GeneratedDesign.id == design_id,
+                GeneratedDesign.user_id == current_user.id
+            )
+        )).scalar_one_or_none()
+    if image_path is None:
+        raise HTTPException(status_code=404, detail="Design not found")
+
+    # Indexed in the background right after saving; embed on the fly if not there yet
+    index = vector_index.company(company_id)
+    query = await asyncio.to_thread(index.vector_of, design_id)
+    if query is None:
+        try:
+            query = await asyncio.to_thread(embed_file, storage_path(image_path))
+        except Exception:
+            raise HTTPException(status_code=404, detail="Design image not found")
+
+    hits = (await asyncio.to_thread(index.search, query, k, {design_id}))[0]
+    return {"items": await _load_similar(current_user.id, hits)}
+
+@router.post("/similar", response_model=SimilarDesigns)
+async def find_similar_designs(
+    image: UploadFile = File(...),
+    k: int = Form(SIMILAR_TOP_K),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    "More like this" for an uploaded photo: check for existing designs before generating.
+    """
+    company_id = require_company_id(current_user)
+    if not 1 <= k <= 100:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 100")
+
+    try:
+        path, _ = await save_upload(image, UPLOAD_DIR, f"similar-{uuid.uuid4()}")
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedImage as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    try:
+        query = await asyncio.to_thread(lambda: embed_image(load_upload(path)))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid image file")
+    finally:
+        os.remove(path)
+
+    hits = (await asyncio.to_thread(vector_index.search, company_id, query, k))[0]
+    return {"items": await _load_similar(current_user.id, hits)}
+
+@router.post("/", response_model=JobResponse, status_code=202)
 async def create_jewelry_design(
     request: DesignRequest, 
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user)
 ):
     print(f"🎨 User {current_user.username} Requesting: {request.jewelry_type}")
-    
-    # 1. Optimize Prompt
-    final_prompt = generate_enhanced_prompt(request.dict())
-    
-    # 2. Generate Image (Background Thread)
-    try:
-        print("⏳ Passing task to background thread...")
-        image_path = await asyncio.to_thread(sd_service.generate, final_prompt)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Image Gen Failed: {str(e)}")
-
-    # 3. Save to DB
-    new_design = GeneratedDesign(
-        user_id=current_user.id,
-        jewelry_type=request.jewelry_type,
-        style=request.style,
-        material=request.material,
-        stone=request.stone,
-        gem_theme=request.theme,
-        size_category=request.size,
-        finish=request.finish,
-        extra_text=request.extra_text,
-        final_prompt=final_prompt,
-        image_path=image_path
-    )
-    db.add(new_design)
-    db.commit()
-
-    return {"image_url": image_path, "final_prompt": final_prompt, "status": "success"}
+
+    if not 1 <= request.num_variations <= MAX_VARIATIONS:
+        raise HTTPException(status_code=400, detail=f"num_variations must be between 1 and {MAX_VARIATIONS}")
+
+    # Unseeded requests get the default seed (identical requests share a render); regenerate
+    # draws a fresh one, kept in the payload so a re-queued job renders the same image
+    payload = request.dict()
+    regenerate = payload.pop("regenerate")
+    if payload["seed"] is None and regenerate:
+        payload["seed"] = random_seed()
+
+    # Prompt + image generation happen in the job worker; the session only lives for the insert
+    async with async_session_scope() as db:
+        job = await job_queue.submit(db, current_user.id, "text", payload)
+        return {"job_id": job.id, "status": job.status}
 
 # --- UPDATED IMAGE-TO-IMAGE ENDPOINT ---
-@router.post("/image-to-image", response_model=DesignResponse)
+@router.post("/image-to-image", response_model=JobResponse, status_code=202)
 async def create_design_variation(
     init_image: UploadFile = File(...), 
     jewelry_type: str = Form(...),
     prompt: Optional[str] = Form(None), # This is the "User Instruction"
     strength: float = Form(0.75),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    seed: Optional[int] = Form(None, ge=0, lt=SEED_RANGE),
+    regenerate: bool = Form(False),  # Fresh random seed: a new image for the same inputs
+    current_user: Principal = Depends(get_current_user)
 ):
+    """
+    Variation of an uploaded piece. The source is letterboxed (never cropped) to 1024x1024,
+    so a tall necklace or a wide bracelet shot keeps the whole design.
+    """
     print(f"🔄 Image-to-Image: {current_user.username} -> {jewelry_type}")
     if prompt:
         print(f"📝 User Instructions: {prompt}")
 
-    # 1. Read Image
+    if not 0.0 < strength <= 1.0:
+        raise HTTPException(status_code=400, detail="strength must be between 0 and 1")
+
+    # 1. Stream the source to disk (size-capped) so the job can be resumed after a restart
+    job_id = str(uuid.uuid4())
     try:
-        image_bytes = await init_image.read()
+        source_path, media_type = await save_upload(init_image, UPLOAD_DIR, job_id)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedImage as e:
+        raise HTTPException(status_code=415, detail=str(e))
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid image file")
 
-    # 2. Extract DNA (Texture/Pattern)
-    print(f"👀 Analyzing Design DNA...")
-    design_dna = analyze_design_dna(image_bytes, media_type=init_image.content_type)
-    
-    if not design_dna or "error" in design_dna.lower():
-        design_dna = f"Texture inspired by {init_image.filename}, organic and detailed pattern"
-    
-    print(f"🧬 Extracted DNA: {design_dna}")
-
-    # 3. Create Prompt (Merging DNA + Target Shape + User Instruction)
-    print("✨ Creating Smart Prompt...")
-    
-    # We now pass the 'prompt' (User Instruction) explicitly as the 3rd argument
-    final_prompt = transform_design_prompt(
-        design_dna=design_dna, 
-        target_type=jewelry_type, 
-        user_instruction=prompt
-    )
-    
-    print(f"🎨 Final Prompt: {final_prompt}")
-
-    # 4. Generate (Background Thread)
-    try:
-        print("⏳ Passing task to background thread...")
-        image_path = await asyncio.to_thread(sd_service.generate, final_prompt)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Gen Failed: {str(e)}")
-
-    # 5. Save
-    extra_text_info = f"Instructions: {prompt}" if prompt else "No extra instructions"
-    
-    new_design = GeneratedDesign(
-        user_id=current_user.id,
-        jewelry_type=jewelry_type,
-        style="Adapted",
-        material="Original",
-        stone="Original",
-        gem_theme="Variation",
-        size_category="Standard",
-        finish="Original",
-        extra_text=f"Variation Source: {extra_text_info}",
-        final_prompt=final_prompt,
-        image_path=image_path
-    )
-    db.add(new_design)
-    db.commit()
-
-    return {"image_url": image_path, "final_prompt": final_prompt, "status": "success"}
\ No newline at end of file
+    # 2. Queue it (DNA extraction, prompt and image generation run in the worker)
+    async with async_session_scope() as db:
+        job = await job_queue.submit(db, current_user.id, "image", {
+            "jewelry_type": jewelry_type,
+            "prompt": prompt,
+            "strength": strength,
+            "seed": random_seed() if seed is None and regenerate else seed,
+            "source_path": source_path,
+            "media_type": media_type,  # Sniffed from the bytes, not the browser's label
+            "filename": init_image.filename,
+        }, job_id=job_id)
+        return {"job_id": job.id, "status": job.status}
+
+@router.post("/designs/{design_id}/finalize", response_model=JobResponse, status_code=202)
+async def finalize_design(
+    design_id: int,
+    request: FinalizeRequest = FinalizeRequest(),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Upgrades a draft to a full-resolution, full-step design with the same prompt and seed.
+    Default (upscale=true): the draft is upscaled to 1024x1024 and refined by image-to-image
+    at SD_FINALIZE_STRENGTH (default 0.55), so the composition the user picked is kept.
+    upscale=false: a fresh text-to-image render at full size, which will not match the draft.
+    """
+    async with async_session_scope() as db:
+        draft = (await db.execute(
+            select(GeneratedDesign).where(
+                GeneratedDesign.id == design_id,
+                GeneratedDesign.user_id == current_user.id
+            )
+        )).scalar_one_or_none()
+        if draft is None:
+            raise HTTPException(status_code=404, detail="Design not found")
+        if draft.render_mode != "draft" or draft.seed is None:
+            raise HTTPException(status_code=400, detail="Only draft designs can be finalized")
+
+        job = await job_queue.submit(db, current_user.id, "finalize", {
+            "design_id": draft.id,
+            "upscale": request.upscale,
+        })
+        return {"job_id": job.id, "status": job.status}
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job_status(
+    job_id: str,
+    current_user: Principal = Depends(get_current_user)
+):
+    status = await load_job_status(job_id, current_user.id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_job(
+    job_id: str,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Server-Sent Events: 'progress' frames (percent, ETA and a low-res preview
+    every few steps) followed by one final 'done' or 'failed' frame.
+    Holds no DB connection while streaming; each status read is its own short session.
+    """
+    if await load_job_status(job_id, current_user.id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        async with event_bus.subscribe(f"job:{job_id}") as queue:
+            # Subscribed first, so a job finishing right now cannot be missed
+            status = await load_job_status(job_id)
+            yield _sse("status", status)
+            if status["status"] in ("done", "failed"):
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if event["type"] in ("done", "failed"):
+                    yield _sse(event["type"], await load_job_status(job_id))
+                    return
+                yield _sse(event["type"], event)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # Don't let proxies/tunnels buffer the stream
+    })
+
+@router.get("/events")
+async def stream_user_events(
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Server-Sent Events for all of the user's jobs: one 'done' or 'failed' frame
+    (the job status) as soon as the result is committed. One long-lived connection
+    per tab replaces polling /generate/jobs/{id}; after (re)connecting, clients
+    re-check a pending job once in case it finished while they were away.
+    """
+    async def events():
+        async with event_bus.subscribe(f"user:{current_user.id}") as queue:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(event["type"], event["job"])
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+async def _load_similar(user_id: int, hits):
+    """
+    Gallery cards for [(design_id, similarity)], in similarity order.
+    """
+    if not hits:
+        return []
+    async with async_session_scope() as db:
+        rows = (await db.execute(
+            select(
+                GeneratedDesign.id, GeneratedDesign.jewelry_type, GeneratedDesign.material,
+                GeneratedDesign.stone, GeneratedDesign.image_path, GeneratedDesign.render_mode,
+                GeneratedDesign.created_at,
+                func.substr(GeneratedDesign.final_prompt, 1, HISTORY_PREVIEW_CHARS).label("prompt_preview"),
+            ).where(GeneratedDesign.id.in_([design_id for design_id, _ in hits]), GeneratedDesign.user_id == user_id)
+        )).mappings().all()
+    by_id = {row["id"]: row for row in rows}
+    return [dict(by_id[design_id], similarity=score) for design_id, score in hits if design_id in by_id]
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends
+from config.database import pool_metrics, async_pool_metrics
+from app.dependencies import get_admin_user
+from app.services.user_cache import Principal, user_cache
+from app.services.image_service import sd_pool
+from app.services.embedding_cache import embedding_cache
+from app.services.llm_router import llm_router
+from app.services.prompt_cache import prompt_cache
+from app.services.dna_cache import dna_cache
+from app.services.similarity_service import vector_index
+
+router = APIRouter(prefix="/system", tags=["System"])
+
+@router.get("/diagnostics")
+def diagnostics(current_user: Principal = Depends(get_admin_user)):
+    """
+    Worker, LLM, cache and DB pool internals for operators.
+    Not part of /health: worker errors and pool stats are not for the public internet.
+    """
+    return {
+        "models": {"state": sd_pool.state, "error": sd_pool.error},
+        "workers": sd_pool.status(),
+        "embedding_cache": embedding_cache.stats(),
+        "prompt_cache": prompt_cache.stats(),
+        "llm": llm_router.stats(),
+        "dna_cache": dna_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "vector_index": vector_index.stats(),
+        "db_pool": {"requests": async_pool_metrics.stats(), "workers": pool_metrics.stats()}
+    }
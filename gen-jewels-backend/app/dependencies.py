@@ -1,14 +1,27 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
-from config.database import get_db
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from config.database import AsyncSessionLocal
+from config.settings import ADMIN_USERNAMES
 from app.utils.security import JWT_SECRET_KEY, ALGORITHM
 from app.models.user import User
+from app.services.user_cache import user_cache, principal_from, Principal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def load_principal(username: str):
+    """
+    Cache miss: user + company, then the session is released straight away.
+    """
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(
+            select(User).options(selectinload(User.company)).where(User.username == username)
+        )).scalar_one_or_none()
+        return principal_from(user) if user else None
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -21,8 +34,30 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-        
-    user = db.query(User).filter(User.username == username).first()
+
+    user = user_cache.get(username)
     if user is None:
+        user = await load_principal(username)
+        if user is None:
+            raise credentials_exception
+        user_cache.put(user)
+
+    if not user.is_active:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user
+
+def require_company_id(user: Principal) -> int:
+    """
+    The caller's company, for company-scoped features (analytics, similarity); 404 without one.
+    """
+    if user.company_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No company profile")
+    return user.company_id
+
+async def get_admin_user(user: Principal = Depends(get_current_user)) -> Principal:
+    """
+    Operators listed in ADMIN_USERNAMES; everyone else gets a 403.
+    """
+    if user.username not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return user
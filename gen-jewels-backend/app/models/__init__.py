@@ -1,3 +1,7 @@
 from .user import User
 from .company import Company
-from .design import GeneratedDesign
\ No newline at end of file
+from .design import GeneratedDesign
+from .job import GenerationJob
+from .prompt_cache import PromptCacheEntry
+from .dna_cache import DNACacheEntry
+from .analytics import DesignRollup
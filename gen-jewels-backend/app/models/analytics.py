@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Index
+from config.database import Base
+
+class DesignRollup(Base):
+    __tablename__ = "design_rollups"
+
+    # One counter per company, UTC day and attribute value, e.g. (7, 2026-10-17, "material", "Gold") -> 12.
+    # attribute "total" (value "") counts every design of the day.
+    company_id = Column(Integer, ForeignKey("companies.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    attribute = Column(String(32), primary_key=True)  # jewelry_type | style | material | stone | gem_theme | finish | total
+    value = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+# Top-N and volume queries: WHERE company_id = ? AND attribute = ? AND day >= ?
+Index("ix_design_rollups_company_attribute_day", DesignRollup.company_id, DesignRollup.attribute, DesignRollup.day)
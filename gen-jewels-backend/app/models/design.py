@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from config.database import Base
@@ -22,8 +22,18 @@ class GeneratedDesign(Base):
     # 2. AI Data
     final_prompt = Column(Text, nullable=False)     # The complex prompt Gemini created
     image_path = Column(String, nullable=False)     # Path on disk
+    seed = Column(Integer, nullable=True)           # Sampler seed (re-render the same image)
+    result_key = Column(String(64), nullable=True, index=True)  # Hash of prompt + render settings (result cache)
+    render_mode = Column(String, nullable=True)     # "draft" (quick preview) or "final"; NULL for older rows
+    source_design_id = Column(Integer, ForeignKey("generated_designs.id"), nullable=True)  # Draft a final was rendered from
     
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
-    creator = relationship("User", back_populates="designs")
\ No newline at end of file
+    creator = relationship("User", back_populates="designs")
+
+# History pages: WHERE user_id = ? ORDER BY created_at DESC, id DESC (keyset cursor)
+Index(
+    "ix_generated_designs_user_created",
+    GeneratedDesign.user_id, GeneratedDesign.created_at.desc(), GeneratedDesign.id.desc()
+)
\ No newline at end of file
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from datetime import datetime
+from config.database import Base
+
+class DNACacheEntry(Base):
+    __tablename__ = "dna_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # 64-bit perceptual hashes of the uploaded image, hex encoded
+    phash = Column(String(16), nullable=False, index=True)
+    dhash = Column(String(16), nullable=False)
+    version = Column(String(64), nullable=False, index=True)  # Which vision prompt/model produced it
+    dna = Column(Text, nullable=False)                         # analyze_design_dna output
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from datetime import datetime
+from config.database import Base
+
+class GenerationJob(Base):
+    __tablename__ = "jobs"
+
+    # UUID string so the frontend can hold on to it across refreshes
+    id = Column(String(36), primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+
+    # 1. What to run
+    kind = Column(String, nullable=False)           # "text" (wizard / artistic) or "image" (image-to-image)
+    payload = Column(Text, nullable=False)          # JSON of the original request fields
+
+    # 2. Lifecycle: queued -> running -> done | failed
+    status = Column(String, nullable=False, default="queued", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+
+    # 3. Result
+    final_prompt = Column(Text, nullable=True)
+    image_path = Column(String, nullable=True)
+    design_id = Column(Integer, ForeignKey("generated_designs.id"), nullable=True)
+    results = Column(Text, nullable=True)          # JSON list of every variation (design_id, image_path, seed)
+    error = Column(Text, nullable=True)
+
+    # 4. Timings
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime, Text
+from datetime import datetime
+from config.database import Base
+
+class PromptCacheEntry(Base):
+    __tablename__ = "prompt_cache"
+
+    # sha256 of (system prompt version, normalized spec, extra_text)
+    key = Column(String(64), primary_key=True)
+    version = Column(String(64), nullable=False, index=True)  # Which system prompt produced it
+    prompt = Column(Text, nullable=False)                      # The enhanced SDXL prompt
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, date
+from config.settings import SEED_RANGE
 
 # 1. Login/Register Schemas
 class UserCreate(BaseModel):
@@ -29,6 +30,10 @@ class DesignRequest(BaseModel):
     size: str           
     finish: str         
     extra_text: Optional[str] = None
+    seed: Optional[int] = Field(None, ge=0, lt=SEED_RANGE)  # Same prompt + seed returns the stored image
+    regenerate: bool = False    # Without a seed: fresh random seed instead of the default (same inputs -> same image)
+    num_variations: int = 1     # Images of the same prompt, each with its own seed
+    draft: bool = False         # Quick low-res render; finalize the one you keep
 
 # 3. Output Schema (Immediate Creation Response)
 class DesignResponse(BaseModel):
@@ -38,13 +43,92 @@ class DesignResponse(BaseModel):
 
 # 4. History Schema (NEW: For the Gallery)
 class DesignHistoryItem(BaseModel):
+    """
+    Slim gallery card: the full prompt is only in DesignDetail.
+    """
     id: int
     jewelry_type: str
     material: str
     stone: str
     image_path: str  # We will map this to image_url in frontend
+    prompt_preview: str
+    render_mode: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True  # Allows Pydantic to read SQLAlchemy models
+
+class DesignHistoryPage(BaseModel):
+    items: List[DesignHistoryItem]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next (older) page
+
+class SimilarDesign(DesignHistoryItem):
+    similarity: float  # Cosine similarity of the visual embeddings (1.0 = identical)
+
+class SimilarDesigns(BaseModel):
+    items: List[SimilarDesign]
+
+class DesignDetail(BaseModel):
+    id: int
+    jewelry_type: str
+    style: str
+    material: str
+    stone: str
+    gem_theme: str
+    size_category: str
+    finish: str
+    extra_text: Optional[str] = None
     final_prompt: str
+    image_path: str
+    seed: Optional[int] = None
+    render_mode: Optional[str] = None
+    source_design_id: Optional[int] = None
     created_at: datetime
 
     class Config:
-        from_attributes = True  # Allows Pydantic to read SQLAlchemy models
\ No newline at end of file
+        from_attributes = True
+
+class FinalizeRequest(BaseModel):
+    upscale: bool = True  # Refine the upscaled draft (keeps its composition); False = fresh full render, which differs from the smaller draft
+
+# 5. Job Schemas (Async Generation Queue)
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+
+class JobVariation(BaseModel):
+    design_id: int
+    image_url: str
+    seed: int
+
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    status: str  # queued | running | done | failed
+    image_url: Optional[str] = None
+    final_prompt: Optional[str] = None
+    design_id: Optional[int] = None
+    variations: List[JobVariation] = []
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+# 6. Analytics Schemas (answered from the design_rollups table)
+class AttributeCount(BaseModel):
+    value: str
+    count: int
+
+class TopAttributes(BaseModel):
+    attribute: str
+    days: int
+    items: List[AttributeCount]
+
+class VolumePoint(BaseModel):
+    day: date
+    count: int
+
+class VolumeSeries(BaseModel):
+    days: int
+    total: int
+    points: List[VolumePoint]  # One per day, oldest first, zero-filled
@@ -0,0 +1,111 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models import Company, GeneratedDesign, DesignRollup
+
+# GeneratedDesign columns rolled up per company/day, plus the "total" counter
+ROLLUP_ATTRIBUTES = ["jewelry_type", "style", "material", "stone", "gem_theme", "finish"]
+TOTAL = "total"
+
+def _rollup_counts(rows) -> Counter:
+    """
+    rows: (company_id, created_at, *ROLLUP_ATTRIBUTES) -> {(company_id, day, attribute, value): n}
+    """
+    counts = Counter()
+    for company_id, created_at, *values in rows:
+        day = created_at.date()
+        counts[(company_id, day, TOTAL, "")] += 1
+        for attribute, value in zip(ROLLUP_ATTRIBUTES, values):
+            counts[(company_id, day, attribute, value or "")] += 1
+    return counts
+
+def _upsert(db, counts: Counter):
+    """
+    Adds the counts to existing rollup rows (atomic increment, safe across workers).
+    """
+    if not counts:
+        return
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(DesignRollup).values([
+        {"company_id": c, "day": d, "attribute": a, "value": v, "count": n}
+        for (c, d, a, v), n in counts.items()
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["company_id", "day", "attribute", "value"],
+        set_={"count": DesignRollup.count + stmt.excluded.count},
+    ))
+
+def record_designs(db, designs: list):
+    """
+    Counts freshly inserted designs. Called inside the insert's transaction,
+    so the rollups can never drift from generated_designs.
+    """
+    company_ids = dict(db.execute(
+        select(Company.user_id, Company.id).where(Company.user_id.in_({d.user_id for d in designs}))
+    ).all())
+    _upsert(db, _rollup_counts(
+        (company_ids[d.user_id], d.created_at, *(getattr(d, a) for a in ROLLUP_ATTRIBUTES))
+        for d in designs if d.user_id in company_ids
+    ))
+
+def rebuild_rollups(db, batch_size: int = 5000) -> int:
+    """
+    Batch compactor: recomputes every rollup from generated_designs (backfill after
+    an upgrade, or repair). Streams the designs in id order. Returns the design count.
+    """
+    db.execute(delete(DesignRollup))
+    query = select(
+        Company.id, GeneratedDesign.created_at, *(getattr(GeneratedDesign, a) for a in ROLLUP_ATTRIBUTES)
+    ).join(Company, Company.user_id == GeneratedDesign.user_id).order_by(GeneratedDesign.id)
+
+    total = 0
+    for batch in db.execute(query.execution_options(yield_per=batch_size)).partitions():
+        _upsert(db, _rollup_counts(batch))
+        total += len(batch)
+    return total
+
+def backfill_rollups(db) -> int:
+    """
+    Startup hook: rebuilds only when the rollups are empty but designs exist.
+    """
+    if db.execute(select(DesignRollup.company_id).limit(1)).first():
+        return 0
+    if not db.execute(select(GeneratedDesign.id).limit(1)).first():
+        return 0
+    return rebuild_rollups(db)
+
+def since(days: int) -> date:
+    """
+    First UTC day of a `days`-long window ending today (rollup days are UTC, like created_at).
+    """
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+async def top_values(db, company_id: int, attribute: str, days: int, limit: int):
+    """
+    Most frequent values of one attribute over the last `days` days: reads at most
+    days x distinct-values rollup rows, independent of how many designs exist.
+    """
+    total = func.sum(DesignRollup.count).label("count")
+    rows = (await db.execute(
+        select(DesignRollup.value, total).where(
+            DesignRollup.company_id == company_id,
+            DesignRollup.attribute == attribute,
+            DesignRollup.day >= since(days),
+        ).group_by(DesignRollup.value).order_by(total.desc(), DesignRollup.value).limit(limit)
+    )).all()
+    return [{"value": value, "count": count} for value, count in rows]
+
+async def daily_volume(db, company_id: int, days: int):
+    """
+    Designs per day over the last `days` days (oldest first, zero-filled).
+    """
+    start = since(days)
+    counts = dict((await db.execute(
+        select(DesignRollup.day, DesignRollup.count).where(
+            DesignRollup.company_id == company_id,
+            DesignRollup.attribute == TOTAL,
+            DesignRollup.day >= start,
+        )
+    )).all())
+    return [{"day": start + timedelta(days=i), "count": counts.get(start + timedelta(days=i), 0)} for i in range(days)]
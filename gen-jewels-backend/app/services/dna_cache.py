@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import numpy as np
+from PIL import Image
+from sqlalchemy import update
+from config.database import SessionLocal
+from config.settings import DNA_HASH_MAX_DISTANCE, DNA_CACHE_SIZE
+from app.models import DNACacheEntry
+
+# ─── Perceptual hashes (numpy only) ───
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """
+    Orthonormal DCT-II basis, so the 2D DCT of X is C @ X @ C.T.
+    """
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+DCT_32 = _dct_matrix(32)
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int("".join("1" if b else "0" for b in bits.flatten()), 2)
+
+def phash(image: Image.Image) -> int:
+    """
+    64-bit pHash: low-frequency 8x8 DCT block of a 32x32 grayscale, thresholded at its median.
+    Robust to rescaling, recompression and mild colour/brightness changes.
+    """
+    pixels = np.asarray(image.convert("L").resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    block = (DCT_32 @ pixels @ DCT_32.T)[:8, :8]
+    median = np.median(block.flatten()[1:])  # DC term excluded: it is just the mean brightness
+    return _bits_to_int(block > median)
+
+def dhash(image: Image.Image) -> int:
+    """
+    64-bit dHash: sign of horizontal gradients on a 9x8 grayscale.
+    """
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+def perceptual_hash(image: Image.Image):
+    """
+    (phash, dhash) of a decoded upload. Cheap: both work on tiny thumbnails.
+    """
+    return phash(image), dhash(image)
+
+# Popcount of every byte value, for vectorized Hamming distances on uint64 arrays
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def hamming(hashes: np.ndarray, value: int) -> np.ndarray:
+    xor = np.bitwise_xor(hashes, np.uint64(value))
+    return POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+class DNACache:
+    """
+    Design DNA keyed by perceptual hash, persisted in the 'dna_cache' table.
+    The hashes are mirrored in numpy arrays so a lookup is one XOR/popcount pass;
+    an entry matches when pHash + dHash differ by at most DNA_HASH_MAX_DISTANCE bits,
+    so re-saved, resized or lightly edited copies of an image hit too.
+    """
+    def __init__(self, max_distance: int = DNA_HASH_MAX_DISTANCE, max_entries: int = DNA_CACHE_SIZE):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.version = None
+        self.ids = []
+        self.dna = []
+        self.phashes = np.zeros(0, dtype=np.uint64)
+        self.dhashes = np.zeros(0, dtype=np.uint64)
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, version: str):
+        """
+        (Re)loads the newest entries for this vision prompt version.
+        """
+        db = SessionLocal()
+        try:
+            rows = db.query(DNACacheEntry).filter(DNACacheEntry.version == version) \
+                .order_by(DNACacheEntry.id.desc()).limit(self.max_entries).all()
+        finally:
+            db.close()
+        rows.reverse()
+        with self.lock:
+            self.version = version
+            self.ids = [row.id for row in rows]
+            self.dna = [row.dna for row in rows]
+            self.phashes = np.array([int(row.phash, 16) for row in rows], dtype=np.uint64)
+            self.dhashes = np.array([int(row.dhash, 16) for row in rows], dtype=np.uint64)
+
+    def _find(self, image_hash, version: str):
+        if self.version != version:
+            self._load(version)
+
+        with self.lock:
+            if not self.ids:
+                return None
+            distance = hamming(self.phashes, image_hash[0]) + hamming(self.dhashes, image_hash[1])
+            best = int(np.argmin(distance))
+            if distance[best] > self.max_distance:
+                return None
+            entry_id, dna = self.ids[best], self.dna[best]
+
+        db = SessionLocal()
+        try:
+            db.execute(update(DNACacheEntry).where(DNACacheEntry.id == entry_id)
+                       .values(hits=DNACacheEntry.hits + 1))
+            db.commit()
+        finally:
+            db.close()
+        return dna
+
+    def _store(self, image_hash, version: str, dna: str):
+        db = SessionLocal()
+        try:
+            entry = DNACacheEntry(
+                phash=f"{image_hash[0]:016x}", dhash=f"{image_hash[1]:016x}",
+                version=version, dna=dna,
+            )
+            db.add(entry)
+            db.commit()
+            entry_id = entry.id
+        finally:
+            db.close()
+
+        with self.lock:
+            if self.version != version:
+                return  # Loaded lazily on the next lookup
+            self.ids.append(entry_id)
+            self.dna.append(dna)
+            self.phashes = np.append(self.phashes, np.uint64(image_hash[0]))[-self.max_entries:]
+            self.dhashes = np.append(self.dhashes, np.uint64(image_hash[1]))[-self.max_entries:]
+            self.ids, self.dna = self.ids[-self.max_entries:], self.dna[-self.max_entries:]
+
+    async def get(self, image_hash, version: str):
+        try:
+            dna = await asyncio.to_thread(self._find, image_hash, version)
+        except Exception as e:
+            print(f"⚠️ DNA Cache Read Error: {e}")
+            dna = None
+        with self.lock:
+            if dna is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return dna
+
+    async def put(self, image_hash, version: str, dna: str):
+        try:
+            await asyncio.to_thread(self._store, image_hash, version, dna)
+        except Exception as e:
+            print(f"⚠️ DNA Cache Write Error: {e}")
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"entries": len(self.ids), "hits": self.hits, "misses": self.misses}
+
+# Singleton Instance
+dna_cache = DNACache()
@@ -0,0 +1,185 @@
+import cv2
+import numpy as np
+from PIL import Image
+
+# Local, CPU-only "Design DNA": a few milliseconds on a 256 px thumbnail.
+# Used when Groq is unavailable (instead of a canned string) and to ground the
+# remote vision output in measured colour/structure facts.
+
+ANALYSIS_SIDE = 256
+PALETTE_CLUSTERS = 5
+MIN_PALETTE_SHARE = 0.08
+
+# Reference colours (sRGB) -> material names understood by transform_design_prompt
+MATERIAL_COLOURS = {
+    "18k yellow gold": ("metal", (212, 175, 55)),
+    "rose gold": ("metal", (183, 110, 121)),
+    "polished silver": ("metal", (200, 200, 205)),
+    "platinum": ("metal", (229, 228, 226)),
+    "oxidized silver": ("metal", (95, 95, 100)),
+    "antique bronze": ("metal", (140, 100, 50)),
+    "copper": ("metal", (184, 115, 51)),
+    "ruby": ("stone", (155, 17, 30)),
+    "emerald": ("stone", (30, 140, 80)),
+    "sapphire": ("stone", (20, 50, 150)),
+    "amethyst": ("stone", (120, 70, 160)),
+    "turquoise": ("stone", (64, 190, 190)),
+    "black onyx": ("stone", (25, 25, 28)),
+    "pearl": ("stone", (236, 228, 210)),
+    "diamond": ("stone", (245, 247, 250)),
+}
+
+_NAMES = list(MATERIAL_COLOURS)
+_REFERENCE_LAB = cv2.cvtColor(
+    np.array([[rgb for _, rgb in MATERIAL_COLOURS.values()]], dtype=np.uint8), cv2.COLOR_RGB2LAB
+)[0].astype(np.float32)
+
+def foreground_mask(lab: np.ndarray) -> np.ndarray:
+    """
+    Pixels that differ from the border colour (product shots sit on a plain backdrop).
+    Falls back to every pixel when the subject fills the frame.
+    """
+    border = np.concatenate([lab[:4].reshape(-1, 3), lab[-4:].reshape(-1, 3),
+                             lab[:, :4].reshape(-1, 3), lab[:, -4:].reshape(-1, 3)])
+    backdrop = np.median(border, axis=0)
+    mask = np.linalg.norm(lab - backdrop, axis=2) > 12
+    return mask if mask.mean() > 0.1 else np.ones(mask.shape, dtype=bool)
+
+def _palette(lab: np.ndarray, mask: np.ndarray):
+    """
+    Dominant colours (k-means in Lab) mapped to the nearest metal/stone name, largest share first.
+    """
+    pixels = lab[mask].reshape(-1, 3).astype(np.float32)
+    if len(pixels) > 4096:
+        pixels = pixels[np.linspace(0, len(pixels) - 1, 4096).astype(int)]
+    k = min(PALETTE_CLUSTERS, len(pixels))
+    cv2.setRNGSeed(0)  # Same image -> same DNA
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
+    _, labels, centers = cv2.kmeans(pixels, k, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+
+    shares = {}
+    counts = np.bincount(labels.flatten(), minlength=k) / len(labels)
+    for center, share in zip(centers, counts):
+        name = _NAMES[int(np.argmin(np.linalg.norm(_REFERENCE_LAB - center, axis=1)))]
+        shares[name] = shares.get(name, 0.0) + float(share)
+    return sorted(((n, s) for n, s in shares.items() if s >= MIN_PALETTE_SHARE), key=lambda x: -x[1])
+
+def _orientation(gray: np.ndarray):
+    """
+    Dominant edge direction and coherence (0 = multi-directional, 1 = perfectly parallel),
+    from the gradient structure tensor.
+    """
+    gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    jxx, jyy, jxy = float((gx * gx).sum()), float((gy * gy).sum()), float((gx * gy).sum())
+    total = jxx + jyy
+    if total == 0:
+        return "none", 0.0
+    coherence = np.sqrt((jxx - jyy) ** 2 + 4 * jxy ** 2) / total
+    # Edges run perpendicular to the mean gradient
+    angle = (np.degrees(0.5 * np.arctan2(2 * jxy, jxx - jyy)) + 90) % 180
+    if angle < 22.5 or angle >= 157.5:
+        direction = "horizontal"
+    elif 67.5 <= angle < 112.5:
+        direction = "vertical"
+    else:
+        direction = "diagonal"
+    return direction, float(coherence)
+
+def _symmetry(gray: np.ndarray) -> dict:
+    small = cv2.resize(gray, (128, 128), interpolation=cv2.INTER_AREA).astype(np.float32)
+    score = lambda other: 1.0 - float(np.abs(small - other).mean()) / 255.0
+    return {
+        "left-right": score(small[:, ::-1]),
+        "top-bottom": score(small[::-1, :]),
+        "radial": score(small[::-1, ::-1]),
+    }
+
+def extract_design_features(image: Image.Image) -> dict:
+    """
+    Measured colour/structure facts for a decoded (RGB) upload.
+    """
+    rgb = np.asarray(image.convert("RGB"))
+    scale = ANALYSIS_SIDE / max(rgb.shape[:2])
+    if scale < 1:
+        rgb = cv2.resize(rgb, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    lab = cv2.cvtColor(rgb, cv2.COLOR_RGB2LAB)
+    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    mask = foreground_mask(lab)
+
+    edges = cv2.Canny(gray, 60, 160)
+    direction, coherence = _orientation(gray)
+    laplacian = np.abs(cv2.Laplacian(gray, cv2.CV_32F))
+
+    return {
+        "palette": _palette(lab, mask),
+        "edge_density": float((edges[mask] > 0).mean()),
+        "edge_direction": direction,
+        "edge_coherence": coherence,
+        "texture_energy": float(laplacian[mask].mean()),
+        "symmetry": _symmetry(gray),
+    }
+
+def _describe(features: dict) -> dict:
+    palette = features["palette"]
+    metals = [n for n, _ in palette if MATERIAL_COLOURS[n][0] == "metal"]
+    stones = [n for n, _ in palette if MATERIAL_COLOURS[n][0] == "stone"]
+    colours = ", ".join(f"{name} {share:.0%}" for name, share in palette) or "neutral tones"
+
+    density, coherence = features["edge_density"], features["edge_coherence"]
+    if density < 0.04:
+        edges = "clean sculpted silhouette, soft beveled edges"
+    elif coherence > 0.35:
+        edges = f"dense parallel {features['edge_direction']} linework, translate into fine wire-work or vein engraving"
+    else:
+        edges = "intricate multi-directional detailing, translate into filigree"
+
+    energy = features["texture_energy"]
+    if energy < 4:
+        tactility = "smooth high-polish surface"
+    elif energy < 10:
+        tactility = "fine engraved texture"
+    else:
+        tactility = "deeply textured relief, hammered or carved"
+
+    best_axis, best_score = max(features["symmetry"].items(), key=lambda x: x[1])
+    if best_score > 0.92:
+        symmetry = f"strong {best_axis} symmetry"
+    elif best_score > 0.85:
+        symmetry = f"moderate {best_axis} symmetry"
+    else:
+        symmetry = "asymmetric, organic layout"
+
+    return {
+        "colours": colours,
+        "metal": metals[0] if metals else "18k yellow gold",
+        "stones": ", ".join(stones),
+        "edges": edges,
+        "tactility": tactility,
+        "symmetry": symmetry,
+    }
+
+def format_design_dna(features: dict) -> str:
+    """
+    Full DNA in the same sections the vision model returns, for transform_design_prompt.
+    """
+    d = _describe(features)
+    stones = f"{d['stones']} accents" if d["stones"] else "pure metalwork"
+    return (
+        "[PHYSICAL TOPOGRAPHY]\n"
+        f"Palette: {d['colours']}.\n"
+        f"Surface DNA: {d['tactility']}, {d['symmetry']}.\n"
+        f"Edge Detail: {d['edges']}.\n"
+        f"Materials: {d['metal']}, {stones}.\n"
+        "[JEWELRY DESIGN PROMPT]\n"
+        f"A jewelry piece in {d['metal']}, featuring {d['tactility']} and {d['edges']}, "
+        f"{d['symmetry']}, {stones}, isolated on a white studio background, 8k resolution, macro photography."
+    )
+
+def summarize_design_dna(features: dict) -> str:
+    """
+    One line of measured facts appended to the remote vision output.
+    """
+    d = _describe(features)
+    return f"[MEASURED] Palette: {d['colours']}; {d['tactility']}; {d['edges'].split(',')[0]}; {d['symmetry']}."
@@ -0,0 +1,71 @@
+import threading
+from collections import OrderedDict
+from config.settings import SD_EMBED_CACHE_MB
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    CLIP lower-cases and collapses whitespace anyway, so these variants encode identically.
+    """
+    return " ".join(prompt.split()).lower()
+
+class PromptEmbeddingCache:
+    """
+    LRU cache of SDXL text-encoder outputs, bounded by a byte budget.
+    Entries are (prompt_embeds, negative_prompt_embeds, pooled_prompt_embeds,
+    negative_pooled_prompt_embeds) for a single prompt, kept on CPU.
+    """
+    def __init__(self, max_mb: int = SD_EMBED_CACHE_MB):
+        self.max_bytes = max_mb * 1024 * 1024
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(prompt: str, model_id: str, do_cfg: bool) -> tuple:
+        return (model_id, do_cfg, normalize_prompt(prompt))
+
+    def get(self, key: tuple):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, entry: tuple):
+        size = sum(t.element_size() * t.nelement() for t in entry if t is not None)
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.sizes[key]
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self.sizes[key] = size
+            self.bytes += size
+
+            # Evict least recently used until we fit the budget
+            while self.bytes > self.max_bytes:
+                old_key, _ = self.entries.popitem(last=False)
+                self.bytes -= self.sizes.pop(old_key)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+# Singleton Instance (shared by every SDXL worker)
+embedding_cache = PromptEmbeddingCache()
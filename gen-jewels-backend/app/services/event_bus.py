@@ -0,0 +1,50 @@
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+class EventBus:
+    """
+    In-process topic pub/sub.
+    publish() is safe from any thread (SDXL dispatcher, job workers);
+    subscribers are asyncio queues living on the event loop.
+    Events are plain dicts and topics plain strings ("job:{id}", "user:{id}"),
+    so a local broker (e.g. Redis pub/sub) can replace this class behind the same methods.
+    """
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.subscribers = defaultdict(set)  # topic -> {(loop, queue)}
+        self.lock = threading.Lock()
+
+    @asynccontextmanager
+    async def subscribe(self, topic: str):
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self.lock:
+            self.subscribers[topic].add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self.lock:
+                self.subscribers[topic].discard(entry)
+                if not self.subscribers[topic]:
+                    del self.subscribers[topic]
+
+    def has_subscribers(self, topic: str) -> bool:
+        with self.lock:
+            return bool(self.subscribers.get(topic))
+
+    def publish(self, topic: str, event: dict):
+        with self.lock:
+            subscribers = list(self.subscribers.get(topic, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._offer, queue, event)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: dict):
+        # Slow consumer: drop the oldest event rather than block the publisher
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+# Singleton Instance
+event_bus = EventBus()
@@ -0,0 +1,268 @@
+import os
+import asyncio
+from PIL import Image
+from config.database import session_scope
+from app.models import GeneratedDesign
+from config.settings import SD_FINALIZE_STRENGTH, SEED_RANGE
+from app.services.image_service import (
+    sd_pool, prepare_init_image, default_seed, storage_path, FULL_RENDER, DRAFT_RENDER
+)
+from app.services.vision_service import analyze_design_dna, VISION_TYPES
+from app.services.upload_service import load_upload, vision_payload
+from app.services.dna_cache import perceptual_hash
+from app.services.dna_features import extract_design_features
+from app.services.prompt_service import generate_enhanced_prompt, transform_design_prompt
+from app.services.job_service import job_queue, complete_job
+from app.services.event_bus import event_bus
+from app.services.history_service import history_versions
+from app.services.analytics_service import record_designs
+from app.services.similarity_service import vector_index
+
+# Job handlers are coroutines on the event loop: LLM calls are awaited,
+# while SDXL, disk and DB work is pushed to threads with asyncio.to_thread.
+
+def job_progress(job_id: str):
+    """
+    Forwards pipeline step events to /generate/jobs/{id}/stream listeners.
+    """
+    return lambda event: event_bus.publish(f"job:{job_id}", event)
+
+def variation_progress(job_id: str):
+    """
+    Same as job_progress, tagging each event with its variation index.
+    """
+    return lambda index, event: event_bus.publish(f"job:{job_id}", dict(event, variation=index))
+
+def save_designs(job_id: str, final_prompt: str, designs: list):
+    """
+    Inserts the designs and marks the job done in one transaction.
+    """
+    user_id = designs[0].user_id
+    with session_scope() as db:
+        db.add_all(designs)
+        db.flush()
+        record_designs(db, designs)
+        complete_job(db, job_id, final_prompt, designs)
+        indexed = [(d.id, d.image_path) for d in designs]
+    # After the commit: a client that sees the new ETag must also see the rows
+    history_versions.bump(user_id)
+    # Visual embeddings are computed in the background ("more like this")
+    vector_index.schedule(user_id, indexed)
+
+def load_init_image(path: str):
+    with Image.open(path) as source:
+        return prepare_init_image(source)
+
+def prepare_source(path: str):
+    """
+    Decodes the upload once and derives everything the image job needs from it:
+    compact vision payload, perceptual hash, local DNA features and the img2img source.
+    """
+    source = load_upload(path)
+    vision_bytes, vision_type = vision_payload(source)
+    return vision_bytes, vision_type, perceptual_hash(source), extract_design_features(source), prepare_init_image(source)
+
+def read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def variation_seeds(base_seed: int, count: int) -> list:
+    """
+    Consecutive seeds from base_seed, wrapping inside SEED_RANGE (the seed column is a signed INTEGER).
+    """
+    return [(base_seed + i) % SEED_RANGE for i in range(count)]
+
+async def run_text_job(job_id: str, user_id: int, data: dict):
+    """
+    Wizard / Artistic Concept generation.
+    num_variations > 1 renders several seeds of the same prompt in one batched call.
+    draft=True renders quickly at reduced size; see run_finalize_job for the keeper.
+    """
+    # 1. Optimize Prompt (once, shared by every variation)
+    final_prompt = await generate_enhanced_prompt(data)
+
+    # 2. Generate Images (or reuse identical renders: same inputs -> same default seed)
+    render_mode = "draft" if data.get("draft") else "final"
+    render = DRAFT_RENDER if render_mode == "draft" else FULL_RENDER
+    base_seed = data.get("seed")
+    if base_seed is None:
+        base_seed = default_seed(final_prompt, render)
+    seeds = variation_seeds(base_seed, data.get("num_variations") or 1)
+
+    results = await asyncio.to_thread(
+        sd_pool.generate_variations,
+        final_prompt,
+        seeds,
+        on_progress=variation_progress(job_id),
+        render=render,
+    )
+
+    # 3. Save every design + job result in one transaction
+    designs = [
+        GeneratedDesign(
+            user_id=user_id,
+            jewelry_type=data["jewelry_type"],
+            style=data["style"],
+            material=data["material"],
+            stone=data["stone"],
+            gem_theme=data["theme"],
+            size_category=data["size"],
+            finish=data["finish"],
+            extra_text=data.get("extra_text"),
+            final_prompt=final_prompt,
+            image_path=result.image_path,
+            seed=result.seed,
+            result_key=result.result_key,
+            render_mode=render_mode
+        )
+        for result in results
+    ]
+    await asyncio.to_thread(save_designs, job_id, final_prompt, designs)
+
+async def run_image_job(job_id: str, user_id: int, data: dict):
+    """
+    Image-to-Image variation.
+    The upload was spooled to disk at submit time so the job survives a restart.
+    """
+    jewelry_type = data["jewelry_type"]
+    prompt = data.get("prompt")
+
+    # 1. Decode once (the full decode is not held across the LLM calls)
+    try:
+        vision_bytes, vision_type, image_hash, features, init_image = await asyncio.to_thread(
+            prepare_source, data["source_path"]
+        )
+    except Exception as e:
+        # Formats Pillow can't decode still get a text-only variation from the DNA
+        print(f"⚠️ Could not decode source image, falling back to text-to-image: {e}")
+        init_image, image_hash, features = None, None, None
+        vision_bytes, vision_type = None, data.get("media_type")
+        if vision_type in VISION_TYPES:
+            # The vision API may still read what Pillow can't
+            vision_bytes = await asyncio.to_thread(read_bytes, data["source_path"])
+
+    # 2. Extract DNA (Texture/Pattern)
+    print(f"👀 Analyzing Design DNA...")
+    design_dna = None
+    if vision_bytes:
+        design_dna = await analyze_design_dna(
+            vision_bytes, media_type=vision_type, image_hash=image_hash, features=features
+        )
+
+    if not design_dna or "error" in design_dna.lower():
+        design_dna = f"Texture inspired by {data.get('filename')}, organic and detailed pattern"
+
+    print(f"🧬 Extracted DNA: {design_dna}")
+
+    # 3. Create Prompt (Merging DNA + Target Shape + User Instruction)
+    final_prompt = await transform_design_prompt(
+        design_dna=design_dna,
+        target_type=jewelry_type,
+        user_instruction=prompt
+    )
+
+    print(f"🎨 Final Prompt: {final_prompt}")
+
+    # 4. Generate from the uploaded image itself (or reuse an identical render)
+    result = await asyncio.to_thread(
+        sd_pool.generate,
+        final_prompt,
+        seed=data.get("seed"),
+        on_progress=job_progress(job_id),
+        init_image=init_image,
+        strength=data.get("strength", 0.75),
+    )
+
+    # 5. Save design + job result together
+    extra_text_info = f"Instructions: {prompt}" if prompt else "No extra instructions"
+
+    new_design = GeneratedDesign(
+        user_id=user_id,
+        jewelry_type=jewelry_type,
+        style="Adapted",
+        material="Original",
+        stone="Original",
+        gem_theme="Variation",
+        size_category="Standard",
+        finish="Original",
+        extra_text=f"Variation Source: {extra_text_info}",
+        final_prompt=final_prompt,
+        image_path=result.image_path,
+        seed=result.seed,
+        result_key=result.result_key,
+        render_mode="final"
+    )
+    await asyncio.to_thread(save_designs, job_id, final_prompt, [new_design])
+
+    # 6. Source image is no longer needed
+    discard_source(data)
+
+def discard_source(data: dict):
+    """
+    Removes an image job's upload (after success, or via the queue once the job failed).
+    """
+    try:
+        os.remove(data["source_path"])
+    except OSError:
+        pass
+
+def load_draft(user_id: int, design_id: int) -> GeneratedDesign:
+    with session_scope() as db:
+        draft = db.query(GeneratedDesign).filter(
+            GeneratedDesign.id == design_id,
+            GeneratedDesign.user_id == user_id
+        ).first()
+        if draft is None:
+            raise ValueError("Draft design not found")
+        db.expunge(draft)
+        return draft
+
+async def run_finalize_job(job_id: str, user_id: int, data: dict):
+    """
+    Renders a chosen draft at full resolution and steps, from the same prompt and seed.
+    By default the draft itself is upscaled and refined through image-to-image, which keeps
+    its composition; upscale=False renders from scratch (the seed alone gives a different
+    composition at full size).
+    """
+    # 1. Load the draft
+    draft = await asyncio.to_thread(load_draft, user_id, data["design_id"])
+
+    # 2. Full render (or upscale pass over the draft)
+    init_image = None
+    if data.get("upscale", True):
+        init_image = await asyncio.to_thread(load_init_image, storage_path(draft.image_path))
+
+    result = await asyncio.to_thread(
+        sd_pool.generate,
+        draft.final_prompt,
+        seed=draft.seed,
+        on_progress=job_progress(job_id),
+        init_image=init_image,
+        strength=SD_FINALIZE_STRENGTH if init_image is not None else None,
+        render=FULL_RENDER,
+    )
+
+    # 3. Save the final design + job result together
+    new_design = GeneratedDesign(
+        user_id=user_id,
+        jewelry_type=draft.jewelry_type,
+        style=draft.style,
+        material=draft.material,
+        stone=draft.stone,
+        gem_theme=draft.gem_theme,
+        size_category=draft.size_category,
+        finish=draft.finish,
+        extra_text=draft.extra_text,
+        final_prompt=draft.final_prompt,
+        image_path=result.image_path,
+        seed=result.seed,
+        result_key=result.result_key,
+        render_mode="final",
+        source_design_id=draft.id
+    )
+    await asyncio.to_thread(save_designs, job_id, draft.final_prompt, [new_design])
+
+# Register handlers with the queue
+job_queue.register("text", run_text_job)
+job_queue.register("image", run_image_job, cleanup=discard_source)
+job_queue.register("finalize", run_finalize_job)
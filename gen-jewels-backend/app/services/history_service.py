@@ -0,0 +1,48 @@
+import base64
+import threading
+import uuid
+from datetime import datetime
+
+class HistoryVersions:
+    """
+    Per-user history version for ETags: bumped after every committed design insert,
+    so an unchanged gallery is answered with 304 without touching the database.
+    The process epoch makes tags from before a restart (or from another worker) never match.
+    """
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.versions = {}  # user_id -> counter
+        self.lock = threading.Lock()
+
+    def bump(self, user_id: int):
+        with self.lock:
+            self.versions[user_id] = self.versions.get(user_id, 0) + 1
+
+    def etag(self, user_id: int, *parts) -> str:
+        with self.lock:
+            version = self.versions.get(user_id, 0)
+        return '"' + "-".join(str(p) for p in (self.epoch, user_id, version) + parts) + '"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def encode_cursor(created_at: datetime, design_id: int) -> str:
+    """
+    Opaque keyset cursor: position of the last item on a page.
+    """
+    raw = f"{created_at.isoformat()}|{design_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """
+    Returns (created_at, id); raises ValueError on a malformed cursor.
+    """
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    created_at, design_id = raw.split("|")
+    return datetime.fromisoformat(created_at), int(design_id)
+
+# Singleton Instance
+history_versions = HistoryVersions()
@@ -1,10 +1,28 @@
+import hashlib
 import os
+import queue
+import secrets
+import threading
+import time
+import numpy as np
 import torch
 import uuid
+from collections import deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
 from diffusers import (
     DiffusionPipeline, 
+    AutoPipelineForImage2Image,
     DPMSolverMultistepScheduler
 )
+from PIL import Image, ImageOps
+from config.settings import (
+    SD_BATCH_WINDOW_MS, SD_MAX_BATCH, SD_PREVIEW_EVERY,
+    SD_DEVICES, SD_CPU_OFFLOAD, SD_WORKER_MAX_FAILURES, SD_WORKER_COOLDOWN_SECONDS,
+    SD_DRAFT_STEPS, SD_DRAFT_SIZE, SEED_RANGE
+)
+from app.services.embedding_cache import embedding_cache
+from app.services.result_cache import ResultCache, make_result_key
+from app.services.preview_service import latent_preview
 
 # --- Configuration ---
 MODEL_CACHE = r"D:\ramesh\text jewelry\models_cache"
@@ -13,39 +31,206 @@ BASE_MODEL = "stabilityai/stable-diffusion-xl-base-1.0"
 LORA_PATH = r"D:\ramesh\text jewelry\fine tune\jewelry_lora\pytorch_lora_weights.safetensors"
 STORAGE_DIR = r"D:\ramesh\genjewels\gen-jewels-backend\storage\generated_image"
 
+# Render Settings (all part of the result cache key)
+N_STEPS = 40  # Standard SDXL steps
+GUIDANCE_SCALE = 7.0
+SCHEDULER_ID = "DPMSolverMultistep/dpmsolver++/karras"
+
+SDXL_RESOLUTION = (1024, 1024)  # Native size; img2img sources are letterboxed to it
+
+# Full render vs. quick draft (a chosen draft is upscaled and refined with FULL_RENDER)
+RenderSettings = namedtuple("RenderSettings", ["steps", "width", "height"])
+FULL_RENDER = RenderSettings(N_STEPS, *SDXL_RESOLUTION)
+DRAFT_RENDER = RenderSettings(SD_DRAFT_STEPS, SD_DRAFT_SIZE, SD_DRAFT_SIZE)
+WARMUP_RENDER = RenderSettings(1, *SDXL_RESOLUTION)  # Full size, so warmup allocates what real traffic needs
+
+GenerationResult = namedtuple("GenerationResult", ["image_path", "seed", "result_key"])
+
+def model_identity() -> str:
+    """
+    Base model + LoRA file version. Changes whenever the LoRA is retrained.
+    """
+    if os.path.exists(LORA_PATH):
+        return f"{BASE_MODEL}|{LORA_PATH}|{os.path.getmtime(LORA_PATH)}"
+    return BASE_MODEL
+
+def prepare_init_image(image: Image.Image) -> Image.Image:
+    """
+    Upright RGB, letterboxed to SDXL resolution (so img2img items can share a batch).
+    Nothing is cropped: a tall or wide photo keeps the whole piece, and the bars take the
+    photo's own backdrop colour (median of its border) so the model does not draw them.
+    """
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    pixels = np.asarray(image)
+    border = np.concatenate([pixels[0], pixels[-1], pixels[:, 0], pixels[:, -1]])
+    backdrop = tuple(int(c) for c in np.median(border, axis=0))
+    return ImageOps.pad(image, SDXL_RESOLUTION, Image.LANCZOS, color=backdrop)
+
+def image_digest(image: Image.Image) -> str:
+    return hashlib.sha256(image.tobytes()).hexdigest()
+
+def storage_path(image_path: str) -> str:
+    """
+    Absolute path on disk for a stored 'storage/generated_image/...' path.
+    """
+    return os.path.join(STORAGE_DIR, os.path.basename(image_path))
+
+def render_params(render: RenderSettings) -> dict:
+    """
+    Pipeline parameters for a render; they are the batch key, so only equal settings share a call.
+    """
+    return {
+        "num_inference_steps": render.steps,
+        "guidance_scale": GUIDANCE_SCALE,
+        "width": render.width,
+        "height": render.height,
+    }
+
+def default_seed(prompt: str, render: RenderSettings) -> int:
+    """
+    Seed derived from the prompt and render settings, so identical unseeded requests
+    share one render (stored result or the one in flight).
+    """
+    identity = f"{prompt.strip()}|{render.steps}|{render.width}x{render.height}"
+    return int(hashlib.sha256(identity.encode("utf-8")).hexdigest()[:8], 16) % SEED_RANGE
+
+def random_seed() -> int:
+    """
+    Fresh seed for an explicit "regenerate" (a new image for the same inputs).
+    """
+    return secrets.randbelow(SEED_RANGE)
+
+class BatchScheduler:
+    """
+    Coalesces concurrent generate() calls into one batched pipeline call.
+    Callers block on a Future; a single dispatcher thread owns the pipeline.
+    """
+    def __init__(self, run_batch, window_ms: int = SD_BATCH_WINDOW_MS, max_batch: int = SD_MAX_BATCH):
+        self.run_batch = run_batch
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.queue = queue.Queue()
+        self.carry = deque()  # Items pulled while collecting a batch they could not join
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, prompt: str, seed: int, on_progress=None, image=None, **params) -> Future:
+        self._ensure_started()
+        future = Future()
+        self.queue.put({
+            "prompt": prompt,
+            "seed": seed,
+            "params": params,
+            "key": tuple(sorted(params.items())),  # Only identical settings can share a call
+            "on_progress": on_progress,            # Optional per-item step callback (live previews)
+            "image": image,                        # img2img source (mode="img2img")
+            "future": future,
+        })
+        return future
+
+    def _ensure_started(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, name="sdxl-batcher", daemon=True)
+                self.thread.start()
+
+    def _next(self, timeout=None):
+        if self.carry:
+            return self.carry.popleft()
+        return self.queue.get(timeout=timeout)
+
+    def _collect(self):
+        # 1. Block until there is work
+        first = self._next()
+        batch = [first]
+        skipped = []
+
+        # 2. Gather compatible requests inside the window
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                # After the window closes, still sweep up anything already waiting
+                item = self._next(timeout=max(remaining, 0.001))
+            except queue.Empty:
+                break
+            if item["key"] == first["key"]:
+                batch.append(item)
+            else:
+                skipped.append(item)
+
+        self.carry.extend(skipped)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            try:
+                images = self.run_batch(batch)
+                for item, image in zip(batch, images):
+                    item["future"].set_result(image)
+            except Exception as e:
+                for item in batch:
+                    if not item["future"].done():
+                        item["future"].set_exception(e)
+
 class SDXLService:
-    def __init__(self):
+    """
+    One pipeline pinned to one device, with its own batcher.
+    """
+    def __init__(self, device: str = "cuda:0"):
+        self.device = device
         self.pipe = None
+        self.img2img = None  # Same weights as self.pipe, image-to-image entry point
+        self.model_id = None  # Base model + LoRA identity, part of the embedding cache key
+        self.load_lock = threading.Lock()
+        self.batcher = BatchScheduler(self._run_batch)
+
+        # Health (read by SDXLWorkerPool)
+        self.in_flight = 0
+        self.failures = 0
+        self.restarts = 0
+        self.retry_at = 0.0  # While unhealthy: when the cooldown ends and one probe batch may run
+        self.last_error = None
 
     def load_models(self):
         """
         Loads models with 'Fast Math' and Memory Optimizations.
+        Safe to call from several threads: only the first one loads, the rest wait.
         """
         if self.pipe is not None:
             return
 
-        print("⚡ Loading SDXL Base Model (Structure Builder)...")
-        self.pipe = DiffusionPipeline.from_pretrained(
+        with self.load_lock:
+            if self.pipe is not None:
+                return
+            self._load_models()
+
+    def _load_models(self):
+        print(f"⚡ Loading SDXL Base Model (Structure Builder) on {self.device}...")
+        on_cpu = self.device.startswith("cpu")
+        pipe = DiffusionPipeline.from_pretrained(
             BASE_MODEL,
             cache_dir=MODEL_CACHE,
-            torch_dtype=torch.float16,
+            torch_dtype=torch.float32 if on_cpu else torch.float16, # fp16 kernels are GPU-only
             variant="fp16",
             use_safetensors=True,
             local_files_only=False, # Allow download if missing
         )
 
         # 1. OPTIMIZATION: Use Fast Math (DPM++ 2M Karras) for the Base
-        self.pipe.scheduler = DPMSolverMultistepScheduler.from_config(
-            self.pipe.scheduler.config,
+        pipe.scheduler = DPMSolverMultistepScheduler.from_config(
+            pipe.scheduler.config,
             use_karras_sigmas=True,
             algorithm_type="dpmsolver++"
         )
 
         # 2. Load LoRA
+        self.model_id = model_identity()
         if os.path.exists(LORA_PATH):
             print(f"✅ Loading LoRA: {os.path.basename(LORA_PATH)}")
             try:
-                self.pipe.load_lora_weights(
+                pipe.load_lora_weights(
                     LORA_PATH,
                     adapter_name="jewelry"
                 )
@@ -54,40 +239,206 @@ class SDXLService:
         else:
             print(f"⚠️ LoRA not found at {LORA_PATH}")
 
-        # 3. OPTIMIZATION: Smart CPU Offload (Saves VRAM)
-        self.pipe.enable_model_cpu_offload()
+        # 3. OPTIMIZATION: Smart CPU Offload (Saves VRAM) or pin to the worker's device
+        if SD_CPU_OFFLOAD and not on_cpu:
+            gpu_id = int(self.device.split(":")[1]) if ":" in self.device else 0
+            pipe.enable_model_cpu_offload(gpu_id=gpu_id)
+        else:
+            pipe.to(self.device)
 
         # 4. OPTIMIZATION: xFormers (Speed Boost)
         try:
-            self.pipe.enable_xformers_memory_efficient_attention()
+            pipe.enable_xformers_memory_efficient_attention()
             print("✅ xFormers enabled.")
         except Exception as e:
             print(f"⚠️ Could not enable xFormers: {e}")
 
-        print("✅ Single-Stage AI Pipeline Ready.")
+        # 5. Image-to-Image view over the same components (no extra weights or VRAM)
+        self.img2img = AutoPipelineForImage2Image.from_pipe(pipe)
+
+        # Publish only once fully configured (load_models() checks it without the lock)
+        self.pipe = pipe
+        print(f"✅ Single-Stage AI Pipeline Ready ({self.device}).")
 
-    def generate(self, prompt: str) -> str:
+    def warmup(self):
         """
-        Generates an image using ONLY the Base Model (No Refiner).
+        Loads the pipeline and runs one 1-step render through the batcher,
+        so CUDA kernels and offload hooks are initialised before real traffic.
+        """
+        self.load_models()
+        self.batcher.submit("gold ring", 0, **render_params(WARMUP_RENDER)).result()
+        print(f"🔥 Warmup complete ({self.device}).")
+
+    def restart(self):
+        """
+        Drops the pipeline so the next batch reloads it from scratch.
+        The worker stays unhealthy (no traffic) for SD_WORKER_COOLDOWN_SECONDS;
+        only a successful batch afterwards resets its failure count.
+        """
+        print(f"♻️ Restarting SDXL worker on {self.device}...")
+        self.pipe = None
+        self.img2img = None
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        self.restarts += 1
+        self.retry_at = time.monotonic() + SD_WORKER_COOLDOWN_SECONDS
+
+    @property
+    def healthy(self) -> bool:
+        """
+        False after SD_WORKER_MAX_FAILURES consecutive failures until the cooldown ends;
+        then the next batch is the probe (a failure restarts the cooldown).
+        """
+        return self.failures < SD_WORKER_MAX_FAILURES or time.monotonic() >= self.retry_at
+
+    def _run_batch(self, batch: list) -> list:
+        """
+        Runs one pipeline call for a whole batch (dispatcher thread only).
+        Every item keeps its own generator so results match a solo run with that seed.
         """
+        try:
+            images = self._call_pipe(batch)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"❌ SDXL worker {self.device} failed ({self.failures}x): {e}")
+            if self.failures >= SD_WORKER_MAX_FAILURES:
+                self.restart()
+            raise
+        self.failures = 0
+        return images
+
+    def _call_pipe(self, batch: list) -> list:
         if not self.pipe:
             self.load_models()
 
-        # Standard SDXL steps
-        n_steps = 40 
+        params = batch[0]["params"]
+        prompts = [item["prompt"] for item in batch]
+        generators = [torch.Generator(device="cpu").manual_seed(item["seed"]) for item in batch]
+
+        print(f"🎨 Generating batch of {len(batch)}: {prompts[0][:50]}...")
+
+        prompt_embeds, negative_embeds, pooled_embeds, negative_pooled_embeds = self._encode(
+            prompts, do_cfg=params["guidance_scale"] > 1
+        )
+
+        pipe = self.pipe
+        total_steps = params["num_inference_steps"]
+        extra = {}
+
+        # Image-to-Image only denoises the last 'strength' fraction of the schedule
+        if params.get("mode") == "img2img":
+            pipe = self.img2img
+            extra["image"] = [item["image"] for item in batch]
+            extra["strength"] = params["strength"]
+            total_steps = max(1, min(int(total_steps * params["strength"]), total_steps))
 
-        print(f"🎨 Generating: {prompt[:50]}...")
+        # Live previews only cost anything when somebody is listening
+        if any(item["on_progress"] for item in batch):
+            extra["callback_on_step_end"] = self._progress_callback(batch, total_steps)
+            extra["callback_on_step_end_tensor_inputs"] = ["latents"]
 
         # --- CRITICAL FIXES HERE ---
         # 1. output_type="pil" (Gives a real image, not latents)
         # 2. denoising_end=None (Does the full 100% generation)
-        image = self.pipe(
-            prompt=prompt,
-            num_inference_steps=n_steps,
-            guidance_scale=7.0,
+        return pipe(
+            prompt_embeds=prompt_embeds,
+            negative_prompt_embeds=negative_embeds,
+            pooled_prompt_embeds=pooled_embeds,
+            negative_pooled_prompt_embeds=negative_pooled_embeds,
+            generator=generators,
+            num_inference_steps=params["num_inference_steps"],
+            guidance_scale=params["guidance_scale"],
+            width=params["width"],
+            height=params["height"],
             denoising_end=None, # Full generation
             output_type="pil",  # Real Image
-        ).images[0]
+            **extra,
+        ).images
+
+    def _progress_callback(self, batch: list, total_steps: int):
+        """
+        Step-end hook: progress + ETA every step, a cheap latent preview every SD_PREVIEW_EVERY steps.
+        """
+        started = time.monotonic()
+
+        def callback(pipe, step, timestep, callback_kwargs):
+            done = step + 1
+            elapsed = time.monotonic() - started
+            event = {
+                "type": "progress",
+                "step": done,
+                "total": total_steps,
+                "percent": round(100 * done / total_steps, 1),
+                "eta_seconds": round(elapsed / done * (total_steps - done), 1),
+            }
+            with_preview = done % SD_PREVIEW_EVERY == 0 and done < total_steps
+            latents = callback_kwargs["latents"]
+
+            for i, item in enumerate(batch):
+                if not item["on_progress"]:
+                    continue
+                try:
+                    item_event = dict(event, preview=latent_preview(latents[i])) if with_preview else event
+                    item["on_progress"](item_event)
+                except Exception as e:
+                    print(f"⚠️ Preview Error: {e}")
+            return callback_kwargs
+
+        return callback
+
+    def _encode(self, prompts: list, do_cfg: bool) -> list:
+        """
+        Text-encoder outputs for a batch, served from the embedding cache where possible.
+        Only cache misses run the encoders (so offload never moves them to the GPU on a full hit),
+        and a prompt repeated across the batch (variations) is encoded once.
+        """
+        keys = [embedding_cache.make_key(p, self.model_id, do_cfg) for p in prompts]
+        prompt_for = dict(zip(keys, prompts))
+        found = {key: embedding_cache.get(key) for key in prompt_for}
+        missing = [key for key, entry in found.items() if entry is None]
+
+        if missing:
+            with torch.no_grad():
+                encoded = self.pipe.encode_prompt(
+                    prompt=[prompt_for[key] for key in missing],
+                    device=self.pipe._execution_device,
+                    num_images_per_prompt=1,
+                    do_classifier_free_guidance=do_cfg,
+                )
+            for row, key in enumerate(missing):
+                entry = tuple(
+                    t[row:row + 1].detach().to("cpu") if t is not None else None
+                    for t in encoded
+                )
+                embedding_cache.put(key, entry)
+                found[key] = entry
+
+        entries = [found[key] for key in keys]
+        device = self.pipe._execution_device
+        return [
+            torch.cat([entry[k] for entry in entries]).to(device) if entries[0][k] is not None else None
+            for k in range(4)
+        ]
+
+    def generate(self, prompt: str, seed: int, on_progress=None, init_image=None, strength=None,
+                 render: RenderSettings = FULL_RENDER) -> str:
+        """
+        Generates an image using ONLY the Base Model (No Refiner).
+        With init_image, runs image-to-image at the given strength instead.
+        Blocks the calling thread; concurrent callers are batched together.
+        """
+        params = render_params(render)
+        if init_image is not None:
+            params.update(mode="img2img", strength=strength)
+
+        image = self.batcher.submit(
+            prompt,
+            seed,
+            on_progress=on_progress,
+            image=init_image,
+            **params,
+        ).result()
 
         # 3. Save Image
         os.makedirs(STORAGE_DIR, exist_ok=True)
@@ -100,5 +451,112 @@ class SDXLService:
         # Return path relative to project root
         return f"storage/generated_image/{filename}"
 
+class SDXLWorkerPool:
+    """
+    One SDXLService per configured device (SD_DEVICES).
+    Each request goes to the healthy worker with the fewest images in flight.
+    """
+    def __init__(self, devices: list = SD_DEVICES):
+        self.workers = [SDXLService(device) for device in devices]
+        self.results = ResultCache(STORAGE_DIR)
+        self.lock = threading.Lock()
+        self.state = "cold"  # cold -> warming -> ready | failed ("lazy" when SD_WARMUP is off)
+        self.error = None
+
+    def warmup(self):
+        """
+        Warms every worker in parallel (one device does not wait for another).
+        Requests that arrive meanwhile simply queue in the workers' batchers.
+        """
+        self.state = "warming"
+        errors = []
+
+        def warm(worker):
+            try:
+                worker.warmup()
+            except Exception as e:
+                errors.append(f"{worker.device}: {e}")
+
+        threads = [threading.Thread(target=warm, args=(w,), daemon=True) for w in self.workers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        if len(errors) == len(self.workers):
+            self.state = "failed"
+            self.error = "; ".join(errors)
+            print(f"❌ SDXL Warmup Failed: {self.error}")
+        else:
+            self.state = "ready"
+            self.error = "; ".join(errors) or None
+
+    def _acquire(self) -> SDXLService:
+        with self.lock:
+            candidates = [w for w in self.workers if w.healthy] or self.workers
+            worker = min(candidates, key=lambda w: w.in_flight)
+            worker.in_flight += 1
+            return worker
+
+    def _release(self, worker: SDXLService):
+        with self.lock:
+            worker.in_flight -= 1
+
+    def generate(self, prompt: str, seed: int = None, on_progress=None,
+                 init_image: Image.Image = None, strength: float = None,
+                 render: RenderSettings = FULL_RENDER) -> GenerationResult:
+        """
+        Identical (prompt, seed, settings) requests reuse the stored image or
+        wait on the render already in progress; without a seed the default_seed is used.
+        on_progress(event) receives step progress and previews (see SDXLService._progress_callback).
+        init_image (already passed through prepare_init_image) switches to image-to-image.
+        """
+        if seed is None:
+            seed = default_seed(prompt, render)
+        source = (image_digest(init_image), strength) if init_image is not None else None
+        key = make_result_key(
+            prompt, seed, render.steps, GUIDANCE_SCALE, SCHEDULER_ID, model_identity(), source,
+            size=(render.width, render.height)
+        )
+
+        def run():
+            worker = self._acquire()
+            try:
+                return worker.generate(prompt, seed, on_progress, init_image, strength, render)
+            finally:
+                self._release(worker)
+
+        image_path = self.results.get_or_run(key, run)
+        return GenerationResult(image_path, seed, key)
+
+    def generate_variations(self, prompt: str, seeds: list, on_progress=None,
+                            render: RenderSettings = FULL_RENDER) -> list:
+        """
+        Several seeds of one prompt, submitted together so the batcher runs them
+        as a single pipeline call with the prompt encoded once.
+        on_progress(index, event) tells the variations apart.
+        """
+        def one(index, seed):
+            progress = (lambda event: on_progress(index, event)) if on_progress else None
+            return self.generate(prompt, seed=seed, on_progress=progress, render=render)
+
+        with ThreadPoolExecutor(max_workers=len(seeds)) as executor:
+            futures = [executor.submit(one, i, seed) for i, seed in enumerate(seeds)]
+            return [f.result() for f in futures]
+
+    def status(self) -> list:
+        return [
+            {
+                "device": w.device,
+                "loaded": w.pipe is not None,
+                "healthy": w.healthy,
+                "failures": w.failures,
+                "in_flight": w.in_flight,
+                "restarts": w.restarts,
+                "last_error": w.last_error,
+            }
+            for w in self.workers
+        ]
+
 # Singleton Instance
-sd_service = SDXLService()
\ No newline at end of file
+sd_pool = SDXLWorkerPool()
\ No newline at end of file
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from typing import Callable, Dict
+from sqlalchemy import select
+from config.database import async_session_scope
+from config.settings import JOB_WORKERS, JOB_MAX_ATTEMPTS
+from app.models import GenerationJob
+from app.services.event_bus import event_bus
+
+class JobQueue:
+    """
+    Persisted generation queue.
+    Every job is a row in the 'jobs' table, so a restart simply re-queues
+    whatever was still 'queued' or 'running' when the process died, unless it
+    has already been started JOB_MAX_ATTEMPTS times (it probably killed the process).
+    """
+    def __init__(self, workers: int = JOB_WORKERS, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.handlers: Dict[str, Callable] = {}
+        self.cleanups: Dict[str, Callable] = {}
+        self.queue = None
+        self.tasks = []
+
+    def register(self, kind: str, handler: Callable, cleanup: Callable = None):
+        """
+        handler(job_id, user_id, payload) is a coroutine. It must keep blocking
+        work (SDXL, DB) off the event loop with asyncio.to_thread, open its own
+        DB sessions and record the result with complete_job().
+        cleanup(payload), if given, releases the job's resources (e.g. uploaded files)
+        once it has failed for good; on success the handler does it itself.
+        """
+        self.handlers[kind] = handler
+        if cleanup:
+            self.cleanups[kind] = cleanup
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+
+        # 1. Recover unfinished jobs from the last run
+        async with async_session_scope() as db:
+            pending = (await db.execute(
+                select(GenerationJob).where(
+                    GenerationJob.status.in_(["queued", "running"])
+                ).order_by(GenerationJob.created_at.asc())
+            )).scalars().all()
+            abandoned = []
+            for job in pending:
+                if job.status == "running" and (job.attempts or 0) >= self.max_attempts:
+                    job.status = "failed"
+                    job.error = f"Gave up after {job.attempts} attempts (the server stopped while running it)"
+                    job.finished_at = datetime.utcnow()
+                    abandoned.append((job.kind, json.loads(job.payload)))
+                    continue
+                job.status = "queued"
+                job.started_at = None
+                self.queue.put_nowait(job.id)
+            if pending:
+                print(f"♻️ Re-queued {len(pending) - len(abandoned)} unfinished job(s), failed {len(abandoned)}.")
+        for kind, payload in abandoned:
+            self._cleanup(kind, payload)
+
+        # 2. Start workers
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"✅ Job Queue Ready ({self.workers} worker(s)).")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def submit(self, db, user_id: int, kind: str, payload: dict, job_id: str = None) -> GenerationJob:
+        """
+        Records the job (db is an AsyncSession) and hands it to the workers. Returns immediately.
+        """
+        job = GenerationJob(
+            id=job_id or str(uuid.uuid4()),
+            user_id=user_id,
+            kind=kind,
+            payload=json.dumps(payload),
+            status="queued",
+        )
+        db.add(job)
+        await db.commit()
+
+        self.queue.put_nowait(job.id)
+        return job
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"❌ Job Worker Error ({job_id}): {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job_id: str):
+        # 1. Claim the job (the session is closed before the long-running handler starts)
+        async with async_session_scope() as db:
+            job = await db.get(GenerationJob, job_id)
+            if job is None or job.status != "queued":
+                return
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            job.attempts = (job.attempts or 0) + 1
+            kind, user_id, payload = job.kind, job.user_id, json.loads(job.payload)
+        event_bus.publish(f"job:{job_id}", {"type": "running"})
+
+        # 2. Run it
+        print(f"⏳ Running job {job_id} ({kind})...")
+        try:
+            handler = self.handlers[kind]
+            await handler(job_id, user_id, payload)
+        except Exception as e:
+            print(f"❌ Job {job_id} failed: {e}")
+            await self._mark_failed(job_id, str(e))
+            self._cleanup(kind, payload)
+            event_bus.publish(f"job:{job_id}", {"type": "failed", "error": str(e)})
+            await self._notify_user(user_id, job_id, "failed")
+            return
+        print(f"✅ Job {job_id} done.")
+        event_bus.publish(f"job:{job_id}", {"type": "done"})
+        await self._notify_user(user_id, job_id, "done")
+
+    async def _notify_user(self, user_id: int, job_id: str, event_type: str):
+        """
+        Pushes the committed job status to the user's /generate/events listeners.
+        Loaded once per job (not per listener), and not at all when nobody is connected.
+        """
+        topic = f"user:{user_id}"
+        if not event_bus.has_subscribers(topic):
+            return
+        try:
+            status = await load_job_status(job_id)
+        except Exception as e:
+            print(f"⚠️ Job Notify Error ({job_id}): {e}")
+            return
+        if status:
+            event_bus.publish(topic, {"type": event_type, "job": status})
+
+    def _cleanup(self, kind: str, payload: dict):
+        cleanup = self.cleanups.get(kind)
+        if cleanup is None:
+            return
+        try:
+            cleanup(payload)
+        except Exception as e:
+            print(f"⚠️ Job Cleanup Error ({kind}): {e}")
+
+    async def _mark_failed(self, job_id: str, error: str):
+        async with async_session_scope() as db:
+            job = await db.get(GenerationJob, job_id)
+            if job:
+                job.status = "failed"
+                job.error = error
+                job.finished_at = datetime.utcnow()
+
+def job_status(job: GenerationJob) -> dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "image_url": job.image_path,
+        "final_prompt": job.final_prompt,
+        "design_id": job.design_id,
+        "variations": json.loads(job.results) if job.results else [],
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+async def load_job_status(job_id: str, user_id: int = None):
+    """
+    The job as returned by the API (None if missing or, with user_id, not theirs).
+    """
+    async with async_session_scope() as db:
+        query = select(GenerationJob).where(GenerationJob.id == job_id)
+        if user_id is not None:
+            query = query.where(GenerationJob.user_id == user_id)
+        job = (await db.execute(query)).scalar_one_or_none()
+        return job_status(job) if job else None
+
+def complete_job(db, job_id: str, final_prompt: str, designs: list):
+    """
+    Marks a job as done. Handlers call this before committing, so the
+    design rows and the job result land in the same transaction.
+    The first design is the job's headline result.
+    """
+    job = db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+    job.status = "done"
+    job.final_prompt = final_prompt
+    job.image_path = designs[0].image_path
+    job.design_id = designs[0].id
+    job.results = json.dumps([
+        {"design_id": d.id, "image_url": d.image_path, "seed": d.seed} for d in designs
+    ])
+    job.finished_at = datetime.utcnow()
+
+# Singleton Instance
+job_queue = JobQueue()
@@ -0,0 +1,108 @@
+import os
+import random
+import asyncio
+import httpx
+from dotenv import load_dotenv
+from config.settings import (
+    GROQ_BASE_URL, LLM_TIMEOUT_SECONDS, LLM_CONNECT_TIMEOUT_SECONDS,
+    LLM_MAX_RETRIES, LLM_RETRY_BASE_SECONDS, LLM_MAX_CONNECTIONS
+)
+
+# Load API Key
+load_dotenv()
+api_key = os.getenv("GROQ_API_KEY")
+
+if not api_key:
+    load_dotenv(dotenv_path="../.env")
+    api_key = os.getenv("GROQ_API_KEY")
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+class LLMError(Exception):
+    pass
+
+class LLMUnavailable(LLMError):
+    """
+    Timeouts, connection errors and 429/5xx after retries: the model is unhealthy,
+    not the request. Only these count against a model's circuit breaker.
+    """
+    pass
+
+class LLMClient:
+    """
+    Shared async client for Groq's OpenAI-compatible chat API.
+    One pooled httpx connection set for the whole process, explicit timeouts,
+    and bounded retries with full jitter. Never blocks the event loop.
+    """
+    def __init__(self, api_key: str = api_key, base_url: str = GROQ_BASE_URL):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.client = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    def open(self):
+        """
+        Builds the connection pool up front (loading SSL certs takes ~150 ms of
+        blocking work, which should not land inside a request).
+        """
+        self._get_client()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                ),
+            )
+        return self.client
+
+    async def chat(self, model: str, messages: list, temperature: float = 0.3, max_tokens: int = 150,
+                   max_retries: int = LLM_MAX_RETRIES) -> str:
+        """
+        Returns the first choice's message content. Raises LLMUnavailable once retries are spent.
+        """
+        if not self.enabled:
+            raise LLMError("GROQ_API_KEY is not configured")
+
+        body = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+
+        last_error = None
+        for attempt in range(max_retries + 1):
+            if attempt:
+                # Full jitter: spread retries so a Groq hiccup doesn't cause a thundering herd
+                await asyncio.sleep(random.uniform(0, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+            try:
+                response = await self._get_client().post("/chat/completions", json=body)
+            except httpx.TransportError as e:  # Timeouts, refused/reset connections
+                last_error = f"{type(e).__name__}: {e}"
+                continue
+
+            if response.status_code in RETRY_STATUS:
+                last_error = f"HTTP {response.status_code}: {response.text[:200]}"
+                continue
+            if response.status_code >= 400:
+                raise LLMError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+            return response.json()["choices"][0]["message"]["content"]
+
+        raise LLMUnavailable(f"{model} failed after {max_retries + 1} attempts ({last_error})")
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+# Singleton Instance (replaces the per-module Groq clients)
+llm_client = LLMClient()
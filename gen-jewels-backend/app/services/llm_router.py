@@ -0,0 +1,257 @@
+import time
+import asyncio
+from collections import deque
+from config.settings import (
+    LLM_MODELS, LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS, LLM_HEDGE,
+    LLM_HEDGE_MIN_SECONDS, LLM_HEDGE_DEFAULT_SECONDS, LLM_LATENCY_WINDOW,
+    LLM_ROUTE_BIAS, LLM_TIMEOUT_SECONDS, LLM_MAX_RETRIES
+)
+from app.services.llm_client import llm_client, LLMError, LLMUnavailable
+
+class CircuitOpenError(LLMUnavailable):
+    """
+    Every candidate model's breaker is open: fail fast instead of waiting on the network.
+    """
+    pass
+
+class CircuitBreaker:
+    """
+    closed -> (N consecutive failures) -> open -> (reset time) -> half_open (one probe)
+    A successful probe closes the breaker, a failed one re-opens it.
+    All methods run on the event loop, so no locking is needed.
+    """
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.probing)
+
+    def acquire(self) -> bool:
+        """
+        Claims permission for one call. In half_open only a single probe gets through.
+        """
+        if not self.available():
+            return False
+        if self.state == "half_open":
+            self.probing = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()  # (Re-)open: a failed probe restarts the wait
+
+    def release(self):
+        """
+        Call was abandoned (lost a hedge race) without a verdict.
+        """
+        self.probing = False
+
+class LatencyWindow:
+    """
+    Last N call durations for one model. Cancelled hedge losers are recorded
+    with their elapsed time, a lower bound that still teaches the router they were slow.
+    """
+    def __init__(self, size: int = LLM_LATENCY_WINDOW):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class LLMRouter:
+    """
+    Resilience layer over LLMClient for models that can stand in for each other:
+    - per-model circuit breakers (fail fast while open),
+    - latency-aware ordering (preferred model first unless another is clearly faster),
+    - hedging: if the first call outlives its model's p95, the next model is raced against it.
+    """
+    def __init__(self, client=llm_client, models: list = LLM_MODELS, hedge: bool = LLM_HEDGE,
+                 hedge_min_seconds: float = LLM_HEDGE_MIN_SECONDS,
+                 hedge_default_seconds: float = LLM_HEDGE_DEFAULT_SECONDS,
+                 failure_threshold: int = LLM_BREAKER_FAILURES,
+                 reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        self.client = client
+        self.models = list(models)
+        self.hedge = hedge
+        self.hedge_min_seconds = hedge_min_seconds
+        self.hedge_default_seconds = hedge_default_seconds
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.breakers = {}
+        self.latency = {}
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.client.enabled
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        if model not in self.breakers:
+            self.breakers[model] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+        return self.breakers[model]
+
+    def _window(self, model: str) -> LatencyWindow:
+        if model not in self.latency:
+            self.latency[model] = LatencyWindow()
+        return self.latency[model]
+
+    def hedge_delay(self, model: str) -> float:
+        window = self._window(model)
+        if len(window.samples) < 5:
+            return self.hedge_default_seconds
+        p95 = window.percentile(0.95)
+        return min(max(p95, self.hedge_min_seconds), LLM_TIMEOUT_SECONDS)
+
+    def route(self, models: list) -> list:
+        """
+        Models with an available breaker, fastest (median) first.
+        The first entry is the caller's preference and keeps its place unless
+        another model's median is below LLM_ROUTE_BIAS of its own.
+        """
+        candidates = [m for m in models if self._breaker(m).available()]
+
+        def score(model):
+            median = self._window(model).percentile(0.5)
+            if median is None:
+                median = self.hedge_default_seconds  # Unmeasured: assume typical
+            return median * (LLM_ROUTE_BIAS if model == models[0] else 1.0)
+
+        return sorted(candidates, key=score)
+
+    async def _attempt(self, model: str, max_retries: int, **kwargs) -> str:
+        breaker = self._breaker(model)
+        started = time.monotonic()
+        try:
+            content = await self.client.chat(model=model, max_retries=max_retries, **kwargs)
+        except asyncio.CancelledError:
+            self._window(model).add(time.monotonic() - started)
+            breaker.release()
+            raise
+        except LLMUnavailable:
+            breaker.record_failure()
+            raise
+        except Exception:
+            breaker.release()  # Bad request/response: not the model's health
+            raise
+        self._window(model).add(time.monotonic() - started)
+        breaker.record_success()
+        return content
+
+    async def chat(self, messages: list, prefer: str = None, models: list = None,
+                   temperature: float = 0.3, max_tokens: int = 150) -> str:
+        """
+        Drop-in for LLMClient.chat across several models.
+        prefer: the caller's usual model (tried first unless clearly slower).
+        models: restricts the candidates (e.g. vision-capable models only).
+        Raises CircuitOpenError immediately when no model is available.
+        """
+        models = list(models or self.models)
+        if prefer:
+            models = [prefer] + [m for m in models if m != prefer]
+        order = self.route(models)
+        if not order:
+            raise CircuitOpenError(f"All breakers open for {models}")
+
+        kwargs = {"messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+        pending = {}   # task -> model
+        errors = []
+        hedged = False
+
+        def launch():
+            while order:
+                model = order.pop(0)
+                if not self._breaker(model).acquire():
+                    continue
+                # Failing over replaces retrying; only the last candidate retries
+                retries = LLM_MAX_RETRIES if not order else 0
+                pending[asyncio.create_task(self._attempt(model, retries, **kwargs))] = model
+                return model
+            return None
+
+        current = launch()
+        if current is None:
+            raise CircuitOpenError(f"All breakers open for {models}")
+
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and not hedged and order:
+                    timeout = self.hedge_delay(current)
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Slower than this model's p95: race the next model against it
+                    hedged = True
+                    if launch() is not None:
+                        self.hedges_fired += 1
+                        print(f"⏱️ LLM hedge: {current} > {timeout:.2f}s, racing next model")
+                    continue
+
+                winner = None
+                for task in done:
+                    model = pending.pop(task)
+                    if task.exception() is None:
+                        winner = winner or (model, task.result())
+                    else:
+                        errors.append((model, task.exception()))
+                if winner:
+                    if hedged and winner[0] != current:
+                        self.hedges_won += 1
+                    return winner[1]
+
+                if not pending:
+                    current = launch()  # Sequential failover after an error
+        finally:
+            for task in pending:
+                task.cancel()
+
+        message = "; ".join(f"{model}: {error}" for model, error in errors)
+        if all(isinstance(error, LLMUnavailable) for _, error in errors):
+            raise LLMUnavailable(message)
+        raise LLMError(message)
+
+    def stats(self) -> dict:
+        return {
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "models": {
+                model: {
+                    "breaker": self._breaker(model).state,
+                    "failures": self._breaker(model).failures,
+                    "p50_ms": round((self._window(model).percentile(0.5) or 0) * 1000),
+                    "p95_ms": round((self._window(model).percentile(0.95) or 0) * 1000),
+                    "samples": len(self._window(model).samples),
+                }
+                for model in sorted(set(self.models) | set(self.breakers))
+            },
+        }
+
+# Singleton Instance
+llm_router = LLMRouter()
@@ -0,0 +1,29 @@
+import base64
+import io
+import torch
+from PIL import Image
+
+# Linear fit from SDXL's 4 latent channels to RGB (no VAE decode needed)
+SDXL_LATENT_RGB_FACTORS = torch.tensor([
+    [ 0.3651,  0.4232,  0.4341],
+    [-0.2533, -0.0042,  0.1068],
+    [ 0.1076,  0.1111, -0.0362],
+    [-0.3165, -0.2492, -0.2188],
+])
+SDXL_LATENT_RGB_BIAS = torch.tensor([0.1084, -0.0175, -0.0011])
+
+def latent_preview(latent: torch.Tensor, quality: int = 70) -> str:
+    """
+    Approximate RGB preview of one (4, h, w) latent as a JPEG data URL.
+    A 1024px render gives a 128px preview in well under a millisecond of GPU time.
+    """
+    latent = latent.detach().float()
+    factors = SDXL_LATENT_RGB_FACTORS.to(latent.device)
+    bias = SDXL_LATENT_RGB_BIAS.to(latent.device)
+
+    rgb = torch.einsum("chw,cr->hwr", latent, factors) + bias
+    rgb = ((rgb.clamp(-1, 1) + 1) * 127.5).to(torch.uint8).cpu().numpy()
+
+    buffer = io.BytesIO()
+    Image.fromarray(rgb).save(buffer, format="JPEG", quality=quality)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("utf-8")
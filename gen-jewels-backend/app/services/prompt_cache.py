@@ -0,0 +1,116 @@
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable
+from datetime import datetime, timedelta
+from config.database import SessionLocal
+from config.settings import PROMPT_CACHE_TTL_HOURS, PROMPT_CACHE_SIZE
+from app.models import PromptCacheEntry
+
+# The structured wizard inputs (DesignRequest) that decide the enhanced prompt
+SPEC_FIELDS = ["jewelry_type", "style", "material", "stone", "theme", "size", "finish"]
+
+def prompt_version(*parts: str) -> str:
+    """
+    Version stamp of the system prompt(s) + model. Editing the prompt changes it,
+    which orphans every entry written under the old text.
+    """
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+def _normalize(value) -> str:
+    return " ".join(str(value or "").split()).lower()
+
+def spec_key(data: dict, version: str) -> str:
+    spec = {field: _normalize(data.get(field)) for field in SPEC_FIELDS}
+    raw = json.dumps([version, spec, _normalize(data.get("extra_text"))], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class PromptCache:
+    """
+    Two levels: in-process LRU in front of the 'prompt_cache' table.
+    Both honour the TTL; DB reads/writes run in a thread so the event loop stays free.
+    `clock` (epoch seconds) dates both levels, so tests can move time forward.
+    """
+    def __init__(self, ttl_hours: float = PROMPT_CACHE_TTL_HOURS, max_entries: int = PROMPT_CACHE_SIZE,
+                 clock: Callable[[], float] = time.time):
+        self.ttl = ttl_hours * 3600
+        self.max_entries = max_entries
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (prompt, stored_at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, prompt: str, stored_at: float):
+        with self.lock:
+            self.entries[key] = (prompt, stored_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _db_get(self, key: str, version: str):
+        db = SessionLocal()
+        try:
+            stamp = self.clock()
+            now = datetime.utcfromtimestamp(stamp)
+            entry = db.query(PromptCacheEntry).filter(
+                PromptCacheEntry.key == key,
+                PromptCacheEntry.version == version,
+                PromptCacheEntry.created_at > now - timedelta(seconds=self.ttl)  # Same cut-off as memory
+            ).first()
+            if entry is None:
+                return None
+            age = (now - entry.created_at).total_seconds()
+            return entry.prompt, stamp - age
+        finally:
+            db.close()
+
+    def _db_put(self, key: str, version: str, prompt: str):
+        db = SessionLocal()
+        try:
+            db.merge(PromptCacheEntry(key=key, version=version, prompt=prompt, created_at=datetime.utcfromtimestamp(self.clock())))
+            db.commit()
+        finally:
+            db.close()
+
+    async def get(self, key: str, version: str):
+        # 1. Memory
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached and self.clock() - cached[1] < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+
+        # 2. Database
+        try:
+            found = await asyncio.to_thread(self._db_get, key, version)
+        except Exception as e:
+            print(f"⚠️ Prompt Cache Read Error: {e}")
+            found = None
+        if found is None:
+            with self.lock:
+                self.misses += 1
+            return None
+
+        self._remember(key, *found)
+        with self.lock:
+            self.hits += 1
+        return found[0]
+
+    async def put(self, key: str, version: str, prompt: str):
+        self._remember(key, prompt, self.clock())
+        try:
+            await asyncio.to_thread(self._db_put, key, version, prompt)
+        except Exception as e:
+            print(f"⚠️ Prompt Cache Write Error: {e}")
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+# Singleton Instance
+prompt_cache = PromptCache()
@@ -1,27 +1,11 @@
-import os
-from groq import Groq
-from dotenv import load_dotenv
+from config.settings import LOCAL_WIZARD_PROMPTS
+from app.services.llm_router import llm_router
+from app.services.prompt_cache import prompt_cache, prompt_version, spec_key, SPEC_FIELDS
 
-load_dotenv()
-api_key = os.getenv("GROQ_API_KEY")
+PROMPT_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+TRANSFORM_MODEL = "llama-3.3-70b-versatile"
 
-if not api_key:
-    load_dotenv(dotenv_path="../.env")
-    api_key = os.getenv("GROQ_API_KEY")
-
-client = Groq(api_key=api_key) if api_key else None
-
-def generate_enhanced_prompt(data: dict) -> str:
-    """
-    Optimizes Text-to-Image and Wizard prompts.
-    """
-    if not client:
-        return f"{data.get('extra_text', '')}, 8k, photorealistic"
-
-    # CASE 1: Artistic Concept (Text-to-Image)
-    if data.get("jewelry_type") == "Artistic Concept":
-        user_input = data.get("extra_text", "")
-        system_instruction = """
+ARTISTIC_SYSTEM_PROMPT = """
         You are the "GenJewels Master Artisan," a specialized AI for High-End Jewelry Fabrication & Photography.
 
         YOUR GOAL: Translate user concepts into manufacturing-grade, hyper-realistic SDXL prompts. You must prioritize WEARABILITY, PHYSICS, and LUXURY AESTHETICS.
@@ -63,11 +47,8 @@ def generate_enhanced_prompt(data: dict) -> str:
         Example Output: "Professional product photography of a rose gold bangle, full-frame centered composition, entire object visible, no cropping, sculpted organic leaf motif relief, matte brushed 18k metal texture, solid jewelry construction, ray-traced reflections, macro 85mm lens, f/4.0 deep focus, studio softbox lighting, high-end commercial finish, neutral jewelry stand, 8k, photorealistic, sharp focus."
         no i meant to add more descriptions so that the prompt becomes better
         """
-        user_message = f"Optimize: {user_input}"
 
-    # CASE 2: Wizard Mode
-    else:
-        system_instruction = """
+WIZARD_SYSTEM_PROMPT = """
         You are a Senior Jewelry Designer and AI Visual Specialist. 
         Your task is to convert user specifications into a prompt for Stable Diffusion XL that results in a PHOTOREALISTIC, WEARABLE, LUXURY PRODUCT IMAGE.
 
@@ -100,30 +81,209 @@ def generate_enhanced_prompt(data: dict) -> str:
         Output:
             Professional product photography of a rose gold bangle, full-frame centered composition, entire object visible, no cropping, sculpted organic leaf motif relief, matte brushed 18k metal texture, solid jewelry construction, ray-traced reflections, macro 85mm lens, f/4.0 deep focus, studio softbox lighting, high-end commercial finish, neutral jewelry stand, 8k, photorealistic, sharp focus.
             """
-        user_message = f"Specs: {data}"
+
+# --- LOCAL PROMPT COMPOSER (Offline Wizard Mode) ---
+# Same rules as WIZARD_SYSTEM_PROMPT, applied with phrase tables instead of an LLM:
+# anchored subject, studio shot, motifs as metalwork, wearable anatomy,
+# material/stone physics, scale context and uncropped framing, in 70 words or fewer.
+
+MATERIAL_PHRASES = {
+    "gold": "18k yellow gold",
+    "yellow gold": "18k yellow gold",
+    "rose gold": "18k rose gold",
+    "white gold": "18k white gold",
+    "silver": "sterling silver",
+    "platinum": "platinum",
+}
+
+FINISH_PHRASES = {
+    "high polish": "mirror-polished {metal} surface, ray-traced reflections",
+    "matte": "brushed satin {metal} texture, soft diffuse sheen",
+    "antique finish": "oxidized antique {metal} patina, darkened recesses",
+    "handcrafted look": "hand-hammered {metal} texture, subtle tool marks",
+}
+
+STONE_PHRASES = {
+    "diamond": "prong-set high-dispersion diamonds, scintillating light refraction, clean facets",
+    "ruby": "bezel-set rubies, translucent saturation, internal depth",
+    "emerald": "channel-set emeralds, vivid green saturation, natural mineral texture",
+    "sapphire": "prong-set royal blue sapphires, deep translucent saturation",
+    "no stone": "pure metalwork without gemstones",
+}
+
+THEME_PHRASES = {
+    "peacock": "stylized peacock feather motif relief, engraved eye details",
+    "floral": "sculpted floral motif, embossed petal relief",
+    "leaf": "sculpted organic leaf motif relief, engraved veins",
+}
+
+STYLE_PHRASES = {
+    "antique": "antique heirloom",
+    "modern": "sleek modern",
+    "traditional": "traditional temple-style",
+}
+
+SIZE_PHRASES = {
+    "lightweight": "delicate lightweight profile",
+    "medium": "balanced proportions",
+    "heavy": "bold heavy-gauge construction",
+    "bridal heavy": "opulent bridal statement scale",
+}
+
+# Functional construction terms (two are used) and the display that gives scale
+ANATOMY_PHRASES = {
+    "ring": ["comfort-fit band", "tapered shank"],
+    "necklace": ["articulated links", "box clasp"],
+    "pendant": ["pave bail", "soldered jump ring"],
+    "earring": ["earring post", "milgrain edges"],
+    "bangle": ["seamless solid band", "hidden hinge clasp"],
+    "bracelet": ["articulated links", "lobster clasp"],
+}
+
+DISPLAY_PHRASES = {
+    "ring": "ring mandrel",
+    "necklace": "textured black velvet bust",
+    "pendant": "textured black velvet bust",
+    "earring": "neutral jewelry display stand",
+    "bangle": "neutral jewelry display stand",
+    "bracelet": "neutral jewelry display stand",
+}
+
+MAX_PROMPT_WORDS = 70
+MAX_NOTE_WORDS = 20  # Free text kept verbatim in offline mode
+
+def _lookup(table: dict, value: str):
+    key = " ".join(str(value or "").split()).lower()
+    if key in table:
+        return table[key]
+    return table.get(key.rstrip("s"))  # "Bangles", "Earrings"
+
+def compose_wizard_prompt(data: dict) -> str:
+    """
+    Deterministic, zero-latency SDXL prompt from the wizard fields.
+    Default for pure-wizard requests; fallback when Groq is unavailable.
+    """
+    item = str(data.get("jewelry_type") or "jewelry piece").strip()
+    item_key = item.lower()
+    metal = _lookup(MATERIAL_PHRASES, data.get("material")) or str(data.get("material") or "precious metal").lower()
+    style = _lookup(STYLE_PHRASES, data.get("style")) or str(data.get("style") or "").lower()
+
+    finish = _lookup(FINISH_PHRASES, data.get("finish")) or "high-polish {metal} surface, ray-traced reflections"
+    theme = _lookup(THEME_PHRASES, data.get("theme"))
+    if not theme and data.get("theme"):
+        # Anti-statue rule: any motif is metalwork on the surface
+        theme = f"stylized {str(data['theme']).lower()} motif relief engraved on the metal"
+    stone = _lookup(STONE_PHRASES, data.get("stone"))
+    if not stone and data.get("stone"):
+        stone = f"faceted {str(data['stone']).lower()}, brilliant light refraction"
+    anatomy = _lookup(ANATOMY_PHRASES, item_key) or ["solid metal construction", "seamless joints"]
+    display = _lookup(DISPLAY_PHRASES, item_key) or "neutral jewelry display stand"
+    size = _lookup(SIZE_PHRASES, data.get("size"))
+    note = " ".join(str(data.get("extra_text") or "").split())
+
+    subject = " ".join(f"{style} {metal} {item.lower()}".split())
+    article = "an" if subject[0] in "aeiou" else "a"
+
+    # (segment, priority) - lowest priority segments are dropped first to respect the word limit
+    segments = [
+        (f"Professional jewelry product photography of {article} {subject}", 0),
+        (finish.format(metal=metal), 1),
+        (theme, 1),
+        (stone, 1),
+        (" ".join(note.split()[:MAX_NOTE_WORDS]), 1),
+        (", ".join(anatomy), 3),
+        (size, 4),
+        (f"on a {display}", 3),
+        ("macro 100mm lens, depth of field, studio softbox lighting", 2),
+        ("full piece perfectly framed, entire jewelry item visible, centered composition, zoomed out", 0),
+        ("8k, photorealistic, sharp focus", 1),
+    ]
+    segments = [(text, priority) for text, priority in segments if text]
+
+    def word_count(parts):
+        return sum(len(text.replace(",", " ").split()) for text, _ in parts)
+
+    while word_count(segments) > MAX_PROMPT_WORDS:
+        lowest = max(range(len(segments)), key=lambda i: (segments[i][1], i))
+        if segments[lowest][1] == 0:
+            break
+        segments.pop(lowest)
+
+    return ", ".join(text for text, _ in segments)
+
+# Bumps automatically whenever a system prompt or the model changes
+ARTISTIC_PROMPT_VERSION = prompt_version(ARTISTIC_SYSTEM_PROMPT, PROMPT_MODEL)
+WIZARD_PROMPT_VERSION = prompt_version(WIZARD_SYSTEM_PROMPT, PROMPT_MODEL)
+
+async def generate_enhanced_prompt(data: dict) -> str:
+    """
+    Optimizes Text-to-Image and Wizard prompts.
+    Pure-wizard requests (no free text) are composed locally; the LLM only expands free text.
+    """
+    is_wizard = data.get("jewelry_type") != "Artistic Concept"
+    if is_wizard and LOCAL_WIZARD_PROMPTS and not (data.get("extra_text") or "").strip():
+        return compose_wizard_prompt(data)
+
+    if not llm_router.enabled:
+        return fallback_prompt(data)
+
+    # CASE 1: Artistic Concept (Text-to-Image)
+    if not is_wizard:
+        user_input = data.get("extra_text", "")
+        system_instruction = ARTISTIC_SYSTEM_PROMPT
+        version = ARTISTIC_PROMPT_VERSION
+        user_message = f"Optimize: {user_input}"
+
+    # CASE 2: Wizard Mode
+    else:
+        system_instruction = WIZARD_SYSTEM_PROMPT
+        version = WIZARD_PROMPT_VERSION
+        spec = {field: data.get(field) for field in SPEC_FIELDS + ["extra_text"]}
+        user_message = f"Specs: {spec}"
+
+    # Same spec + note -> same enhanced prompt, no Groq round trip
+    cache_key = spec_key(data, version)
+    cached = await prompt_cache.get(cache_key, version)
+    if cached:
+        return cached
 
     try:
-        completion = client.chat.completions.create(
+        content = await llm_router.chat(
             messages=[
                 {"role": "system", "content": system_instruction},
                 {"role": "user", "content": user_message}
             ],
-            model="meta-llama/llama-4-maverick-17b-128e-instruct",
+            prefer=PROMPT_MODEL,
             temperature=0.3,
             max_tokens=150,
         )
-        return completion.choices[0].message.content.strip().replace('"', '')
+        final_prompt = content.strip().replace('"', '')
+        await prompt_cache.put(cache_key, version, final_prompt)  # Fallbacks below are never cached
+        return final_prompt
     except Exception as e:
         print(f"❌ Groq Error: {e}")
-        return f"{data.get('extra_text', '')}, 8k, photorealistic"
+        return fallback_prompt(data)
+
+def fallback_prompt(data: dict) -> str:
+    """
+    Offline prompt when Groq is unavailable, keeping every structured field.
+    """
+    if data.get("jewelry_type") == "Artistic Concept":
+        concept = " ".join(str(data.get("extra_text") or "").split())
+        return (
+            f"Professional macro jewelry photography of {concept}, sculpted metalwork, "
+            "full piece perfectly framed, entire jewelry item visible, centered composition, "
+            "studio softbox lighting, ray-traced reflections, 8k, photorealistic, sharp focus"
+        )
+    return compose_wizard_prompt(data)
 
 # --- UPDATED FUNCTION FOR IMAGE-TO-IMAGE + INSTRUCTION ---
-def transform_design_prompt(design_dna: str, target_type: str, user_instruction: str = None) -> str:
+async def transform_design_prompt(design_dna: str, target_type: str, user_instruction: str = None) -> str:
     """
     Takes 'Design DNA' (Texture) + 'Target Shape' + 'User Instruction'.
     The User Instruction overrides the DNA if they conflict.
     """
-    if not client:
+    if not llm_router.enabled:
         return f"A {target_type} featuring {design_dna}, {user_instruction or ''}, 8k, photorealistic"
 
     system_instruction = """
@@ -162,16 +322,16 @@ def transform_design_prompt(design_dna: str, target_type: str, user_instruction:
     """
 
     try:
-        completion = client.chat.completions.create(
+        content = await llm_router.chat(
             messages=[
                 {"role": "system", "content": system_instruction},
                 {"role": "user", "content": user_message}
             ],
-            model="llama-3.3-70b-versatile",
+            prefer=TRANSFORM_MODEL,
             temperature=0.3, # Slightly creative to blend instructions
             max_tokens=200,
         )
-        return completion.choices[0].message.content.strip()
+        return content.strip()
 
     except Exception as e:
         print(f"❌ Optimization Error: {e}")
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from config.database import SessionLocal
+from app.models import GeneratedDesign
+
+def make_result_key(prompt: str, seed: int, steps: int, guidance: float, scheduler: str, model_id: str,
+                    source: tuple = None, size: tuple = None) -> str:
+    """
+    Content address of a render: same inputs -> same pixels.
+    source is (init image digest, strength) for image-to-image renders.
+    """
+    raw = json.dumps([prompt.strip(), seed, steps, guidance, scheduler, model_id, source, size])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """
+    Finished renders are looked up through GeneratedDesign.result_key (survives restarts).
+    Renders still running are shared through a Future, so duplicates wait instead of re-running.
+    """
+    def __init__(self, storage_dir: str, recent_size: int = 1024):
+        self.storage_dir = storage_dir
+        self.inflight = {}
+        self.recent = OrderedDict()  # Bridges the gap until the design row is committed
+        self.recent_size = recent_size
+        self.lock = threading.Lock()
+
+    def _exists(self, image_path: str) -> bool:
+        return os.path.exists(os.path.join(self.storage_dir, os.path.basename(image_path)))
+
+    def _lookup(self, key: str):
+        with self.lock:
+            path = self.recent.get(key)
+        if path and self._exists(path):
+            return path
+
+        db = SessionLocal()
+        try:
+            design = db.query(GeneratedDesign.image_path).filter(
+                GeneratedDesign.result_key == key
+            ).first()
+        finally:
+            db.close()
+        if design and self._exists(design.image_path):
+            return design.image_path
+        return None
+
+    def get_or_run(self, key: str, run) -> str:
+        # 1. Already rendered
+        path = self._lookup(key)
+        if path:
+            print(f"♻️ Result cache hit: {key[:12]}")
+            return path
+
+        # 2. Someone is rendering it right now
+        with self.lock:
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.inflight[key] = future
+        if not owner:
+            print(f"⏳ Waiting on identical in-flight render: {key[:12]}")
+            return future.result()
+
+        # 3. Render it ourselves
+        try:
+            path = run()
+            with self.lock:
+                self.recent[key] = path
+                self.recent.move_to_end(key)
+                while len(self.recent) > self.recent_size:
+                    self.recent.popitem(last=False)
+            future.set_result(path)
+            return path
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
@@ -0,0 +1,196 @@
+import re
+import base64
+from sqlalchemy import select, func, text, literal_column, table, column, or_, and_, cast, Float
+from app.models import GeneratedDesign
+
+# Native full-text index over final_prompt + extra_text, maintained by the database itself
+# and partitioned by user, so a search only ever touches the caller's rows:
+#  - Postgres: btree_gin index on (user_id, to_tsvector()) (updated with every insert/update)
+#  - SQLite:   external-content FTS5 table with a user_id column that is part of every MATCH,
+#              kept in sync by triggers (same transaction as the insert)
+# Matching goes through the index, so only the matching rows are ranked, however large the table grows.
+#
+# Scores are document-local (they never depend on other rows), so a (score, id) cursor stays
+# valid while designs are added between page fetches. bm25() is not: its idf and average
+# length are corpus statistics that move with every insert.
+
+FTS_TABLE = "generated_designs_fts"
+PG_INDEX = "ix_generated_designs_user_fts"
+PG_DOCUMENT = "to_tsvector('english', coalesce(final_prompt, '') || ' ' || coalesce(extra_text, ''))"
+
+# Structured filters accepted next to the text query (exact match)
+SEARCH_FILTERS = ["jewelry_type", "style", "material", "stone", "gem_theme", "size_category", "finish", "render_mode"]
+
+# SQLite score: BM25's term-frequency part (saturation + length normalisation) against a
+# fixed reference length instead of the corpus average
+TF_SATURATION = 1.2
+LENGTH_WEIGHT = 0.75
+REFERENCE_WORDS = 40
+
+PG_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",  # GIN operator classes for the plain user_id column
+    f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON generated_designs USING GIN (user_id, ({PG_DOCUMENT}))",
+    "DROP INDEX IF EXISTS ix_generated_designs_fts",  # Superseded global index
+]
+
+SQLITE_FTS_DROP = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+SQLITE_FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        final_prompt, extra_text, user_id, content='generated_designs', content_rowid='id',
+        tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON generated_designs BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, final_prompt, extra_text, user_id)
+        VALUES (new.id, new.final_prompt, new.extra_text, new.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON generated_designs BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, final_prompt, extra_text, user_id)
+        VALUES ('delete', old.id, old.final_prompt, old.extra_text, old.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF final_prompt, extra_text, user_id
+        ON generated_designs BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, final_prompt, extra_text, user_id)
+        VALUES ('delete', old.id, old.final_prompt, old.extra_text, old.user_id);
+        INSERT INTO {FTS_TABLE}(rowid, final_prompt, extra_text, user_id)
+        VALUES (new.id, new.final_prompt, new.extra_text, new.user_id);
+    END""",
+    # Index the designs that existed before the FTS table
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+def ensure_search_index(engine):
+    """
+    Creates the full-text index (and, on SQLite, its sync triggers) if missing.
+    An FTS table from before the per-user partitioning is rebuilt.
+    """
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            for statement in PG_SEARCH_DDL:
+                conn.execute(text(statement))
+            return
+        existing = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).scalar()
+        if existing and "user_id" in existing:
+            return
+        for statement in (SQLITE_FTS_DROP if existing else []) + SQLITE_FTS_DDL:
+            conn.execute(text(statement))
+        print(f"✅ Built full-text index {FTS_TABLE}")
+
+class InvalidSearch(Exception):
+    pass
+
+def fts5_query(q: str, user_id: int) -> str:
+    """
+    Free text -> FTS5 query over the user's partition: every word must match the prompt or
+    note (quoted, so user input can't inject FTS syntax), the last word as a prefix so
+    results show up while typing.
+    """
+    words = re.findall(r"\w+", q.lower())
+    if not words:
+        raise InvalidSearch("Search needs at least one word")
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return f'user_id : "{int(user_id)}" AND {{final_prompt extra_text}} : ({" ".join(terms)})'
+
+def encode_cursor(score: float, design_id: int) -> str:
+    raw = f"{score!r}|{design_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """
+    Returns (score, id); raises InvalidSearch on a malformed cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        score, design_id = raw.split("|")
+        return float(score), int(design_id)
+    except ValueError:
+        raise InvalidSearch("Invalid cursor")
+
+def _count(haystack, needle):
+    return func.length(haystack) - func.length(func.replace(haystack, needle, ""))
+
+def _sqlite_score():
+    """
+    Minus the saturated, length-normalised count of matched tokens (prefix and stemmed
+    matches included, as marked by highlight()) in the prompt and the note.
+    """
+    fts = literal_column(FTS_TABLE)
+    hits = sum(
+        func.coalesce(_count(func.highlight(fts, index, "\x01", ""), "\x01"), 0)
+        for index in (0, 1)
+    )
+    document = func.coalesce(GeneratedDesign.final_prompt, "") + " " + func.coalesce(GeneratedDesign.extra_text, "")
+    words = cast(_count(document, " ") + 1, Float)
+    length = TF_SATURATION * (1 - LENGTH_WEIGHT + LENGTH_WEIGHT * words / REFERENCE_WORDS)
+    return -(cast(hits, Float) / (hits + length))
+
+def _ranked(dialect: str, user_id: int, q: str):
+    """
+    (join target or None, match clause, score) for the dialect. Lower score = more relevant.
+    """
+    if dialect == "postgresql":
+        document = literal_column(PG_DOCUMENT)  # Same expression as the GIN index, so the planner uses it
+        tsquery = func.websearch_to_tsquery(literal_column("'english'"), q)
+        # With user_id = ... (added by the caller) the btree_gin index narrows to the user's rows
+        return None, document.op("@@")(tsquery), -func.ts_rank_cd(document, tsquery)  # Document-local
+
+    fts = table(FTS_TABLE, column("rowid"))
+    match = literal_column(FTS_TABLE).op("MATCH")(fts5_query(q, user_id))
+    return fts, match, _sqlite_score()
+
+def search_query(dialect: str, user_id: int, q: str, filters: dict, limit: int, cursor: str = None,
+                 preview_chars: int = 140):
+    """
+    SELECT for one page of search results (one row more than limit, to detect a next page).
+    """
+    if not re.search(r"\w", q):
+        raise InvalidSearch("Search needs at least one word")
+    fts, match, score = _ranked(dialect, user_id, q)
+
+    # 1. Matching rows with their score (the index does the matching, within the user's rows)
+    query = select(
+        GeneratedDesign.id, GeneratedDesign.jewelry_type, GeneratedDesign.material,
+        GeneratedDesign.stone, GeneratedDesign.image_path, GeneratedDesign.render_mode,
+        GeneratedDesign.created_at,
+        func.substr(GeneratedDesign.final_prompt, 1, preview_chars).label("prompt_preview"),
+        score.label("score"),
+    )
+    if fts is not None:
+        query = query.join(fts, fts.c.rowid == GeneratedDesign.id)
+    query = query.where(match, GeneratedDesign.user_id == user_id)
+    for name in SEARCH_FILTERS:
+        if filters.get(name) is not None:
+            query = query.where(getattr(GeneratedDesign, name) == filters[name])
+    ranked = query.subquery()
+
+    # 2. Keyset on (score, id): deep pages cost the same as the first (no OFFSET)
+    page = select(ranked)
+    if cursor:
+        after_score, after_id = decode_cursor(cursor)
+        page = page.where(or_(
+            ranked.c.score > after_score,
+            and_(ranked.c.score == after_score, ranked.c.id < after_id),
+        ))
+    return page.order_by(ranked.c.score, ranked.c.id.desc()).limit(limit + 1)
+
+async def search_designs(db, user_id: int, q: str, filters: dict, limit: int, cursor: str = None,
+                         preview_chars: int = 140):
+    """
+    One page of the user's designs matching q (and the structured filters), best match first.
+    Returns (rows, next_cursor); rows have the DesignHistoryItem fields.
+    """
+    page = search_query(db.get_bind().dialect.name, user_id, q, filters, limit, cursor, preview_chars)
+    rows = [dict(row) for row in (await db.execute(page)).mappings().all()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["score"], rows[-1]["id"])
+    return rows, next_cursor
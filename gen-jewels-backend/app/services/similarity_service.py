@@ -0,0 +1,303 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from PIL import Image
+from sqlalchemy import select
+from config.database import session_scope
+from config.settings import VECTOR_INDEX_DIR, SIMILAR_SEARCH_CHUNK
+from app.models import Company, GeneratedDesign
+from app.services.image_service import storage_path
+from app.services.dna_features import foreground_mask
+
+# ─── Compact visual embedding (CPU, ~5 ms per image) ───
+# colour:  HSV histogram of the piece (backdrop masked out)        8 x 3 x 3 = 72
+# texture: gradient-orientation histograms at two scales            2 x 8     = 16
+# layout:  4x4 luminance grid, mean removed                         4 x 4     = 16
+# Each block is unit-length and weighted, so a dot product is a weighted sum of cosines.
+
+EMBED_SIDE = 128
+HSV_BINS = (8, 3, 3)
+ORIENTATION_BINS = 8
+LAYOUT_GRID = 4
+BLOCK_WEIGHTS = {"colour": 0.6, "texture": 0.25, "layout": 0.15}
+EMBEDDING_DIM = 72 + 2 * ORIENTATION_BINS + LAYOUT_GRID * LAYOUT_GRID
+EMBEDDING_VERSION = "v1"  # Bump when the features change: indexes are rebuilt
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def _orientations(gray: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    magnitude, angle = cv2.cartToPolar(gx, gy, angleInDegrees=True)
+    bins = (np.mod(angle[mask], 180) / (180 / ORIENTATION_BINS)).astype(int) % ORIENTATION_BINS
+    return np.bincount(bins, weights=magnitude[mask], minlength=ORIENTATION_BINS)
+
+def embed_image(image: Image.Image) -> np.ndarray:
+    """
+    EMBEDDING_DIM float32 vector, L2-normalized (cosine similarity = dot product).
+    """
+    rgb = cv2.resize(np.asarray(image.convert("RGB")), (EMBED_SIDE, EMBED_SIDE), interpolation=cv2.INTER_AREA)
+    mask = foreground_mask(cv2.cvtColor(rgb, cv2.COLOR_RGB2LAB))
+    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+
+    # 1. Colour (square root = Hellinger kernel, so small bins still count)
+    hsv = cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV)
+    colour = cv2.calcHist([hsv], [0, 1, 2], mask.astype(np.uint8), list(HSV_BINS), [0, 180, 0, 256, 0, 256]).flatten()
+    colour = np.sqrt(colour / max(colour.sum(), 1))
+
+    # 2. Texture at full and half scale
+    half_gray = cv2.resize(gray, (EMBED_SIDE // 2, EMBED_SIDE // 2), interpolation=cv2.INTER_AREA)
+    half_mask = cv2.resize(mask.astype(np.uint8), (EMBED_SIDE // 2, EMBED_SIDE // 2), interpolation=cv2.INTER_NEAREST) > 0
+    texture = np.concatenate([_orientations(gray, mask), _orientations(half_gray, half_mask)])
+    texture = np.sqrt(texture / max(texture.sum(), 1e-6))
+
+    # 3. Layout (brightness-invariant)
+    layout = cv2.resize(gray, (LAYOUT_GRID, LAYOUT_GRID), interpolation=cv2.INTER_AREA).astype(np.float32).flatten()
+    layout -= layout.mean()
+
+    blocks = {"colour": colour, "texture": texture, "layout": layout}
+    vector = np.concatenate([_unit(blocks[name].astype(np.float32)) * np.sqrt(w) for name, w in BLOCK_WEIGHTS.items()])
+    return _unit(vector).astype(np.float32)
+
+def embed_file(path: str) -> np.ndarray:
+    with Image.open(path) as source:
+        source.draft("RGB", (EMBED_SIDE * 2, EMBED_SIDE * 2))
+        return embed_image(source)
+
+# ─── Memory-mapped vector index ───
+
+class CompanyIndex:
+    """
+    Append-only vectors of one company on disk:
+      vectors.f16  (capacity x EMBEDDING_DIM) float16   ~200 bytes per design
+      ids.i64      (capacity,) int64                     design id of each row
+      meta.json    {"count", "version"}
+    Files grow by doubling. Searches stream the vectors in SIMILAR_SEARCH_CHUNK blocks,
+    so RAM use does not depend on the number of designs (the OS page cache does the rest).
+    Single writer per process (the background indexer); one process per index directory.
+    """
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f16")
+        self.ids_path = os.path.join(directory, "ids.i64")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        meta = {}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        if meta.get("version") != EMBEDDING_VERSION:
+            self._reset()
+        else:
+            self.count = meta["count"]
+            self.capacity = os.path.getsize(self.ids_path) // 8
+
+    def _reset(self):
+        for path in (self.vectors_path, self.ids_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.count = 0
+        self.capacity = 0
+        self._grow(self.INITIAL_CAPACITY)
+        self._write_meta()
+
+    def _write_meta(self):
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"count": self.count, "version": EMBEDDING_VERSION}, f)
+        os.replace(tmp, self.meta_path)  # Readers never see a half-written count
+
+    def _grow(self, needed: int):
+        if needed <= self.capacity:
+            return
+        capacity = max(self.capacity, self.INITIAL_CAPACITY)
+        while capacity < needed:
+            capacity *= 2
+        for path, row_bytes in ((self.vectors_path, EMBEDDING_DIM * 2), (self.ids_path, 8)):
+            with open(path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self.capacity = capacity
+
+    def _maps(self, rows: int, mode: str = "r"):
+        vectors = np.memmap(self.vectors_path, dtype=np.float16, mode=mode, shape=(rows, EMBEDDING_DIM))
+        ids = np.memmap(self.ids_path, dtype=np.int64, mode=mode, shape=(rows,))
+        return vectors, ids
+
+    def add(self, design_ids, vectors: np.ndarray):
+        with self.lock:
+            start, end = self.count, self.count + len(design_ids)
+            self._grow(end)
+            mapped_vectors, mapped_ids = self._maps(self.capacity, "r+")
+            mapped_vectors[start:end] = vectors.astype(np.float16)
+            mapped_ids[start:end] = design_ids
+            mapped_vectors.flush()
+            mapped_ids.flush()
+            del mapped_vectors, mapped_ids  # Unmap before the next resize (required on Windows)
+            self.count = end
+            self._write_meta()
+
+    def indexed_ids(self) -> set:
+        with self.lock:
+            if not self.count:
+                return set()
+            _, ids = self._maps(self.count)
+            return set(ids.tolist())
+
+    def vector_of(self, design_id: int):
+        with self.lock:
+            if not self.count:
+                return None
+            vectors, ids = self._maps(self.count)
+            rows = np.flatnonzero(ids == design_id)
+            return np.asarray(vectors[rows[-1]], dtype=np.float32) if len(rows) else None
+
+    def search(self, queries: np.ndarray, k: int, exclude=()):
+        """
+        Batched top-k by cosine similarity. queries: (B, EMBEDDING_DIM).
+        Returns one [(design_id, score), ...] list per query, best first.
+        """
+        queries = np.atleast_2d(queries).astype(np.float32)
+        keep = k + len(exclude) + 8  # Room for excluded ids and the odd duplicate row
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+
+        with self.lock:
+            if not self.count:
+                return [[] for _ in queries]
+            vectors, ids = self._maps(self.count)
+            for start in range(0, self.count, SIMILAR_SEARCH_CHUNK):
+                block = np.asarray(vectors[start:start + SIMILAR_SEARCH_CHUNK], dtype=np.float32)
+                scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+                rows = np.concatenate([best_rows, np.broadcast_to(
+                    np.arange(start, start + len(block)), (len(queries), len(block)))], axis=1)
+                if scores.shape[1] > keep:
+                    top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+                    scores = np.take_along_axis(scores, top, axis=1)
+                    rows = np.take_along_axis(rows, top, axis=1)
+                best_scores, best_rows = scores, rows
+            best_ids = ids[best_rows.flatten()].reshape(best_rows.shape)
+
+        results = []
+        for scores, design_ids in zip(best_scores, best_ids):
+            ranked, seen = [], set(exclude)
+            for i in np.argsort(-scores):
+                design_id = int(design_ids[i])
+                if design_id not in seen:  # Also skips a design indexed twice (save racing the backfill)
+                    seen.add(design_id)
+                    ranked.append((design_id, float(scores[i])))
+            results.append(ranked[:k])
+        return results
+
+class VectorIndex:
+    """
+    Per-company CompanyIndex instances plus the background indexer: save_designs hands
+    over the new designs and returns immediately; embeddings are computed on one
+    worker thread (which also serializes appends).
+    """
+    def __init__(self, root: str = VECTOR_INDEX_DIR):
+        self.root = root
+        self.indexes = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-index")
+        self.pending = 0
+
+    def company(self, company_id: int) -> CompanyIndex:
+        with self.lock:
+            if company_id not in self.indexes:
+                self.indexes[company_id] = CompanyIndex(os.path.join(self.root, f"company_{company_id}"))
+            return self.indexes[company_id]
+
+    def schedule(self, user_id: int, designs):
+        """
+        designs: [(design_id, image_path)] just committed. Safe from any thread.
+        """
+        with self.lock:
+            self.pending += 1
+        self.executor.submit(self._run, self._index_designs, user_id, designs)
+
+    def schedule_backfill(self):
+        """
+        Indexes designs missing from the index (older designs, or a crash before indexing).
+        """
+        with self.lock:
+            self.pending += 1
+        self.executor.submit(self._run, self._backfill)
+
+    def _run(self, fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"⚠️ Vector Index Error: {e}")
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def _embed_batch(self, index: CompanyIndex, designs):
+        ids, vectors = [], []
+        for design_id, image_path in designs:
+            try:
+                vectors.append(embed_file(storage_path(image_path)))
+                ids.append(design_id)
+            except Exception as e:
+                print(f"⚠️ Could not embed design {design_id}: {e}")
+        if ids:
+            index.add(np.array(ids, dtype=np.int64), np.stack(vectors))
+
+    def _index_designs(self, user_id: int, designs):
+        with session_scope() as db:
+            company_id = db.execute(select(Company.id).where(Company.user_id == user_id)).scalar()
+        if company_id is not None:
+            self._embed_batch(self.company(company_id), designs)
+
+    def _backfill(self, batch_size: int = 256):
+        with session_scope() as db:
+            companies = db.execute(select(Company.id, Company.user_id)).all()
+
+        total = 0
+        for company_id, user_id in companies:
+            index = self.company(company_id)
+            indexed = index.indexed_ids()
+            last_id = 0
+            while True:
+                # Short session per batch (keyset on id): no connection held while embedding
+                with session_scope() as db:
+                    batch = db.execute(
+                        select(GeneratedDesign.id, GeneratedDesign.image_path)
+                        .where(GeneratedDesign.user_id == user_id, GeneratedDesign.id > last_id)
+                        .order_by(GeneratedDesign.id).limit(batch_size)
+                    ).all()
+                if not batch:
+                    break
+                last_id = batch[-1][0]
+                missing = [(design_id, path) for design_id, path in batch if design_id not in indexed]
+                if missing:
+                    self._embed_batch(index, missing)
+                    total += len(missing)
+        if total:
+            print(f"✅ Vector index backfilled {total} designs.")
+
+    def search(self, company_id: int, queries: np.ndarray, k: int, exclude=()):
+        return self.company(company_id).search(queries, k, exclude)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "companies": len(self.indexes),
+                "vectors": sum(index.count for index in self.indexes.values()),
+                "pending": self.pending,
+            }
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+# Singleton Instance
+vector_index = VectorIndex()
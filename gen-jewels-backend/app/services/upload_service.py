@@ -0,0 +1,108 @@
+import io
+import os
+from PIL import Image, ImageOps
+from config.settings import (
+    MAX_UPLOAD_MB, UPLOAD_CHUNK_BYTES, VISION_MAX_SIDE, VISION_IMAGE_FORMAT, VISION_IMAGE_QUALITY
+)
+from app.services.image_service import SDXL_RESOLUTION
+
+try:
+    # Optional: iPhone HEIC/HEIF uploads (AVIF is native in Pillow >= 11.3 builds with libavif)
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+class UploadTooLarge(Exception):
+    pass
+
+class UnsupportedImage(Exception):
+    pass
+
+# Extension stored on disk for each sniffed type
+IMAGE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+    "image/bmp": ".bmp",
+    "image/tiff": ".tiff",
+    "image/avif": ".avif",
+    "image/heic": ".heic",
+}
+
+def sniff_media_type(head: bytes):
+    """
+    Real image type from the file's magic bytes; the browser's Content-Type and
+    the filename are only hints (and phones happily label AVIF/HEIC as image/jpeg).
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:2] == b"BM":
+        return "image/bmp"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"avif", b"avis"):
+            return "image/avif"
+        if brand in (b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1"):
+            return "image/heic"
+    return None
+
+async def save_upload(upload, directory: str, name: str):
+    """
+    Streams an UploadFile to disk in chunks (Starlette already spools it to a temp file),
+    enforcing MAX_UPLOAD_MB without ever holding the whole image in memory.
+    Returns (path, media_type).
+    """
+    max_bytes = MAX_UPLOAD_MB * 1024 * 1024
+    head = await upload.read(UPLOAD_CHUNK_BYTES)
+    media_type = sniff_media_type(head)
+    if media_type is None:
+        raise UnsupportedImage(f"Unrecognized image format ({upload.content_type})")
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}{IMAGE_EXTENSIONS[media_type]}")
+    size = 0
+    try:
+        with open(path, "wb") as f:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Image exceeds {MAX_UPLOAD_MB} MB")
+                f.write(chunk)
+                chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return path, media_type
+
+def load_upload(path: str) -> Image.Image:
+    """
+    Decodes the upload once, upright RGB. JPEGs are decoded at a reduced DCT scale
+    when the photo is far larger than anything downstream needs.
+    """
+    needed = max(max(SDXL_RESOLUTION), VISION_MAX_SIDE)
+    with Image.open(path) as source:
+        source.draft("RGB", (needed, needed))
+        return ImageOps.exif_transpose(source).convert("RGB")
+
+def vision_payload(image: Image.Image):
+    """
+    Downscaled, re-encoded copy for the vision model: a 12 MB phone photo becomes ~150 KB.
+    Returns (bytes, media_type).
+    """
+    preview = image.copy()
+    preview.thumbnail((VISION_MAX_SIDE, VISION_MAX_SIDE), Image.LANCZOS)
+    buffer = io.BytesIO()
+    preview.save(buffer, format=VISION_IMAGE_FORMAT, quality=VISION_IMAGE_QUALITY)
+    return buffer.getvalue(), f"image/{VISION_IMAGE_FORMAT.lower()}"
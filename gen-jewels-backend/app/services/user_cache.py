@@ -0,0 +1,74 @@
+import time
+import threading
+from collections import OrderedDict, namedtuple
+from sqlalchemy import event, inspect
+from config.settings import USER_CACHE_TTL_SECONDS, USER_CACHE_SIZE
+from app.models import User
+
+# What handlers get from get_current_user: plain values, safe to keep across sessions/threads
+Principal = namedtuple("Principal", ["id", "username", "company_id", "is_active"])
+
+def principal_from(user: User) -> Principal:
+    return Principal(
+        id=user.id,
+        username=user.username,
+        company_id=user.company.id if user.company else None,
+        is_active=bool(user.is_active),
+    )
+
+class UserCache:
+    """
+    Token subject (username) -> Principal, bounded by TTL and size.
+    Removes the users-table lookup from every authenticated request (history polling included).
+    Updates/deletes of a User through the ORM invalidate the entry immediately; the TTL bounds
+    staleness for changes made outside this process.
+    """
+    def __init__(self, ttl_seconds: float = USER_CACHE_TTL_SECONDS, max_entries: int = USER_CACHE_SIZE):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # username -> (principal, expires_at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str):
+        with self.lock:
+            cached = self.entries.get(username)
+            if cached and cached[1] > time.monotonic():
+                self.entries.move_to_end(username)
+                self.hits += 1
+                return cached[0]
+            if cached:
+                del self.entries[username]
+            self.misses += 1
+            return None
+
+    def put(self, principal: Principal):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[principal.username] = (principal, time.monotonic() + self.ttl)
+            self.entries.move_to_end(principal.username)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        with self.lock:
+            self.entries.pop(username, None)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+# Singleton Instance
+user_cache = UserCache()
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    """
+    Deactivation, rename or deletion: drop the cached principal (old and new username).
+    """
+    renamed_from = list(inspect(target).attrs.username.history.deleted or [])
+    for username in renamed_from + [target.username]:
+        user_cache.invalidate(username)
@@ -1,44 +1,14 @@
-import os
 import base64
-from groq import Groq
-from dotenv import load_dotenv
+from app.services.llm_router import llm_router
+from app.services.prompt_cache import prompt_version
+from app.services.dna_cache import dna_cache
+from app.services.dna_features import format_design_dna, summarize_design_dna
+from config.settings import DNA_MODE, DNA_ENRICH
 
-# Load API Key
-load_dotenv()
-api_key = os.getenv("GROQ_API_KEY")
+VISION_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+VISION_TYPES = ["image/jpeg", "image/png", "image/webp"]  # What Groq accepts in a data URL
 
-if not api_key:
-    load_dotenv(dotenv_path="../.env")
-    api_key = os.getenv("GROQ_API_KEY")
-
-client = Groq(api_key=api_key) if api_key else None
-
-def analyze_design_dna(image_bytes, media_type="image/jpeg") -> str:
-    """
-    Uses Groq Vision to extract textures/materials.
-    Handles MIME type validation to prevent 400 Errors.
-    """
-    if not client:
-        return "Detailed organic texture with natural imperfections"
-
-    # 1. Validate Media Type (Groq is strict)
-    # If the frontend sent an unknown type, force it to 'image/jpeg' or 'image/png'
-    valid_types = ["image/jpeg", "image/png", "image/webp"]
-    if media_type not in valid_types:
-        print(f"⚠️ Warning: Unsupported media_type '{media_type}'. Defaulting to 'image/jpeg'")
-        media_type = "image/jpeg"
-
-    # 2. Encode to Base64
-    try:
-        base64_image = base64.b64encode(image_bytes).decode('utf-8')
-    except Exception as e:
-        print(f"❌ Base64 Encoding Failed: {e}")
-        return "Standard gold metal texture"
-
-    # 3. Construct Data URL
-    data_url = f"data:{media_type};base64,{base64_image}"
-
-    system_instruction = """
+VISION_SYSTEM_PROMPT = """
     1. Role / Context
         Act as a Senior 3D Jewelry Visualization Specialist. You are an expert at "Generative DNA Extraction"—the process of taking raw inspiration (Nature, Architecture, or existing Jewelry) and converting it into a technical blueprint for a new jewelry design.
 
@@ -68,13 +38,59 @@ def analyze_design_dna(image_bytes, media_type="image/jpeg") -> str:
         Format: "A [Jewelry Type] inspired by [Source DNA], featuring [Specific Texture] in [Metal Type], with [Specific Structure Details], isolated on a white studio background, 8k resolution, macro photography."
 """
 
+VISION_PROMPT_VERSION = prompt_version(VISION_SYSTEM_PROMPT, VISION_MODEL)
+
+def enrich(content: str, features) -> str:
+    if features is None or not DNA_ENRICH:
+        return content
+    return f"{content}\n{summarize_design_dna(features)}"
+
+async def analyze_design_dna(image_bytes, media_type="image/jpeg", image_hash=None, features=None) -> str:
+    """
+    Uses Groq Vision to extract textures/materials.
+    Handles MIME type validation to prevent 400 Errors.
+    image_hash: perceptual hash of the upload; near-duplicates reuse the cached DNA.
+    features: dna_features.extract_design_features output; the offline DNA and enrichment source.
+    """
+    # Measured DNA beats a canned string whenever the image could be decoded
+    fallback = format_design_dna(features) if features is not None else None
+
+    if DNA_MODE == "local" and fallback:
+        return fallback
+
+    # 0. Same (or nearly the same) image analyzed before
+    if image_hash is not None:
+        cached = await dna_cache.get(image_hash, VISION_PROMPT_VERSION)
+        if cached:
+            print("♻️ Design DNA cache hit")
+            return enrich(cached, features)
+
+    if not llm_router.enabled:
+        return fallback or "Detailed organic texture with natural imperfections"
+
+    # 1. Validate Media Type (Groq is strict)
+    # Relabelling e.g. AVIF as JPEG only earns a 400; callers re-encode via upload_service.vision_payload
+    if media_type not in VISION_TYPES:
+        print(f"⚠️ Warning: Unsupported media_type '{media_type}', skipping vision analysis")
+        return fallback or "Detailed organic texture with natural imperfections"
+
+    # 2. Encode to Base64
+    try:
+        base64_image = base64.b64encode(image_bytes).decode('utf-8')
+    except Exception as e:
+        print(f"❌ Base64 Encoding Failed: {e}")
+        return fallback or "Standard gold metal texture"
+
+    # 3. Construct Data URL
+    data_url = f"data:{media_type};base64,{base64_image}"
+
     try:
-        completion = client.chat.completions.create(
+        content = await llm_router.chat(
             messages=[
                 {
                     "role": "user",
                     "content": [
-                        {"type": "text", "text": system_instruction},
+                        {"type": "text", "text": VISION_SYSTEM_PROMPT},
                         {
                             "type": "image_url",
                             "image_url": {
@@ -84,13 +100,15 @@ def analyze_design_dna(image_bytes, media_type="image/jpeg") -> str:
                     ],
                 }
             ],
-            # Use the Vision model
-            model="meta-llama/llama-4-maverick-17b-128e-instruct", 
+            # Use the Vision model (only one is multimodal: breaker, no failover)
+            models=[VISION_MODEL],
             temperature=0.1, 
             max_tokens=200,
         )
-        return completion.choices[0].message.content
+        if image_hash is not None and content.strip():
+            await dna_cache.put(image_hash, VISION_PROMPT_VERSION, content)  # Fallbacks below are never cached
+        return enrich(content, features)
     except Exception as e:
         print(f"❌ Vision Error: {e}")
-        # This is the fallback string you saw in your logs
-        return "High-fidelity organic texture with prominent veins and detailed relief"
\ No newline at end of file
+        # This is the fallback string you saw in your logs (when the image couldn't be decoded)
+        return fallback or "High-fidelity organic texture with prominent veins and detailed relief"
\ No newline at end of file
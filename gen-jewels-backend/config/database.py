@@ -1,7 +1,15 @@
 import os
-from sqlalchemy import create_engine
+import time
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from dotenv import load_dotenv
+from config.settings import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE
 
 load_dotenv()
 
@@ -9,9 +17,116 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("❌ DATABASE_URL is missing!")
 
+def async_database_url(url: str) -> str:
+    """
+    Same database through an asyncio driver: asyncpg for Postgres, aiosqlite for SQLite.
+    ASYNC_DATABASE_URL overrides the derivation.
+    """
+    override = os.getenv("ASYNC_DATABASE_URL")
+    if override:
+        return override
+    parsed = make_url(url.replace("postgres://", "postgresql://", 1))
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    if backend == "postgresql":
+        query = dict(parsed.query)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")  # asyncpg spells it 'ssl'
+        query.pop("channel_binding", None)
+        return parsed.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+    return url
+
+class PoolMetrics:
+    """
+    How long requests wait for a pooled connection, and how many are in use.
+    A growing wait or any timeouts mean something holds connections too long.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def checked_out(self, delta: int):
+        with self.lock:
+            self.in_use += delta
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "pool_size": DB_POOL_SIZE,
+                "max_overflow": DB_MAX_OVERFLOW,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.wait_total / self.checkouts * 1000, 2) if self.checkouts else 0,
+                "max_wait_ms": round(self.wait_max * 1000, 2),
+            }
+
+pool_metrics = PoolMetrics()        # Sync engine: worker threads, caches
+async_pool_metrics = PoolMetrics()  # Async engine: request handlers
+
+def metered_pool(base, metrics: PoolMetrics):
+    """
+    Pool class that times each checkout (the wait for a free connection).
+    """
+    class MeteredPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeout:
+                metrics.record_wait(time.perf_counter() - started, timed_out=True)
+                raise
+            metrics.record_wait(time.perf_counter() - started)
+            return connection
+    return MeteredPool
+
+def pool_options(base, metrics: PoolMetrics) -> dict:
+    return {
+        "poolclass": metered_pool(base, metrics),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+def track_checkouts(sync_engine, metrics: PoolMetrics):
+    event.listen(sync_engine, "checkout", lambda *args: metrics.checked_out(1))
+    event.listen(sync_engine, "checkin", lambda *args: metrics.checked_out(-1))
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
 # pool_pre_ping checks DB health before connecting
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(
+    DATABASE_URL, pool_pre_ping=True,
+    **({} if IS_SQLITE else pool_options(QueuePool, pool_metrics))
+)
+async_engine = create_async_engine(
+    async_database_url(DATABASE_URL), pool_pre_ping=True,
+    **({} if IS_SQLITE else pool_options(AsyncAdaptedQueuePool, async_pool_metrics))
+)
+track_checkouts(engine, pool_metrics)
+track_checkouts(async_engine.sync_engine, async_pool_metrics)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: attributes stay readable after commit without another (awaited) load
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 def get_db():
@@ -19,4 +134,61 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+@contextmanager
+def session_scope():
+    """
+    One short unit of work: commit on success, roll back on error, and always
+    hand the connection back to the pool. Use it instead of get_db in handlers
+    that keep running (streaming, long awaits) after their queries are done.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@asynccontextmanager
+async def async_session_scope():
+    """
+    session_scope for coroutines: the event loop never blocks on the database.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+def upgrade_schema():
+    """
+    create_all() never alters existing tables, so add any new columns and
+    indexes in place (new columns are always nullable).
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+                    print(f"✅ Added column {table.name}.{column.name}")
+
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
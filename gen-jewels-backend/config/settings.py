@@ -12,7 +12,81 @@ API_PREFIX = "/api/v1"
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60 # 30 Days
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))  # 0 disables the auth cache
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))          # Authenticated principals kept in memory
+ADMIN_USERNAMES = {u.strip() for u in os.getenv("ADMIN_USERNAMES", "").split(",") if u.strip()}  # May read /system/diagnostics
+
+# Database Pool (ignored for SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))     # Seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))     # Reconnect before the server drops idle connections
 
 # AI Configs
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")  # Point at a local stub for tests
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))           # Retries after the first attempt
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MODELS = [m.strip() for m in os.getenv(
+    "LLM_MODELS", "meta-llama/llama-4-maverick-17b-128e-instruct,llama-3.3-70b-versatile"
+).split(",") if m.strip()]                                           # Interchangeable text models for routing
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))   # Consecutive failures that open a model's breaker
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))  # Open time before a probe call
+LLM_HEDGE = os.getenv("LLM_HEDGE", "true").lower() == "true"         # Duplicate slow calls to the next model
+LLM_HEDGE_MIN_SECONDS = float(os.getenv("LLM_HEDGE_MIN_SECONDS", "0.5"))
+LLM_HEDGE_DEFAULT_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_SECONDS", "3"))  # Hedge delay until p95 is known
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "50"))      # Recent calls kept per model
+LLM_ROUTE_BIAS = float(os.getenv("LLM_ROUTE_BIAS", "0.8"))           # Preferred model wins unless others are faster than this ratio
+PROMPT_CACHE_TTL_HOURS = float(os.getenv("PROMPT_CACHE_TTL_HOURS", "168"))  # Enhanced wizard prompts are reused for a week
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "2048"))             # In-process LRU entries (DB holds the rest)
+LOCAL_WIZARD_PROMPTS = os.getenv("LOCAL_WIZARD_PROMPTS", "true").lower() == "true"  # Compose pure-wizard prompts offline
 GEMINI_MODEL = "gemini-1.5-flash"
-SD_MODEL_PATH = r"D:\ramesh\text jewelry\models_cache"
\ No newline at end of file
+SD_MODEL_PATH = r"D:\ramesh\text jewelry\models_cache"
+
+# Generation Job Queue
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # Jobs run concurrently (the SDXL batcher coalesces them)
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))  # A job still "running" after this many starts crashed the process: fail it
+UPLOAD_DIR = os.path.join("storage", "uploads")   # Image-to-image sources kept until the job finishes
+MAX_VARIATIONS = int(os.getenv("MAX_VARIATIONS", "8"))  # Upper bound for DesignRequest.num_variations
+SEED_RANGE = 2**31  # Seeds are 0 <= seed < SEED_RANGE: they must fit the signed INTEGER seed column
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "20"))   # Image-to-image upload cap (413 above it)
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", "1024"))  # Longest side sent to the vision model
+VISION_IMAGE_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "JPEG").upper()  # JPEG or WEBP
+VISION_IMAGE_QUALITY = int(os.getenv("VISION_IMAGE_QUALITY", "85"))
+DNA_HASH_MAX_DISTANCE = int(os.getenv("DNA_HASH_MAX_DISTANCE", "10"))  # pHash+dHash bits (of 128) for a cache hit
+DNA_CACHE_SIZE = int(os.getenv("DNA_CACHE_SIZE", "50000"))   # Newest entries searched in memory
+DNA_MODE = os.getenv("DNA_MODE", "remote").lower()           # remote (Groq vision) | local (CPU features only)
+DNA_ENRICH = os.getenv("DNA_ENRICH", "true").lower() == "true"  # Append measured palette/structure to remote DNA
+
+# SDXL Micro-Batching
+SD_BATCH_WINDOW_MS = int(os.getenv("SD_BATCH_WINDOW_MS", "150"))  # How long to wait for more requests
+SD_MAX_BATCH = int(os.getenv("SD_MAX_BATCH", "4"))                # Max prompts per pipeline call
+
+# SDXL Worker Pool
+SD_DEVICES = [d.strip() for d in os.getenv("SD_DEVICES", "cuda:0").split(",") if d.strip()]  # e.g. "cuda:0,cuda:1" or "cpu"
+SD_CPU_OFFLOAD = os.getenv("SD_CPU_OFFLOAD", "true").lower() == "true"  # Only useful with a single small GPU
+SD_WORKER_MAX_FAILURES = int(os.getenv("SD_WORKER_MAX_FAILURES", "2"))  # Consecutive failures before a worker restarts
+SD_WORKER_COOLDOWN_SECONDS = float(os.getenv("SD_WORKER_COOLDOWN_SECONDS", "60"))  # Unhealthy worker gets no traffic, then one probe
+SD_DRAFT_STEPS = int(os.getenv("SD_DRAFT_STEPS", "12"))            # Draft mode: quick look, re-render the keeper
+SD_DRAFT_SIZE = int(os.getenv("SD_DRAFT_SIZE", "768"))             # Draft mode: square resolution (multiple of 8)
+SD_FINALIZE_STRENGTH = float(os.getenv("SD_FINALIZE_STRENGTH", "0.55"))  # Upscale pass: how much detail to re-create
+SD_WARMUP = os.getenv("SD_WARMUP", "true").lower() == "true"  # Load + test-run the pipelines at startup
+
+# Prompt Embedding Cache
+SD_EMBED_CACHE_MB = int(os.getenv("SD_EMBED_CACHE_MB", "256"))  # CPU memory budget for cached text-encoder outputs
+
+# Live Previews (SSE)
+SD_PREVIEW_EVERY = int(os.getenv("SD_PREVIEW_EVERY", "5"))  # Send a latent preview every N denoising steps
+
+# Design History
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "24"))          # Gallery cards per page
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "100"))  # Cap for ?limit=
+HISTORY_PREVIEW_CHARS = int(os.getenv("HISTORY_PREVIEW_CHARS", "140"))  # Prompt characters sent per card
+
+# Visual Similarity ("more like this")
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "vector_index")  # Per-company memory-mapped embeddings (kept out of the public /storage mount)
+SIMILAR_SEARCH_CHUNK = int(os.getenv("SIMILAR_SEARCH_CHUNK", "65536"))  # Vectors scored per block: bounds RAM per search
+SIMILAR_TOP_K = int(os.getenv("SIMILAR_TOP_K", "12"))              # Default number of neighbours returned
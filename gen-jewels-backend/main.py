@@ -1,11 +1,20 @@
 import os
+import asyncio
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from config.database import Base, engine
-from app.controllers import auth, generation
+from config.database import Base, engine, async_engine, upgrade_schema, session_scope
+from config.settings import SD_WARMUP
+from app.controllers import auth, generation, analytics, system
+from app.services.job_service import job_queue
+from app.services.image_service import sd_pool
+from app.services.llm_client import llm_client
+from app.services.analytics_service import backfill_rollups
+from app.services.search_service import ensure_search_index
+from app.services.similarity_service import vector_index
 
 # --- LIFESPAN MANAGER (Database Startup) ---
 @asynccontextmanager
@@ -15,12 +24,45 @@ async def lifespan(app: FastAPI):
     # 1. Create Tables if they don't exist
     try:
         Base.metadata.create_all(bind=engine)
+        upgrade_schema()
+        ensure_search_index(engine)
         print("✅ Database Connected & Tables Verified.")
     except Exception as e:
         print(f"❌ Database Connection Failed: {e}")
 
+    # 1b. Analytics rollups for designs created before they existed
+    try:
+        with session_scope() as db:
+            backfilled = backfill_rollups(db)
+        if backfilled:
+            print(f"✅ Analytics rollups rebuilt from {backfilled} designs.")
+    except Exception as e:
+        print(f"⚠️ Analytics Backfill Error: {e}")
+
+    # 2. Load + warm the SDXL pipelines in the background (see /ready)
+    warmup_task = None
+    if SD_WARMUP:
+        warmup_task = asyncio.create_task(asyncio.to_thread(sd_pool.warmup))
+    else:
+        sd_pool.state = "lazy"  # Models load on the first request
+
+    # 3. Shared LLM connection pool
+    llm_client.open()
+
+    # 4. Start the generation job workers (re-queues unfinished jobs)
+    await job_queue.start()
+
+    # 5. Embed designs missing from the similarity index (background thread)
+    vector_index.schedule_backfill()
+
     yield
     print("🛑 Shutting down...")
+    await job_queue.stop()
+    await llm_client.aclose()
+    vector_index.close()
+    await async_engine.dispose()
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
 
 app = FastAPI(title="Gen Jewels API", version="1.0", lifespan=lifespan)
 
@@ -47,23 +89,33 @@ app.mount("/storage", StaticFiles(directory="storage"), name="storage")
 # --- 3. Register Routers ---
 app.include_router(auth.router)
 app.include_router(generation.router)
+app.include_router(analytics.router)
+app.include_router(system.router)
 
 # --- 4. Health Check (Doorbell) ---
 @app.get("/health", tags=["System"])
 def health_check():
     """
     Simple endpoint for the cloud frontend to verify the local backend is online.
+    Public, so it says nothing else (internals: /system/diagnostics, admins only).
+    """
+    return {"status": "online", "message": "Gen Jewels Backend is Live!"}
+
+# --- 5. Readiness (Models loaded & warmed) ---
+@app.get("/ready", tags=["System"])
+def readiness_check():
+    """
+    200 once the SDXL pipelines are loaded and warmed, 503 before that.
+    Kept apart from /health, which only says the process is up.
     """
-    return {
-        "status": "online", 
-        "message": "Gen Jewels Backend is Live!"
-    }
+    ready = sd_pool.state in ("ready", "lazy")
+    return JSONResponse(status_code=200 if ready else 503, content={"state": sd_pool.state, "ready": ready})
 
 @app.get("/")
 def home():
     return {"message": "Welcome to Gen Jewels Backend API"}
 
-# --- 5. Run Server ---
+# --- 6. Run Server ---
 if __name__ == "__main__":
     print("🚀 Starting Gen Jewels Local Server...")
     # '0.0.0.0' is required for Ngrok to see the server
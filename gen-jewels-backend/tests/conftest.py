@@ -0,0 +1,90 @@
+import os
+import sys
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+
+import pytest
+
+# Run from anywhere: make 'app' and 'config' importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# One throwaway database for the whole run, set before anything imports config.database.
+# The whole path runs on SQLite (aiosqlite for requests, sqlite3 for worker threads).
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from config.database import Base, engine, async_engine
+from app.models import GeneratedDesign
+from app.controllers import auth
+
+Base.metadata.create_all(bind=engine)
+
+def _dispose_async_engine():
+    # Pooled aiosqlite connections belong to the loop that opened them
+    asyncio.run(async_engine.dispose())
+
+@pytest.fixture
+def run_async():
+    """
+    Runs a coroutine on a fresh loop, then drops the async connections it opened.
+    """
+    def run(coro):
+        try:
+            return asyncio.run(coro)
+        finally:
+            _dispose_async_engine()
+    return run
+
+@pytest.fixture
+def make_client():
+    """
+    TestClient for an app with the auth routes plus the given routers.
+    Use as a context manager so the lifespan runs.
+    """
+    def build(*routers, setup=None):
+        @asynccontextmanager
+        async def lifespan(app):
+            yield
+            await async_engine.dispose()
+
+        app = FastAPI(lifespan=lifespan)
+        app.include_router(auth.router)
+        for router in routers:
+            app.include_router(router)
+        if setup:
+            setup(app)
+        return TestClient(app)
+    return build
+
+@pytest.fixture
+def signup():
+    """
+    Registers a user (and their company) through /auth/register; returns auth headers.
+    """
+    def register(client, username: str, **fields):
+        body = {
+            "username": username, "password": "s3cret-pass", "owner_name": username.title(),
+            "company_name": f"{username.title()} Jewels", "address": "Chennai", "phone_number": "000",
+        }
+        body.update(fields)
+        response = client.post("/auth/register", json=body)
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return register
+
+@pytest.fixture
+def make_design():
+    """
+    Unsaved GeneratedDesign with complete attributes; keyword arguments override them.
+    """
+    def build(user_id: int, **overrides):
+        fields = dict(
+            jewelry_type="Ring", style="Royal", material="Gold", stone="Ruby",
+            gem_theme="Peacock", size_category="Medium", finish="Matte",
+            final_prompt="gold ring", image_path="x.png",
+        )
+        fields.update(overrides)
+        return GeneratedDesign(user_id=user_id, **fields)
+    return build
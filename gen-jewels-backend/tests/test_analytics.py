@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from config.database import session_scope
+from app.models import User, DesignRollup
+from app.controllers import analytics
+from app.services.analytics_service import record_designs, rebuild_rollups
+
+def rollup_rows():
+    with session_scope() as db:
+        return sorted(db.execute(select(
+            DesignRollup.company_id, DesignRollup.day, DesignRollup.attribute, DesignRollup.value, DesignRollup.count
+        )).all())
+
+def test_rollups_and_endpoints(make_client, signup, make_design):
+    def design(user_id: int, material: str, stone: str, days_ago: int = 0):
+        return make_design(user_id, material=material, stone=stone,
+                           created_at=datetime.utcnow() - timedelta(days=days_ago))
+
+    with make_client(analytics.router) as client:
+        headers = signup(client, "meera")
+        with session_scope() as db:
+            user_id = db.query(User.id).filter(User.username == "meera").scalar()
+
+        # Same transaction as the insert, one batch per job (variations included)
+        batches = [
+            [design(user_id, "Gold", "Ruby"), design(user_id, "Gold", "Emerald")],
+            [design(user_id, "Silver", "Ruby")],
+            [design(user_id, "Gold", "Ruby", days_ago=2)],
+            [design(user_id, "Platinum", "Diamond", days_ago=40)],
+        ]
+        for batch in batches:
+            with session_scope() as db:
+                db.add_all(batch)
+                db.flush()
+                record_designs(db, batch)
+
+        top = client.get("/analytics/top/materials?days=30", headers=headers).json()
+        assert top["items"] == [{"value": "Gold", "count": 3}, {"value": "Silver", "count": 1}]
+
+        stones = client.get("/analytics/top/stones?days=365&limit=1", headers=headers).json()
+        assert stones["items"] == [{"value": "Ruby", "count": 3}]
+        assert client.get("/analytics/top/colours", headers=headers).status_code == 404
+
+        volume = client.get("/analytics/volume?days=7", headers=headers).json()
+        counts = [p["count"] for p in volume["points"]]
+        assert len(counts) == 7 and counts[-1] == 3 and counts[-3] == 1 and volume["total"] == 4
+
+        # The batch compactor reproduces the incrementally maintained rollups
+        incremental = rollup_rows()
+        with session_scope() as db:
+            assert rebuild_rollups(db, batch_size=2) >= 5
+        assert rollup_rows() == incremental
@@ -0,0 +1,145 @@
+import os
+import json
+import asyncio
+import tempfile
+
+from fastapi import Depends
+from config.database import session_scope, async_session_scope
+from app.models import User, GeneratedDesign, GenerationJob
+from app.dependencies import get_current_user
+from app.services.job_service import JobQueue, complete_job
+from app.services.event_bus import event_bus
+
+# Job tests save designs for user ids no registered user gets (the database is shared by all tests)
+JOB_USER = 9001
+
+def add_me_route(app):
+    @app.get("/me")
+    async def me(user=Depends(get_current_user)):
+        return user._asdict()
+
+def save_design(job_id: str, user_id: int):
+    with session_scope() as db:
+        design = GeneratedDesign(
+            user_id=user_id, jewelry_type="Ring", style="Modern", material="Gold", stone="Ruby",
+            gem_theme="Floral", size_category="Medium", finish="Matte",
+            final_prompt="gold ring", image_path="x.png",
+        )
+        db.add(design)
+        db.flush()
+        complete_job(db, job_id, "gold ring", [design])
+
+def test_job_roundtrip_on_async_session(run_async):
+    queue = JobQueue(workers=1)
+
+    async def handler(job_id, user_id, payload):
+        await asyncio.to_thread(save_design, job_id, user_id)
+
+    queue.register("test", handler)
+
+    async def scenario():
+        await queue.start()
+        async with async_session_scope() as db:
+            job = await queue.submit(db, JOB_USER, "test", {"n": 1})
+            submitted = job.status
+        await queue.queue.join()
+        await queue.stop()
+
+        async with async_session_scope() as db:
+            job = await db.get(GenerationJob, job.id)
+            result = (job.status, job.image_path)
+        return submitted, result
+
+    submitted, (status, image_path) = run_async(scenario())
+    assert submitted == "queued"
+    assert status == "done" and image_path == "x.png"
+
+def test_user_events_pushed_after_commit(run_async):
+    queue = JobQueue(workers=1)
+
+    async def handler(job_id, user_id, payload):
+        if payload.get("fail"):
+            raise RuntimeError("boom")
+        await asyncio.to_thread(save_design, job_id, user_id)
+
+    queue.register("test", handler)
+
+    async def scenario():
+        await queue.start()
+        async with event_bus.subscribe(f"user:{JOB_USER + 1}") as events:
+            async with async_session_scope() as db:
+                done = await queue.submit(db, JOB_USER + 1, "test", {})
+                failed = await queue.submit(db, JOB_USER + 1, "test", {"fail": True})
+            received = [await asyncio.wait_for(events.get(), timeout=10) for _ in range(2)]
+        await queue.stop()
+        return done.id, failed.id, received
+
+    done_id, failed_id, received = run_async(scenario())
+    by_type = {e["type"]: e["job"] for e in received}
+    assert by_type["done"]["job_id"] == done_id and by_type["done"]["image_url"] == "x.png"
+    assert by_type["failed"]["job_id"] == failed_id and by_type["failed"]["error"] == "boom"
+
+def test_restart_gives_up_on_crashing_jobs(run_async):
+    workdir = tempfile.mkdtemp()
+    sources = {name: os.path.join(workdir, name) for name in ("crashed", "retried", "failing")}
+    for path in sources.values():
+        open(path, "wb").close()
+
+    def discard(payload):
+        os.remove(payload["source_path"])
+
+    ran = []
+    queue = JobQueue(workers=1, max_attempts=3)
+
+    async def handler(job_id, user_id, payload):
+        ran.append(job_id)
+        if payload.get("fail"):
+            raise RuntimeError("boom")
+        await asyncio.to_thread(save_design, job_id, user_id)
+        discard(payload)
+
+    queue.register("upload", handler, cleanup=discard)
+
+    # Left "running" by a process that died: once at the limit, once below it
+    with session_scope() as db:
+        for job_id, attempts in (("crashed", 3), ("retried", 1)):
+            db.add(GenerationJob(id=job_id, user_id=JOB_USER + 2, kind="upload", status="running", attempts=attempts,
+                                 payload=json.dumps({"source_path": sources[job_id]})))
+
+    async def scenario():
+        await queue.start()
+        async with async_session_scope() as db:
+            await queue.submit(db, JOB_USER + 2, "upload", {"source_path": sources["failing"], "fail": True}, job_id="failing")
+        await queue.queue.join()
+        await queue.stop()
+        async with async_session_scope() as db:
+            jobs = {j: await db.get(GenerationJob, j) for j in sources}
+            result = {j: (job.status, job.attempts) for j, job in jobs.items()}
+        return result
+
+    result = run_async(scenario())
+    assert result["crashed"] == ("failed", 3) and "crashed" not in ran
+    assert result["retried"] == ("done", 2)
+    assert result["failing"] == ("failed", 1)
+    # Uploads are released on success, on failure and when the queue gives up
+    assert not any(os.path.exists(path) for path in sources.values())
+
+def test_register_login_and_principal(make_client, signup):
+    with make_client(setup=add_me_route) as client:
+        headers = signup(client, "asha")
+        assert client.post("/auth/register", json={
+            "username": "asha", "password": "other-pass", "owner_name": "Asha",
+            "company_name": "Asha Jewels", "address": "Chennai", "phone_number": "000",
+        }).status_code == 400
+
+        login = client.post("/auth/login", json={"username": "asha", "password": "s3cret-pass"})
+        assert login.status_code == 200
+        assert client.post("/auth/login", json={"username": "asha", "password": "wrong"}).status_code == 400
+
+        principal = client.get("/me", headers=headers).json()
+        assert principal["username"] == "asha" and principal["company_id"] is not None
+
+        # Deactivation invalidates the cached principal immediately
+        with session_scope() as db:
+            db.query(User).filter(User.username == "asha").first().is_active = False
+        assert client.get("/me", headers=headers).status_code == 401
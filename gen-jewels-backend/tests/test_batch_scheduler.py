@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from app.services.image_service import BatchScheduler
+
+class StubPipeline:
+    """
+    run_batch stand-in: records every batch and answers "prompt:seed" per item.
+    While held, the dispatcher blocks inside its current batch so new requests pile up.
+    """
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def hold(self):
+        self.release.clear()
+
+    def __call__(self, batch):
+        self.batches.append([(item["prompt"], item["seed"], item["key"]) for item in batch])
+        self.started.set()
+        self.release.wait(timeout=5)
+        if self.fail:
+            raise RuntimeError("CUDA error: out of memory")
+        return [f"{item['prompt']}:{item['seed']}" for item in batch]
+
+def busy_scheduler(pipeline: StubPipeline, **kwargs) -> BatchScheduler:
+    """
+    Scheduler whose dispatcher is stuck on a first batch, so later submits queue up together.
+    """
+    scheduler = BatchScheduler(pipeline, **kwargs)
+    pipeline.hold()
+    scheduler.submit("warmup", 0, steps=1)
+    assert pipeline.started.wait(timeout=5)
+    return scheduler
+
+def test_mixed_settings_never_share_a_batch():
+    pipeline = StubPipeline()
+    scheduler = busy_scheduler(pipeline, window_ms=50, max_batch=4)
+
+    submitted = [("a1", 40), ("b1", 12), ("a2", 40), ("b2", 12), ("a3", 40)]
+    futures = {prompt: scheduler.submit(prompt, i, steps=steps, width=1024) for i, (prompt, steps) in enumerate(submitted)}
+    pipeline.release.set()
+    results = {prompt: future.result(timeout=5) for prompt, future in futures.items()}
+
+    # Same settings batched together in arrival order; the others were carried over to the next call
+    batches = [[prompt for prompt, _, _ in batch] for batch in pipeline.batches[1:]]
+    assert batches == [["a1", "a2", "a3"], ["b1", "b2"]]
+    assert all(len({key for _, _, key in batch}) == 1 for batch in pipeline.batches)
+    assert not scheduler.carry
+
+    # Each future got its own item's result
+    assert results == {prompt: f"{prompt}:{i}" for i, (prompt, _) in enumerate(submitted)}
+
+def test_batches_are_capped_at_max_batch():
+    pipeline = StubPipeline()
+    scheduler = busy_scheduler(pipeline, window_ms=50, max_batch=2)
+
+    futures = [scheduler.submit(f"ring {i}", i, steps=40) for i in range(5)]
+    pipeline.release.set()
+    assert [f.result(timeout=5) for f in futures] == [f"ring {i}:{i}" for i in range(5)]
+    assert [len(batch) for batch in pipeline.batches[1:]] == [2, 2, 1]
+
+def test_window_flushes_a_partial_batch():
+    pipeline = StubPipeline()
+    scheduler = BatchScheduler(pipeline, window_ms=50, max_batch=4)
+
+    started = time.monotonic()
+    assert scheduler.submit("lonely ring", 7, steps=40).result(timeout=5) == "lonely ring:7"
+    assert time.monotonic() - started < 1  # Did not wait for the batch to fill
+
+    # A request arriving after the window closed goes into the next call
+    time.sleep(0.1)
+    assert scheduler.submit("late ring", 8, steps=40).result(timeout=5) == "late ring:8"
+    assert [len(batch) for batch in pipeline.batches] == [1, 1]
+
+def test_batch_failure_reaches_every_waiting_future():
+    pipeline = StubPipeline(fail=True)
+    scheduler = busy_scheduler(pipeline, window_ms=50, max_batch=4)
+
+    futures = [scheduler.submit(f"ring {i}", i, steps=40) for i in range(3)]
+    pipeline.release.set()
+    for future in futures:
+        with pytest.raises(RuntimeError, match="out of memory"):
+            future.result(timeout=5)
+    assert [len(batch) for batch in pipeline.batches] == [1, 3]
+
+    # The dispatcher survives and serves the next batch
+    pipeline.fail = False
+    assert scheduler.submit("ring", 9, steps=40).result(timeout=5) == "ring:9"
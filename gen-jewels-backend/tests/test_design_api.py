@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+from config.database import session_scope
+from app.models import User, GenerationJob
+from app.controllers import generation
+from app.services.generation_service import save_designs
+from app.services.similarity_service import vector_index
+
+def user_id(username: str) -> int:
+    with session_scope() as db:
+        return db.query(User.id).filter(User.username == username).scalar()
+
+def test_design_detail_etag_is_per_owner(make_client, signup, make_design):
+    with make_client(generation.router) as client:
+        owner = signup(client, "kavya")
+        other = signup(client, "ravi")
+        with session_scope() as db:
+            design = make_design(user_id("kavya"), final_prompt="gold jhumka with pearl drops")
+            db.add(design)
+            db.flush()
+            url = f"/generate/designs/{design.id}"
+
+        first = client.get(url, headers=owner)
+        assert first.status_code == 200 and first.json()["final_prompt"] == "gold jhumka with pearl drops"
+        etag = first.headers["ETag"]
+
+        assert client.get(url, headers={**owner, "If-None-Match": etag}).status_code == 304
+        assert client.get(url, headers={**owner, "If-None-Match": "*"}).status_code == 304
+
+        # Someone else's design stays a 404, whatever validator they send
+        for validator in (etag, "*", f'W/{etag}'):
+            assert client.get(url, headers={**other, "If-None-Match": validator}).status_code == 404
+        assert client.get("/generate/designs/999999", headers={**owner, "If-None-Match": "*"}).status_code == 404
+
+def test_history_pages_and_etags(make_client, signup, make_design, tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, "root", str(tmp_path))  # save_designs schedules embeddings
+    monkeypatch.setattr(vector_index, "indexes", {})
+
+    with make_client(generation.router) as client:
+        headers = signup(client, "divya")
+        owner = user_id("divya")
+        start = datetime(2026, 1, 1)
+        with session_scope() as db:
+            # Pairs share a timestamp, so page boundaries fall inside ties (broken by id)
+            db.add_all([
+                make_design(owner, final_prompt=f"design {i} " + "x" * 200, created_at=start + timedelta(hours=i // 2))
+                for i in range(7)
+            ])
+            db.add(make_design(owner + 1000, final_prompt="someone else's"))
+
+        # Newest first, every design exactly once across the cursor
+        pages, cursor = [], None
+        while True:
+            url = "/generate/history?limit=3" + (f"&cursor={cursor}" if cursor else "")
+            page = client.get(url, headers=headers).json()
+            pages.append(page["items"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        assert [len(items) for items in pages] == [3, 3, 1]
+        items = [item for items in pages for item in items]
+        keys = [(item["created_at"], item["id"]) for item in items]
+        assert keys == sorted(keys, reverse=True) and len(set(keys)) == 7
+        assert [item["prompt_preview"].split()[1] for item in items] == ["6", "5", "4", "3", "2", "1", "0"]
+        assert all(len(item["prompt_preview"]) == 140 for item in items)
+
+        assert client.get("/generate/history?cursor=not-a-cursor", headers=headers).status_code == 400
+
+        # Unchanged gallery: 304 from the ETag; a saved design changes it
+        first = client.get("/generate/history?limit=3", headers=headers)
+        etag = first.headers["ETag"]
+        assert client.get("/generate/history?limit=3", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+        with session_scope() as db:
+            db.add(GenerationJob(id="history-job", user_id=owner, kind="text", status="running", payload="{}"))
+        save_designs("history-job", "newest", [make_design(owner, final_prompt="newest design")])
+
+        fresh = client.get("/generate/history?limit=3", headers={**headers, "If-None-Match": etag})
+        assert fresh.status_code == 200 and fresh.headers["ETag"] != etag
+        assert fresh.json()["items"][0]["prompt_preview"] == "newest design"
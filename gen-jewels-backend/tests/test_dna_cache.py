@@ -0,0 +1,86 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageEnhance
+
+from app.services.dna_cache import DNACache, phash, dhash, perceptual_hash, hamming
+
+def ring_photo() -> Image.Image:
+    """
+    A gold ring with a red stone on a light backdrop.
+    """
+    image = Image.new("RGB", (400, 400), (235, 232, 225))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((80, 120, 320, 360), outline=(212, 175, 55), width=28)
+    draw.ellipse((165, 60, 235, 130), fill=(180, 20, 40))
+    return image
+
+def pendant_photo() -> Image.Image:
+    """
+    An unrelated design: a silver bar pendant on a dark backdrop, off to one side.
+    """
+    image = Image.new("RGB", (400, 400), (30, 30, 35))
+    draw = ImageDraw.Draw(image)
+    draw.line((300, 0, 300, 120), fill=(190, 190, 200), width=6)
+    draw.rectangle((260, 120, 340, 380), fill=(200, 200, 210))
+    return image
+
+def near_duplicates(image: Image.Image) -> list:
+    """
+    The same photo re-saved as JPEG, downscaled, and slightly brightened.
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=60)
+    recompressed = Image.open(io.BytesIO(buffer.getvalue())).convert("RGB")
+    return [recompressed, image.resize((180, 180)), ImageEnhance.Brightness(image).enhance(1.1)]
+
+def distance(a, b) -> int:
+    return bin(a[0] ^ b[0]).count("1") + bin(a[1] ^ b[1]).count("1")
+
+def test_hashes_are_64_bit_and_deterministic():
+    image = ring_photo()
+    assert perceptual_hash(image) == (phash(image), dhash(image)) == perceptual_hash(image.copy())
+    assert all(0 <= h < 2**64 for h in perceptual_hash(image))
+
+def test_near_duplicates_are_close_and_unrelated_images_far():
+    original = perceptual_hash(ring_photo())
+    for copy in near_duplicates(ring_photo()):
+        assert distance(original, perceptual_hash(copy)) <= 10
+    assert distance(original, perceptual_hash(pendant_photo())) > 30
+
+def test_hamming_matches_popcount():
+    rng = np.random.default_rng(7)
+    hashes = rng.integers(0, 2**63, size=50, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    value = (1 << 63) | 0x0F0F
+    expected = [bin(int(h) ^ value).count("1") for h in hashes]
+    assert hamming(hashes, value).tolist() == expected
+    assert hamming(hashes[:1], int(hashes[0])).tolist() == [0]
+
+def test_cache_hits_within_threshold_only(run_async):
+    cache = DNACache(max_distance=10)
+    version = "test-threshold"
+    original = perceptual_hash(ring_photo())
+    run_async(cache.put(original, version, "gold ring, red stone"))
+
+    for copy in near_duplicates(ring_photo()):
+        assert run_async(cache.get(perceptual_hash(copy), version)) == "gold ring, red stone"
+    assert run_async(cache.get(perceptual_hash(pendant_photo()), version)) is None
+    # Entries of another vision prompt version never match
+    assert run_async(cache.get(original, "test-other-version")) is None
+
+    # Exactly at the threshold still matches; one bit further does not
+    flipped = lambda bits: (original[0] ^ ((1 << bits) - 1), original[1])
+    assert run_async(cache.get(flipped(10), version)) == "gold ring, red stone"
+    assert run_async(cache.get(flipped(11), version)) is None
+    assert cache.stats()["hits"] == 4
+
+@pytest.mark.parametrize("max_distance", [0, 4])
+def test_tight_threshold_needs_exact_hash(run_async, max_distance):
+    cache = DNACache(max_distance=max_distance)
+    version = f"test-tight-{max_distance}"
+    original = perceptual_hash(ring_photo())
+    run_async(cache.put(original, version, "ring"))
+
+    assert run_async(cache.get(original, version)) == "ring"
+    assert run_async(cache.get((original[0] ^ 0b11111, original[1]), version)) is None
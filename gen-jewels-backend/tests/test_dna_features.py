@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image, ImageDraw
+
+from app.services import vision_service
+from app.services.dna_features import extract_design_features, format_design_dna, summarize_design_dna
+
+GOLD = (212, 175, 55)
+RUBY = (155, 17, 30)
+
+def gold_disc() -> Image.Image:
+    """
+    A plain gold disc centred on a white backdrop: one colour, symmetric on every axis.
+    """
+    image = Image.new("RGB", (300, 300), (255, 255, 255))
+    ImageDraw.Draw(image).ellipse((60, 60, 240, 240), fill=GOLD)
+    return image
+
+def ruby_stripes(vertical: bool) -> Image.Image:
+    image = Image.new("RGB", (300, 300), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for x in range(20, 280, 20):
+        draw.rectangle((x, 20, x + 8, 280) if vertical else (20, x, 280, x + 8), fill=RUBY)
+    return image
+
+def gold_wedge() -> Image.Image:
+    """
+    A gold triangle in the top-left corner: no mirror symmetry.
+    """
+    image = Image.new("RGB", (300, 300), (255, 255, 255))
+    ImageDraw.Draw(image).polygon([(10, 10), (150, 10), (10, 200)], fill=GOLD)
+    return image
+
+def test_palette_names_the_measured_colour():
+    features = extract_design_features(gold_disc())
+    (name, share), = features["palette"]
+    assert name == "18k yellow gold" and share > 0.95  # The white backdrop is masked out
+
+    names = [n for n, _ in extract_design_features(ruby_stripes(vertical=True))["palette"]]
+    assert names[0] == "ruby"
+
+def test_structure_tensor_finds_edge_direction():
+    vertical = extract_design_features(ruby_stripes(vertical=True))
+    horizontal = extract_design_features(ruby_stripes(vertical=False))
+    assert vertical["edge_direction"] == "vertical" and vertical["edge_coherence"] > 0.8
+    assert horizontal["edge_direction"] == "horizontal" and horizontal["edge_coherence"] > 0.8
+
+    # A disc has edges in every direction and few of them
+    disc = extract_design_features(gold_disc())
+    assert disc["edge_coherence"] < 0.1 and disc["edge_density"] < 0.04
+
+def test_symmetry_scores():
+    disc = extract_design_features(gold_disc())["symmetry"]
+    assert min(disc.values()) > 0.99
+
+    stripes = extract_design_features(ruby_stripes(vertical=True))["symmetry"]
+    assert stripes["top-bottom"] > 0.99 and stripes["left-right"] < 0.6
+
+    wedge = extract_design_features(gold_wedge())["symmetry"]
+    assert max(wedge.values()) < 0.95
+
+def test_formatted_dna_describes_the_measurements():
+    features = extract_design_features(gold_disc())
+    dna = format_design_dna(features)
+    assert dna.startswith("[PHYSICAL TOPOGRAPHY]") and "[JEWELRY DESIGN PROMPT]" in dna
+    assert "18k yellow gold" in dna and "strong left-right symmetry" in dna and "pure metalwork" in dna
+
+    summary = summarize_design_dna(extract_design_features(ruby_stripes(vertical=True)))
+    assert summary.startswith("[MEASURED]") and "ruby" in summary and "parallel vertical linework" in summary
+
+@pytest.fixture
+def remote_vision(monkeypatch):
+    """
+    A vision model that answers "REMOTE DNA"; calls lists what it was asked.
+    """
+    calls = []
+
+    async def chat(messages, **kwargs):
+        calls.append(kwargs)
+        return "REMOTE DNA"
+
+    monkeypatch.setattr(vision_service, "llm_router", SimpleNamespace(enabled=True, chat=chat))
+    return calls
+
+def test_local_mode_skips_the_vision_model(remote_vision, monkeypatch, run_async):
+    monkeypatch.setattr(vision_service, "DNA_MODE", "local")
+    features = extract_design_features(gold_disc())
+
+    dna = run_async(vision_service.analyze_design_dna(b"img", features=features))
+    assert dna == format_design_dna(features) and remote_vision == []
+
+    # Nothing measured (undecodable upload): local mode still asks the model
+    assert run_async(vision_service.analyze_design_dna(b"img")) == "REMOTE DNA"
+
+@pytest.mark.parametrize("enrich", [True, False])
+def test_remote_mode_enrichment_switch(remote_vision, monkeypatch, run_async, enrich):
+    monkeypatch.setattr(vision_service, "DNA_MODE", "remote")
+    monkeypatch.setattr(vision_service, "DNA_ENRICH", enrich)
+    features = extract_design_features(gold_disc())
+
+    dna = run_async(vision_service.analyze_design_dna(b"img", features=features))
+    assert len(remote_vision) == 1
+    if enrich:
+        assert dna == f"REMOTE DNA\n{summarize_design_dna(features)}"
+    else:
+        assert dna == "REMOTE DNA"
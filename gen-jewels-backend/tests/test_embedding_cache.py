@@ -0,0 +1,90 @@
+import torch
+
+from app.services import image_service
+from app.services.embedding_cache import PromptEmbeddingCache, normalize_prompt
+from app.services.image_service import SDXLService
+
+KB = 1024
+
+def entry(kb: int, cfg: bool = True) -> tuple:
+    """
+    A fake text-encoder output weighing `kb` KiB: float32 embeds and pooled embeds, negatives only with CFG.
+    """
+    embeds = torch.zeros(kb * KB // 4 - 64)
+    pooled = torch.zeros(64)
+    return (embeds, embeds.clone() if cfg else None, pooled, pooled.clone() if cfg else None)
+
+def test_key_normalisation():
+    assert normalize_prompt("  Gold   Jhumka\twith\nPEARL drops ") == "gold jhumka with pearl drops"
+
+    key = PromptEmbeddingCache.make_key("Gold  Ring", "sdxl-base", True)
+    assert key == PromptEmbeddingCache.make_key(" gold ring", "sdxl-base", True)
+    # Another model or guidance mode encodes differently
+    assert key != PromptEmbeddingCache.make_key("gold ring", "sdxl-turbo", True)
+    assert key != PromptEmbeddingCache.make_key("gold ring", "sdxl-base", False)
+
+def test_hits_and_misses_are_counted():
+    cache = PromptEmbeddingCache(max_mb=1)
+    key = cache.make_key("gold ring", "sdxl-base", True)
+
+    assert cache.get(key) is None
+    cache.put(key, entry(128))
+    assert cache.get(cache.make_key("GOLD RING ", "sdxl-base", True)) is not None
+    assert cache.get(key)[0].nelement() == 128 * KB // 4 - 64
+    assert cache.stats() == {"entries": 1, "bytes": 2 * 128 * KB, "hits": 2, "misses": 1, "evictions": 0}
+
+    cache.put(key, entry(64))  # Replacing an entry re-counts its size
+    assert cache.stats()["bytes"] == 2 * 64 * KB
+
+    # Without CFG there are no negatives to store
+    cache.put(cache.make_key("gold ring", "sdxl-base", False), entry(64, cfg=False))
+    assert cache.stats()["bytes"] == 3 * 64 * KB
+
+def test_evicts_least_recently_used_within_byte_budget():
+    cache = PromptEmbeddingCache(max_mb=1)  # Room for four 256 KiB entries
+    keys = [cache.make_key(f"ring {i}", "sdxl-base", True) for i in range(5)]
+    for key in keys[:4]:
+        cache.put(key, entry(128))
+    assert cache.stats()["bytes"] == 1024 * KB and cache.stats()["evictions"] == 0
+
+    cache.get(keys[0])  # Used recently, so ring 1 is now the oldest
+    cache.put(keys[4], entry(128))
+    assert cache.get(keys[1]) is None
+    assert all(cache.get(key) is not None for key in (keys[0], keys[2], keys[3], keys[4]))
+
+    # A large entry pushes out as many old ones as it needs
+    big = cache.make_key("bridal set", "sdxl-base", True)
+    cache.put(big, entry(300))
+    assert list(cache.entries) == [keys[4], big]
+    assert cache.stats()["evictions"] == 4 and cache.stats()["bytes"] <= cache.max_bytes
+
+    # An entry over the whole budget is not cached (and evicts nothing)
+    cache.put(cache.make_key("crown", "sdxl-base", True), entry(600))
+    assert list(cache.entries) == [keys[4], big]
+
+class CountingPipe:
+    _execution_device = "cpu"
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode_prompt(self, prompt, **kwargs):
+        self.encoded.append(list(prompt))
+        n = len(prompt)
+        rows = torch.arange(n, dtype=torch.float32)
+        return rows.view(n, 1, 1).expand(n, 2, 4), rows.view(n, 1, 1).expand(n, 2, 4), rows.view(n, 1).expand(n, 4), None
+
+def test_encoder_only_runs_on_misses(monkeypatch):
+    monkeypatch.setattr(image_service, "embedding_cache", PromptEmbeddingCache(max_mb=1))
+    service = SDXLService("cpu")
+    service.pipe = CountingPipe()
+
+    embeds, negative, pooled, negative_pooled = service._encode(["gold ring", "Gold  Ring", "silver anklet"], do_cfg=True)
+    assert len(service.pipe.encoded) == 1 and len(service.pipe.encoded[0]) == 2  # A repeated prompt is encoded once
+    assert embeds.shape == (3, 2, 4) and negative_pooled is None
+    assert pooled[:, 0].tolist() == [0, 0, 1]  # Each batch row gets its own prompt's entry
+
+    service._encode(["silver anklet", "gold ring"], do_cfg=True)
+    service._encode(["silver anklet", "ruby pendant"], do_cfg=True)
+    assert service.pipe.encoded[1:] == [["ruby pendant"]]
+    assert image_service.embedding_cache.stats()["hits"] == 3
@@ -0,0 +1,185 @@
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+import torch
+from PIL import Image
+from pydantic import ValidationError
+
+from app.services import image_service
+from app.services.image_service import (
+    SDXLService, SDXLWorkerPool, GUIDANCE_SCALE, RenderSettings, FULL_RENDER, default_seed, random_seed
+)
+from app.services.result_cache import ResultCache
+from app.schemas import DesignRequest
+from app.services.generation_service import variation_seeds
+from config.settings import SEED_RANGE
+
+class FakePipe:
+    """
+    Stands in for the SDXL pipeline: encodes to zeros and returns images of the requested size,
+    each filled with a colour taken from its generator's seed.
+    """
+    _execution_device = "cpu"
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+
+    def encode_prompt(self, prompt, **kwargs):
+        n = len(prompt)
+        return torch.zeros(n, 2, 4), torch.zeros(n, 2, 4), torch.zeros(n, 4), torch.zeros(n, 4)
+
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.fail:
+            raise RuntimeError("CUDA error: out of memory")
+        size = (kwargs["width"], kwargs["height"])
+        return SimpleNamespace(images=[Image.new("RGB", size, (g.initial_seed() % 256, 0, 0)) for g in kwargs["generator"]])
+
+@pytest.fixture
+def worker(monkeypatch):
+    """
+    SDXLService on a failing FakePipe; a reload swaps in a working one.
+    """
+    service = SDXLService("cpu")
+    service.pipe = FakePipe(fail=True)
+    monkeypatch.setattr(service, "_load_models", lambda: setattr(service, "pipe", FakePipe()))
+    return service
+
+def render(service: SDXLService):
+    return service.batcher.submit(
+        "gold ring", 1, num_inference_steps=2, guidance_scale=GUIDANCE_SCALE, width=64, height=64,
+    ).result()
+
+def test_failing_worker_stays_unhealthy_until_probe_succeeds(worker, monkeypatch):
+    monkeypatch.setattr(image_service, "SD_WORKER_MAX_FAILURES", 2)
+    monkeypatch.setattr(image_service, "SD_WORKER_COOLDOWN_SECONDS", 0.3)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            render(worker)
+
+    # Restarted, but kept out of rotation through the cooldown
+    assert worker.restarts == 1 and worker.pipe is None
+    assert not worker.healthy and worker.failures == 2
+
+    pool = SDXLWorkerPool([])
+    standby = SDXLService("cpu")
+    pool.workers = [worker, standby]
+    assert pool._acquire() is standby
+
+    # Cooldown over: the next batch is the probe, and only its success resets the count
+    time.sleep(0.35)
+    assert worker.healthy
+    assert render(worker).size == (64, 64)
+    assert worker.failures == 0 and worker.healthy
+
+def test_failed_probe_restarts_the_cooldown(worker, monkeypatch):
+    monkeypatch.setattr(image_service, "SD_WORKER_MAX_FAILURES", 1)
+    monkeypatch.setattr(image_service, "SD_WORKER_COOLDOWN_SECONDS", 0.2)
+    monkeypatch.setattr(worker, "_load_models", lambda: setattr(worker, "pipe", FakePipe(fail=True)))
+
+    with pytest.raises(RuntimeError):
+        render(worker)
+    time.sleep(0.25)
+    assert worker.healthy
+
+    with pytest.raises(RuntimeError):
+        render(worker)
+    assert worker.restarts == 2 and worker.failures == 2
+    assert not worker.healthy
+
+def test_batched_items_keep_their_own_seed_and_result():
+    service = SDXLService("cpu")
+    service.pipe = FakePipe()
+    seeds = [11, 22, 33]
+    futures = [
+        service.batcher.submit(f"ring {seed}", seed, num_inference_steps=2, guidance_scale=GUIDANCE_SCALE,
+                               width=64, height=64)
+        for seed in seeds
+    ]
+    images = [future.result(timeout=10) for future in futures]
+
+    (call,) = service.pipe.calls  # One pipeline call for the three requests
+    assert [g.initial_seed() for g in call["generator"]] == seeds
+    assert len({id(g) for g in call["generator"]}) == 3
+    assert [image.getpixel((0, 0))[0] for image in images] == seeds
+
+def test_warmup_runs_a_full_size_render_through_the_batcher():
+    service = SDXLService("cpu")
+    service.pipe = FakePipe()
+    service.warmup()
+
+    (call,) = service.pipe.calls
+    assert call["num_inference_steps"] == 1
+    assert (call["width"], call["height"]) == image_service.SDXL_RESOLUTION
+    assert service.failures == 0 and service.healthy
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    """
+    One-worker pool on a FakePipe, storing results under tmp_path.
+    """
+    monkeypatch.setattr(image_service, "STORAGE_DIR", str(tmp_path))
+    pool = SDXLWorkerPool([])
+    pool.results = ResultCache(str(tmp_path))
+    worker = SDXLService("cpu")
+    worker.pipe = FakePipe()
+    pool.workers = [worker]
+    return pool
+
+def test_identical_unseeded_requests_share_one_render(pool):
+    small = RenderSettings(2, 64, 64)
+    pipe = pool.workers[0].pipe
+
+    # Submitted together: the second waits on the first's render
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first, second = executor.map(lambda _: pool.generate("gold ring", render=small), range(2))
+    assert first == second and len(pipe.calls) == 1
+    assert first.seed == default_seed("gold ring", small) < SEED_RANGE
+
+    # ...and later ones reuse the stored image
+    assert pool.generate("gold ring", render=small) == first and len(pipe.calls) == 1
+
+    # Other settings or an explicit (regenerate) seed are new renders
+    assert pool.generate("gold ring", render=RenderSettings(3, 64, 64)).seed != first.seed
+    fresh = pool.generate("gold ring", seed=random_seed(), render=small)
+    assert fresh.image_path != first.image_path and len(pipe.calls) == 3
+
+def test_seeds_fit_a_signed_int32_column():
+    assert all(0 <= random_seed() < SEED_RANGE for _ in range(1000))
+    assert all(0 <= default_seed(f"ring {i}", FULL_RENDER) < SEED_RANGE for i in range(1000))
+    assert SEED_RANGE == 2**31
+
+    fields = dict(jewelry_type="Ring", style="Royal", material="Gold", stone="Ruby",
+                  theme="Peacock", size="Medium", finish="Matte")
+    assert DesignRequest(**fields, seed=SEED_RANGE - 1).seed == SEED_RANGE - 1
+    for seed in (SEED_RANGE, -1):
+        with pytest.raises(ValidationError):
+            DesignRequest(**fields, seed=seed)
+
+def test_variation_seeds_wrap_inside_the_seed_range():
+    assert variation_seeds(7, 3) == [7, 8, 9]
+    assert variation_seeds(SEED_RANGE - 2, 4) == [SEED_RANGE - 2, SEED_RANGE - 1, 0, 1]
+
+def test_init_image_is_letterboxed_not_cropped():
+    # A tall necklace shot on a cream backdrop, with red markers at the very top and bottom
+    photo = Image.new("RGB", (400, 1000), (240, 235, 225))
+    photo.paste((200, 0, 0), (150, 0, 250, 40))
+    photo.paste((200, 0, 0), (150, 960, 250, 1000))
+
+    prepared = image_service.prepare_init_image(photo)
+    assert prepared.size == image_service.SDXL_RESOLUTION and prepared.mode == "RGB"
+    assert prepared.getpixel((512, 10))[0] > 150 and prepared.getpixel((512, 1013))[0] > 150  # Both ends kept
+    assert prepared.getpixel((20, 512)) == (240, 235, 225)  # Bars in the backdrop colour
+
+    # EXIF rotation is applied first
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotated 90° clockwise
+    buffer = io.BytesIO()
+    photo.save(buffer, "JPEG", exif=exif)
+    rotated = image_service.prepare_init_image(Image.open(io.BytesIO(buffer.getvalue())))
+    assert rotated.getpixel((10, 512))[0] > 150 and rotated.getpixel((512, 20))[1] > 200
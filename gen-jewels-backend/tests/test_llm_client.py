@@ -0,0 +1,88 @@
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services.llm_client import LLMClient
+
+# ─── Fake Groq server ───
+# /slow answers after SLOW_SECONDS, /flaky fails with 503 twice before answering.
+SLOW_SECONDS = 2.0
+
+class FakeGroq(BaseHTTPRequestHandler):
+    flaky_calls = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if self.path.startswith("/slow"):
+            time.sleep(SLOW_SECONDS)
+        elif self.path.startswith("/flaky"):
+            FakeGroq.flaky_calls += 1
+            if FakeGroq.flaky_calls <= 2:
+                self.send_response(503)
+                self.end_headers()
+                return
+
+        body = json.dumps({"choices": [{"message": {"content": "gold ring, 8k"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGroq)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def test_slow_llm_does_not_block_event_loop():
+    server, url = start_server()
+
+    async def scenario():
+        client = LLMClient(api_key="test", base_url=f"{url}/slow")
+        client.open()  # As main.py does at startup
+        llm_call = asyncio.create_task(client.chat("fake-model", [{"role": "user", "content": "hi"}]))
+
+        # Stand-ins for /health and auth requests arriving while Groq is thinking
+        served, worst_lag = 0, 0.0
+        while not llm_call.done():
+            started = time.monotonic()
+            await asyncio.sleep(0.01)
+            worst_lag = max(worst_lag, time.monotonic() - started - 0.01)
+            served += 1
+
+        content = await llm_call
+        await client.aclose()
+        return content, served, worst_lag
+
+    try:
+        content, served, worst_lag = asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+    assert content == "gold ring, 8k"
+    assert served > 50
+    assert worst_lag < 0.2
+
+def test_retries_transient_errors():
+    server, url = start_server()
+
+    async def scenario():
+        client = LLMClient(api_key="test", base_url=f"{url}/flaky")
+        try:
+            return await client.chat("fake-model", [{"role": "user", "content": "hi"}])
+        finally:
+            await client.aclose()
+
+    try:
+        content = asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+    assert content == "gold ring, 8k"
+    assert FakeGroq.flaky_calls == 3
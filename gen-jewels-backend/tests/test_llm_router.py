@@ -0,0 +1,144 @@
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services.llm_client import LLMClient
+from app.services.llm_router import LLMRouter, CircuitOpenError
+
+# ─── Fake Groq server with fault injection ───
+# FAULTS[model] = {"delay": seconds, "status": http status}; CALLS counts hits per model.
+FAULTS = {}
+CALLS = {}
+
+class FaultyGroq(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        model = body["model"]
+        CALLS[model] = CALLS.get(model, 0) + 1
+        fault = FAULTS.get(model, {})
+
+        time.sleep(fault.get("delay", 0))
+        status = fault.get("status", 200)
+        if status != 200:
+            self.send_response(status)
+            self.end_headers()
+            return
+
+        reply = json.dumps({"choices": [{"message": {"content": f"answer from {model}"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        try:
+            self.wfile.write(reply)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Hedge loser: the router cancelled this call
+
+    def log_message(self, *args):
+        pass
+
+def run(scenario_factory, **router_options):
+    """
+    Starts the fake server, builds a router over models "primary"/"backup" and runs the scenario.
+    """
+    FAULTS.clear()
+    CALLS.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FaultyGroq)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    async def main():
+        client = LLMClient(api_key="test", base_url=url)
+        client.open()
+        router = LLMRouter(client=client, models=["primary", "backup"], **router_options)
+        try:
+            return await scenario_factory(router)
+        finally:
+            await client.aclose()
+
+    try:
+        return asyncio.run(main())
+    finally:
+        server.shutdown()
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+def test_breaker_fails_fast_while_open():
+    async def scenario(router):
+        FAULTS["primary"] = {"status": 503}
+        for _ in range(3):
+            try:
+                await router.chat(MESSAGES, models=["primary"])
+            except Exception:
+                pass
+        hits_when_opened = CALLS["primary"]
+
+        started = time.monotonic()
+        try:
+            await router.chat(MESSAGES, models=["primary"])
+            raise AssertionError("expected CircuitOpenError")
+        except CircuitOpenError:
+            pass
+        return hits_when_opened, time.monotonic() - started, router.stats()
+
+    hits, elapsed, stats = run(scenario, failure_threshold=3, reset_seconds=60, hedge=False)
+    assert stats["models"]["primary"]["breaker"] == "open"
+    assert CALLS["primary"] == hits
+    assert elapsed < 0.05
+
+def test_breaker_half_open_probe_recovers():
+    async def scenario(router):
+        FAULTS["primary"] = {"status": 503}
+        for _ in range(2):
+            try:
+                await router.chat(MESSAGES, models=["primary"])
+            except Exception:
+                pass
+        state_open = router.stats()["models"]["primary"]["breaker"]
+
+        await asyncio.sleep(0.3)
+        FAULTS["primary"] = {}
+        content = await router.chat(MESSAGES, models=["primary"])
+        return state_open, content, router.stats()["models"]["primary"]["breaker"]
+
+    state_open, content, state_after = run(scenario, failure_threshold=2, reset_seconds=0.2, hedge=False)
+    assert state_open == "open"
+    assert content == "answer from primary"
+    assert state_after == "closed"
+
+def test_hedge_races_backup_after_delay():
+    async def scenario(router):
+        FAULTS["primary"] = {"delay": 2.0}
+        started = time.monotonic()
+        content = await router.chat(MESSAGES, prefer="primary")
+        return content, time.monotonic() - started, router.stats()
+
+    content, elapsed, stats = run(scenario, hedge=True, hedge_default_seconds=0.2)
+    assert content == "answer from backup"
+    assert elapsed < 1.0
+    assert stats["hedges_fired"] == 1 and stats["hedges_won"] == 1
+
+def test_routes_to_faster_model():
+    async def scenario(router):
+        FAULTS["primary"] = {"delay": 0.3}
+        for _ in range(5):
+            await router.chat(MESSAGES, models=["primary"])
+            await router.chat(MESSAGES, models=["backup"])
+        CALLS.clear()
+        content = await router.chat(MESSAGES, prefer="primary")
+        return content, dict(CALLS)
+
+    content, calls = run(scenario, hedge=False)
+    assert content == "answer from backup"
+    assert calls == {"backup": 1}
+
+def test_failover_on_error():
+    async def scenario(router):
+        FAULTS["primary"] = {"status": 500}
+        return await router.chat(MESSAGES, prefer="primary")
+
+    content = run(scenario, hedge=False)
+    assert content == "answer from backup"
+    assert CALLS["primary"] == 1  # No retries on a model that has a stand-in
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import prompt_service
+from app.services.prompt_cache import PromptCache, prompt_version, spec_key
+
+HOUR = 3600
+
+class Clock:
+    def __init__(self, now: float = 1_767_225_600):  # 2026-01-01
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+def spec(note: str) -> dict:
+    return {"jewelry_type": "Ring", "style": "Temple", "material": "Gold", "extra_text": note}
+
+def test_entries_expire_after_the_ttl(run_async):
+    clock = Clock()
+    cache = PromptCache(ttl_hours=2, clock=clock)
+    version = prompt_version("system prompt", "model")
+    key = spec_key(spec("ttl"), version)
+    run_async(cache.put(key, version, "temple gold ring"))
+
+    clock.now += 2 * HOUR - 60
+    assert run_async(cache.get(key, version)) == "temple gold ring"
+    # Another process (cold memory) reads it from the table, keeping the original age
+    restarted = PromptCache(ttl_hours=2, clock=clock)
+    assert run_async(restarted.get(key, version)) == "temple gold ring"
+    assert restarted.entries[key][1] == clock.now - (2 * HOUR - 60)
+
+    clock.now += 120
+    assert run_async(cache.get(key, version)) is None
+    assert run_async(PromptCache(ttl_hours=2, clock=clock).get(key, version)) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_new_prompt_version_invalidates_entries(run_async):
+    cache = PromptCache(clock=Clock())
+    old = prompt_version("system prompt", "model")
+    new = prompt_version("system prompt, edited", "model")
+    assert old != new and prompt_version("system prompt", "other model") != old
+
+    data = spec("versioned")
+    assert spec_key(data, old) != spec_key(data, new)
+    run_async(cache.put(spec_key(data, old), old, "from the old prompt"))
+    assert run_async(cache.get(spec_key(data, new), new)) is None
+
+    # Even under the same key, the table only answers for the version that wrote it
+    assert run_async(PromptCache(clock=Clock()).get(spec_key(data, old), new)) is None
+
+@pytest.fixture
+def llm(monkeypatch):
+    """
+    An LLM that numbers its answers; the prompt cache runs on a fixed clock.
+    """
+    calls = []
+
+    async def chat(messages, **kwargs):
+        calls.append(messages)
+        return f"enhanced prompt {len(calls)}"
+
+    monkeypatch.setattr(prompt_service, "llm_router", SimpleNamespace(enabled=True, chat=chat))
+    monkeypatch.setattr(prompt_service, "prompt_cache", PromptCache(ttl_hours=1, clock=Clock()))
+    return calls
+
+def test_enhanced_prompt_is_cached_per_template_version(llm, monkeypatch, run_async):
+    data = spec("with a peacock motif")
+    first = run_async(prompt_service.generate_enhanced_prompt(data))
+    assert run_async(prompt_service.generate_enhanced_prompt(dict(data, style="  temple "))) == first
+    assert len(llm) == 1
+
+    # Editing the wizard system prompt bumps the version: the LLM is asked again
+    monkeypatch.setattr(prompt_service, "WIZARD_PROMPT_VERSION", prompt_version("edited wizard prompt", "model"))
+    assert run_async(prompt_service.generate_enhanced_prompt(data)) == "enhanced prompt 2"
+
+    prompt_service.prompt_cache.clock.now += HOUR
+    assert run_async(prompt_service.generate_enhanced_prompt(data)) == "enhanced prompt 3"
@@ -0,0 +1,109 @@
+import os
+import re
+import tempfile
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from config.database import Base, engine, session_scope, async_session_scope
+from app.services.search_service import (
+    ensure_search_index, search_designs, search_query, InvalidSearch, FTS_TABLE, PG_SEARCH_DDL
+)
+
+USER_ID = 42
+OTHER_USER = 43
+
+def test_fulltext_search(run_async, make_design):
+    def design(prompt: str, material: str = "Gold", note: str = None):
+        return make_design(USER_ID, material=material, final_prompt=prompt, extra_text=note)
+
+    def search(q: str, limit: int = 10, cursor: str = None, user_id: int = USER_ID, **filters):
+        async def run():
+            async with async_session_scope() as db:
+                return await search_designs(db, user_id, q, filters, limit, cursor)
+        return run_async(run())
+
+    # Designs saved before the index exists are picked up by the initial rebuild
+    with session_scope() as db:
+        db.add(design("antique gold peacock necklace with rubies"))
+    ensure_search_index(engine)
+    ensure_search_index(engine)  # Idempotent
+
+    # ...and later inserts by the triggers
+    with session_scope() as db:
+        db.add_all([
+            design("silver peacock pendant", material="Silver"),
+            design("gold ring, ruby halo", note="for my sister's wedding"),
+            design("plain gold band"),
+        ] + [design(f"gold bangle number {i}") for i in range(5)])
+
+    rows, _ = search("peacock")
+    assert len(rows) == 2 and all("peacock" in r["prompt_preview"] for r in rows)
+
+    rows, _ = search("ruby gold")  # Stemmed: matches "rubies" too
+    assert {r["prompt_preview"] for r in rows} == {"antique gold peacock necklace with rubies", "gold ring, ruby halo"}
+
+    rows, _ = search("wedding")  # The user's note is indexed too
+    assert [r["prompt_preview"] for r in rows] == ["gold ring, ruby halo"]
+
+    rows, _ = search("peacock", material="Silver")
+    assert [r["prompt_preview"] for r in rows] == ["silver peacock pendant"]
+
+    rows, _ = search("pea")  # Prefix on the last word
+    assert len(rows) == 2
+
+    # Another user's designs are outside the partition, and the user id itself is not searchable
+    with session_scope() as db:
+        db.add(make_design(OTHER_USER, final_prompt="gold peacock choker 42"))
+    assert len(search("peacock")[0]) == 2
+    assert [r["prompt_preview"] for r in search("peacock", user_id=OTHER_USER)[0]] == ["gold peacock choker 42"]
+    assert search("42")[0] == []
+
+    # Keyset pages cover every match exactly once, even when designs are added between pages
+    before = {r["id"] for r in search("gold", limit=20)[0]}
+    first, cursor = search("gold", limit=3)
+    with session_scope() as db:
+        db.add_all([make_design(OTHER_USER, final_prompt="gold " * 5) for _ in range(20)]
+                   + [design("gold leaf gold filigree gold"), design("rose gold")])
+    seen = [r["id"] for r in first]
+    while cursor:
+        rows, cursor = search("gold", limit=3, cursor=cursor)
+        seen += [r["id"] for r in rows]
+    assert len(before) == 8
+    assert len(seen) == len(set(seen)) and before <= set(seen)
+
+    for bad in ['"', "*", "()"]:
+        try:
+            search(bad)
+        except InvalidSearch:
+            continue
+        assert False, bad
+    # FTS syntax is quoted, not interpreted
+    assert search("NEAR(")[0] == []
+    assert search('gold" OR "silver')[0] == []
+
+def test_old_fts_table_is_rebuilt_per_user():
+    legacy = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'legacy.db')}")
+    Base.metadata.create_all(bind=legacy)
+    with legacy.begin() as conn:
+        conn.execute(text(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(final_prompt, extra_text, "
+                          "content='generated_designs', content_rowid='id')"))
+    ensure_search_index(legacy)
+    with legacy.connect() as conn:
+        sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = :name"), {"name": FTS_TABLE}).scalar()
+        triggers = conn.execute(text("SELECT count(*) FROM sqlite_master WHERE type = 'trigger'")).scalar()
+    assert "user_id" in sql and triggers == 3
+    legacy.dispose()
+
+def test_postgres_search_sql():
+    page = search_query("postgresql", USER_ID, "ruby necklace", {"material": "Gold"}, 10, cursor=None)
+    sql = re.sub(r"::[A-Z]+", "", str(page.compile(dialect=postgresql.dialect())))  # Bind casts vary by version
+    document = "to_tsvector('english', coalesce(final_prompt, '') || ' ' || coalesce(extra_text, ''))"
+    # Same expression as the index, next to the user_id equality the btree_gin index leads with
+    assert f"{document} @@ websearch_to_tsquery('english', %(websearch_to_tsquery_1)s)" in sql
+    assert "generated_designs.user_id = %(user_id_1)s" in sql
+    assert f"-ts_rank_cd({document}, websearch_to_tsquery('english', %(websearch_to_tsquery_1)s))" in sql
+    assert "ORDER BY anon_1.score, anon_1.id DESC" in sql and "LIMIT %(param_1)s" in sql
+
+    ddl = " ".join(PG_SEARCH_DDL)
+    assert "CREATE EXTENSION IF NOT EXISTS btree_gin" in ddl
+    assert f"USING GIN (user_id, ({document}))" in ddl
@@ -0,0 +1,193 @@
+import io
+import os
+import json
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from config.database import session_scope
+from app.models import User
+from app.controllers import generation
+from app.services import image_service, similarity_service
+from app.services.similarity_service import CompanyIndex, EMBEDDING_DIM, EMBEDDING_VERSION, vector_index
+from app.utils.security import get_hashed_password, create_access_token
+
+def random_vectors(n: int, seed: int) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(n, EMBEDDING_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def meta(directory: str) -> dict:
+    with open(os.path.join(directory, "meta.json")) as f:
+        return json.load(f)
+
+def test_add_grow_and_reopen(tmp_path, monkeypatch):
+    monkeypatch.setattr(CompanyIndex, "INITIAL_CAPACITY", 4)
+    directory = str(tmp_path / "company_1")
+    vectors = random_vectors(11, seed=1)
+
+    index = CompanyIndex(directory)
+    assert (index.count, index.capacity) == (0, 4)
+    index.add(np.arange(1, 4), vectors[:3])
+    index.add(np.arange(4, 12), vectors[3:])  # 11 rows: doubles 4 -> 8 -> 16
+    assert (index.count, index.capacity) == (11, 16)
+    assert meta(directory) == {"count": 11, "version": EMBEDDING_VERSION}
+    assert os.path.getsize(os.path.join(directory, "vectors.f16")) == 16 * EMBEDDING_DIM * 2
+
+    reopened = CompanyIndex(directory)
+    assert (reopened.count, reopened.capacity) == (11, 16)
+    assert reopened.indexed_ids() == set(range(1, 12))
+    assert np.allclose(reopened.vector_of(7), vectors[6], atol=1e-3)
+    assert reopened.vector_of(99) is None
+
+    # New embedding features: the old vectors are useless, the index starts over
+    monkeypatch.setattr(similarity_service, "EMBEDDING_VERSION", "test-next")
+    rebuilt = CompanyIndex(directory)
+    assert rebuilt.count == 0 and rebuilt.indexed_ids() == set()
+    assert meta(directory) == {"count": 0, "version": "test-next"}
+
+def test_chunked_top_k_matches_brute_force(tmp_path, monkeypatch):
+    monkeypatch.setattr(similarity_service, "SIMILAR_SEARCH_CHUNK", 64)
+    vectors = random_vectors(1000, seed=2)
+    ids = np.arange(1000, 2000)
+    index = CompanyIndex(str(tmp_path / "company_2"))
+    index.add(ids[:600], vectors[:600])
+    index.add(ids[600:], vectors[600:])
+
+    queries = random_vectors(5, seed=3)
+    stored = vectors.astype(np.float16).astype(np.float32)
+    expected = np.argsort(-(queries @ stored.T), axis=1)[:, :10]
+
+    results = index.search(queries, k=10)
+    assert len(results) == 5
+    for hits, best in zip(results, expected):
+        assert [design_id for design_id, _ in hits] == ids[best].tolist()
+        scores = [score for _, score in hits]
+        assert scores == sorted(scores, reverse=True)
+
+def test_exclude_and_duplicate_rows(tmp_path):
+    vectors = random_vectors(50, seed=4)
+    index = CompanyIndex(str(tmp_path / "company_3"))
+    index.add(np.arange(50), vectors)
+    index.add(np.array([0]), vectors[:1])  # Indexed twice (save racing the backfill)
+
+    (hits,) = index.search(vectors[0], k=5)
+    assert hits[0][0] == 0 and len({design_id for design_id, _ in hits}) == 5
+
+    (full,) = index.search(vectors[0], k=8)
+    exclude = {design_id for design_id, _ in full[:3]}
+    (hits,) = index.search(vectors[0], k=5, exclude=exclude)
+    assert [design_id for design_id, _ in hits] == [design_id for design_id, _ in full[3:8]]
+
+    assert CompanyIndex(str(tmp_path / "empty")).search(vectors[:2], k=3) == [[], []]
+
+# ─── Endpoints ───
+
+def gold_disc(radius: int = 90) -> Image.Image:
+    image = Image.new("RGB", (300, 300), (255, 255, 255))
+    ImageDraw.Draw(image).ellipse((150 - radius, 150 - radius, 150 + radius, 150 + radius), fill=(212, 175, 55))
+    return image
+
+def ruby_stripes() -> Image.Image:
+    image = Image.new("RGB", (300, 300), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for x in range(20, 280, 20):
+        draw.rectangle((x, 20, x + 8, 280), fill=(155, 17, 30))
+    return image
+
+def silver_bar() -> Image.Image:
+    image = Image.new("RGB", (300, 300), (30, 30, 35))
+    ImageDraw.Draw(image).rectangle((120, 40, 180, 260), fill=(200, 200, 210))
+    return image
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """
+    Design images, uploads and vector indexes under tmp_path.
+    """
+    monkeypatch.setattr(image_service, "STORAGE_DIR", str(tmp_path / "generated_image"))
+    monkeypatch.setattr(generation, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(vector_index, "root", str(tmp_path / "vector_index"))
+    monkeypatch.setattr(vector_index, "indexes", {})
+    os.makedirs(image_service.STORAGE_DIR)
+    return tmp_path
+
+def save_designs(make_design, user_id: int, images: dict) -> dict:
+    """
+    Stores each image as a design of the user; returns {name: design_id}.
+    """
+    ids = {}
+    with session_scope() as db:
+        for name, image in images.items():
+            image.save(os.path.join(image_service.STORAGE_DIR, f"{name}.png"))
+            design = make_design(user_id, final_prompt=name, image_path=f"storage/generated_image/{name}.png")
+            db.add(design)
+            db.flush()
+            ids[name] = design.id
+    return ids
+
+def user_id(username: str) -> int:
+    with session_scope() as db:
+        return db.query(User.id).filter(User.username == username).scalar()
+
+def png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+def test_similar_endpoints(storage, make_client, signup, make_design):
+    with make_client(generation.router) as client:
+        headers = signup(client, "lakshmi")
+        owner = user_id("lakshmi")
+        ids = save_designs(make_design, owner, {
+            "disc": gold_disc(), "small-disc": gold_disc(radius=75), "stripes": ruby_stripes(), "bar": silver_bar(),
+        })
+        # Indexed by the background worker (one thread, so the marker runs after it)
+        vector_index.schedule(owner, [(i, f"storage/generated_image/{name}.png") for name, i in ids.items()
+                                      if name != "small-disc"])
+        vector_index.executor.submit(lambda: None).result()
+
+        response = client.get(f"/generate/designs/{ids['disc']}/similar?k=2", headers=headers)
+        assert response.status_code == 200
+        assert {item["id"] for item in response.json()["items"]} == {ids["stripes"], ids["bar"]}  # Itself excluded
+
+        # A design that is not indexed yet is embedded on the fly
+        items = client.get(f"/generate/designs/{ids['small-disc']}/similar", headers=headers).json()["items"]
+        assert items[0]["id"] == ids["disc"] and items[0]["prompt_preview"] == "disc"
+
+        vector_index.schedule(owner, [(ids["small-disc"], "storage/generated_image/small-disc.png")])
+        vector_index.executor.submit(lambda: None).result()
+        items = client.get(f"/generate/designs/{ids['disc']}/similar", headers=headers).json()["items"]
+        assert [item["id"] for item in items][:1] == [ids["small-disc"]] and len(items) == 3
+        assert [item["similarity"] for item in items] == sorted((item["similarity"] for item in items), reverse=True)
+
+        uploaded = client.post("/generate/similar", headers=headers, data={"k": "3"},
+                               files={"image": ("disc.png", png(gold_disc(radius=80)), "image/png")})
+        assert uploaded.status_code == 200
+        assert uploaded.json()["items"][0]["id"] in (ids["disc"], ids["small-disc"])
+        assert len(uploaded.json()["items"]) == 3
+        assert os.listdir(storage / "uploads") == []  # The query image is not kept
+
+        assert client.post("/generate/similar", headers=headers, data={"k": "0"},
+                           files={"image": ("disc.png", png(gold_disc()), "image/png")}).status_code == 400
+        assert client.get("/generate/designs/999999/similar", headers=headers).status_code == 404
+
+        # Another company's design is not found, whatever the index holds
+        other = signup(client, "gopal")
+        assert client.get(f"/generate/designs/{ids['disc']}/similar", headers=other).status_code == 404
+        assert client.post("/generate/similar", headers=other,
+                           files={"image": ("disc.png", png(gold_disc()), "image/png")}).json()["items"] == []
+
+def test_similar_needs_a_company(storage, make_client, make_design):
+    with session_scope() as db:
+        db.add(User(username="no-company", password_hash=get_hashed_password("s3cret-pass")))
+    headers = {"Authorization": f"Bearer {create_access_token('no-company')}"}
+    ids = save_designs(make_design, user_id("no-company"), {"lonely": gold_disc()})
+
+    with make_client(generation.router) as client:
+        response = client.get(f"/generate/designs/{ids['lonely']}/similar", headers=headers)
+        assert response.status_code == 404 and response.json()["detail"] == "No company profile"
+
+        response = client.post("/generate/similar", headers=headers,
+                               files={"image": ("disc.png", png(gold_disc()), "image/png")})
+        assert response.status_code == 404 and response.json()["detail"] == "No company profile"
@@ -0,0 +1,15 @@
+from app import dependencies
+from app.controllers import system
+
+def test_diagnostics_are_for_admins_only(make_client, signup, monkeypatch):
+    monkeypatch.setattr(dependencies, "ADMIN_USERNAMES", {"ops-admin"})
+
+    with make_client(system.router) as client:
+        assert client.get("/system/diagnostics").status_code == 401
+        response = client.get("/system/diagnostics", headers=signup(client, "nandini"))
+        assert response.status_code == 403 and "workers" not in response.text
+
+        response = client.get("/system/diagnostics", headers=signup(client, "ops-admin"))
+        assert response.status_code == 200
+        body = response.json()
+        assert {"models", "workers", "llm", "db_pool", "prompt_cache", "embedding_cache"} <= body.keys()
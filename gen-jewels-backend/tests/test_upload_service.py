@@ -0,0 +1,107 @@
+import io
+import os
+import json
+import asyncio
+
+import pytest
+from PIL import Image
+
+from config.database import session_scope
+from app.models import GenerationJob
+from app.controllers import generation
+from app.services import upload_service
+from app.services.job_service import job_queue
+from app.services.upload_service import sniff_media_type, save_upload, UploadTooLarge, UnsupportedImage
+
+def encoded(format: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), (212, 175, 55)).save(buffer, format)
+    return buffer.getvalue()
+
+class StreamingUpload:
+    """
+    UploadFile stand-in that serves `total` bytes (after `head`) in read() calls and counts them.
+    """
+    def __init__(self, head: bytes, total: int, content_type: str = "image/jpeg"):
+        self.head = head
+        self.remaining = total
+        self.content_type = content_type
+        self.reads = 0
+
+    async def read(self, size: int) -> bytes:
+        self.reads += 1
+        chunk, self.head = self.head[:size], self.head[size:]
+        chunk += b"\0" * min(size - len(chunk), self.remaining - len(chunk))
+        self.remaining -= len(chunk)
+        return chunk
+
+@pytest.mark.parametrize("format, media_type", [
+    ("JPEG", "image/jpeg"), ("PNG", "image/png"), ("WEBP", "image/webp"),
+    ("GIF", "image/gif"), ("BMP", "image/bmp"), ("TIFF", "image/tiff"),
+])
+def test_sniffs_real_formats(format, media_type):
+    assert sniff_media_type(encoded(format)[:64]) == media_type
+
+def test_sniffs_iso_media_brands_and_rejects_the_rest():
+    assert sniff_media_type(b"\0\0\0\x1cftypavif" + b"\0" * 16) == "image/avif"
+    assert sniff_media_type(b"\0\0\0\x18ftypheic" + b"\0" * 16) == "image/heic"
+    assert sniff_media_type(b"\0\0\0\x18ftypmp42" + b"\0" * 16) is None  # An MP4 video
+    assert sniff_media_type(b"<svg xmlns='http://www.w3.org/2000/svg'/>") is None
+    assert sniff_media_type(b"%PDF-1.7") is None
+    assert sniff_media_type(b"") is None
+
+def test_size_cap_is_enforced_while_streaming(tmp_path, monkeypatch, run_async):
+    monkeypatch.setattr(upload_service, "MAX_UPLOAD_MB", 1)
+    monkeypatch.setattr(upload_service, "UPLOAD_CHUNK_BYTES", 64 * 1024)
+    upload = StreamingUpload(encoded("PNG"), total=500 * 1024 * 1024)
+
+    with pytest.raises(UploadTooLarge):
+        run_async(save_upload(upload, str(tmp_path), "big"))
+    # Stopped one chunk past the cap, not after reading the 500 MB
+    assert upload.reads == 1024 // 64 + 1
+    assert os.listdir(tmp_path) == []  # The partial file is removed
+
+def test_saved_under_the_sniffed_type(tmp_path, run_async):
+    png = encoded("PNG")
+    path, media_type = run_async(save_upload(StreamingUpload(png, total=len(png)), str(tmp_path), "photo"))
+    assert media_type == "image/png" and path.endswith("photo.png")
+    with open(path, "rb") as f:
+        assert f.read() == png
+
+    with pytest.raises(UnsupportedImage):
+        run_async(save_upload(StreamingUpload(b"GIF? no, text", total=13), str(tmp_path), "fake"))
+    assert os.listdir(tmp_path) == ["photo.png"]
+
+def test_upload_endpoints(make_client, signup, tmp_path, monkeypatch):
+    uploads = tmp_path / "uploads"
+    monkeypatch.setattr(generation, "UPLOAD_DIR", str(uploads))
+    monkeypatch.setattr(upload_service, "MAX_UPLOAD_MB", 1)
+    monkeypatch.setattr(job_queue, "queue", asyncio.Queue())  # Accepted jobs are queued, never run
+
+    with make_client(generation.router) as client:
+        headers = signup(client, "farah")
+
+        # A PNG labelled as JPEG is stored and queued as what it really is
+        response = client.post("/generate/image-to-image", headers=headers, data={"jewelry_type": "Ring"},
+                               files={"init_image": ("photo.jpg", encoded("PNG"), "image/jpeg")})
+        assert response.status_code == 202
+        with session_scope() as db:
+            payload = json.loads(db.get(GenerationJob, response.json()["job_id"]).payload)
+        assert payload["media_type"] == "image/png" and payload["source_path"].endswith(".png")
+        os.remove(payload["source_path"])
+
+        # Not an image, whatever the label says
+        response = client.post("/generate/image-to-image", headers=headers, data={"jewelry_type": "Ring"},
+                               files={"init_image": ("ring.png", b"<html>not a ring</html>", "image/png")})
+        assert response.status_code == 415
+
+        # Over the cap
+        too_big = encoded("PNG") + b"\0" * (2 * 1024 * 1024)
+        response = client.post("/generate/image-to-image", headers=headers, data={"jewelry_type": "Ring"},
+                               files={"init_image": ("ring.png", too_big, "image/png")})
+        assert response.status_code == 413
+        response = client.post("/generate/similar", headers=headers,
+                               files={"image": ("ring.png", too_big, "image/png")})
+        assert response.status_code == 413
+
+        assert os.listdir(uploads) == []  # Rejected uploads leave nothing behind
@@ -0,0 +1,80 @@
+import pytest
+
+from app.services.prompt_service import compose_wizard_prompt, MAX_PROMPT_WORDS
+
+def words(prompt: str) -> int:
+    return len(prompt.replace(",", " ").split())
+
+@pytest.mark.parametrize("field, value, fragment", [
+    ("material", "Rose Gold", "18k rose gold"),
+    ("material", "Silver", "sterling silver"),
+    ("style", "Traditional", "traditional temple-style"),
+    ("stone", "Ruby", "bezel-set rubies"),
+    ("stone", "No Stone", "pure metalwork without gemstones"),
+    ("theme", "Peacock", "stylized peacock feather motif relief"),
+    ("finish", "Antique Finish", "oxidized antique 18k yellow gold patina"),
+    ("finish", "Matte", "brushed satin 18k yellow gold texture"),
+    ("size", "Lightweight", "delicate lightweight profile"),
+])
+def test_wizard_options_map_to_fragments(field, value, fragment):
+    data = {"jewelry_type": "Ring", "material": "Gold", field: value}
+    assert fragment in compose_wizard_prompt(data)
+
+@pytest.mark.parametrize("jewelry_type, anatomy, display", [
+    ("Ring", "comfort-fit band, tapered shank", "on a ring mandrel"),
+    ("Necklace", "articulated links, box clasp", "on a textured black velvet bust"),
+    ("Earrings", "earring post, milgrain edges", "on a neutral jewelry display stand"),
+    ("Bangles", "seamless solid band, hidden hinge clasp", "on a neutral jewelry display stand"),
+])
+def test_jewelry_type_picks_anatomy_and_display(jewelry_type, anatomy, display):
+    prompt = compose_wizard_prompt({"jewelry_type": jewelry_type, "material": "Platinum"})
+    assert prompt.startswith(f"Professional jewelry product photography of a platinum {jewelry_type.lower()}")
+    assert anatomy in prompt and display in prompt
+
+def test_full_spec_reads_as_one_prompt():
+    prompt = compose_wizard_prompt({
+        "jewelry_type": "Ring", "style": "  antique ", "material": "white gold", "stone": "DIAMOND",
+        "theme": "floral", "size": "Medium", "finish": "High Polish", "extra_text": "  with  milgrain edges ",
+    })
+    assert prompt.startswith("Professional jewelry product photography of an antique heirloom 18k white gold ring, "
+                             "mirror-polished 18k white gold surface")
+    for fragment in ("sculpted floral motif", "prong-set high-dispersion diamonds", "with milgrain edges",
+                     "centered composition", "8k, photorealistic"):
+        assert fragment in prompt
+    assert words(prompt) <= MAX_PROMPT_WORDS
+
+def test_unknown_options_are_kept_as_plain_words():
+    prompt = compose_wizard_prompt({
+        "jewelry_type": "Anklet", "style": "Boho", "material": "Titanium", "stone": "Opal", "theme": "Lotus",
+        "size": "Enormous", "finish": "Sandblasted",
+    })
+    assert prompt.startswith("Professional jewelry product photography of a boho titanium anklet")
+    assert "faceted opal, brilliant light refraction" in prompt
+    assert "stylized lotus motif relief engraved on the metal" in prompt  # Still metalwork, never a statue
+    assert "high-polish titanium surface" in prompt  # Default finish
+    assert "solid metal construction, seamless joints" in prompt and "on a neutral jewelry display stand" in prompt
+    assert "enormous" not in prompt.lower() and "sandblasted" not in prompt.lower()
+
+@pytest.mark.parametrize("data", [
+    {},
+    {"jewelry_type": None, "material": None, "style": None, "stone": None, "theme": None, "extra_text": None},
+    {"jewelry_type": "   ", "material": "", "theme": ""},
+])
+def test_missing_options_fall_back_to_generic_words(data):
+    prompt = compose_wizard_prompt(data)
+    assert prompt.startswith("Professional jewelry product photography of a")
+    assert "precious metal" in prompt and "None" not in prompt and ", ," not in prompt
+    assert "full piece perfectly framed" in prompt and words(prompt) <= MAX_PROMPT_WORDS
+
+def test_long_notes_are_trimmed_before_the_framing():
+    prompt = compose_wizard_prompt({
+        "jewelry_type": "Necklace", "style": "Traditional", "material": "Gold", "stone": "Emerald",
+        "theme": "Peacock", "size": "Bridal Heavy", "finish": "Antique Finish",
+        "extra_text": " ".join(f"word{i}" for i in range(40)),
+    })
+    assert words(prompt) <= MAX_PROMPT_WORDS
+    assert "word19" in prompt and "word20" not in prompt  # Notes are capped at 20 words
+    # Low-priority detail goes first; the subject and framing always stay
+    assert "opulent bridal statement scale" not in prompt
+    assert prompt.startswith("Professional jewelry product photography of a traditional temple-style 18k yellow gold necklace")
+    assert "full piece perfectly framed" in prompt
@@ -27,6 +27,7 @@ export const AuthProvider = ({ children }) => {
     localStorage.removeItem('dashboard_params');
     localStorage.removeItem('text2img_params');
     localStorage.removeItem('is_generating');
+    localStorage.removeItem('generating_job');
     
     setUser(null);
     // NEW: Redirect to the unified Auth page
@@ -1,4 +1,4 @@
-import { createContext, useState, useEffect, useContext, useRef } from 'react';
+import { createContext, useState, useEffect, useContext, useRef, useCallback } from 'react';
 import { AuthContext } from './AuthContext';
 import api from '../services/api'; 
 import axios from 'axios'; 
@@ -20,20 +20,43 @@ export const DesignProvider = ({ children }) => {
 
   const [latestDesign, setLatestDesign] = useState(null);
   const [history, setHistory] = useState([]);
+  const [historyCursor, setHistoryCursor] = useState(null); // next_cursor of the last page loaded
   
-  const pollingInterval = useRef(null);
+  const pendingJob = useRef(null);      // { jobId, toastId } this tab is waiting for
+  const jobEventHandler = useRef(null);
 
   // --- 1. FETCH HISTORY ---
-  const fetchHistory = async () => {
+  // First page only; the browser revalidates with the ETag, so an unchanged gallery is a cheap 304.
+  // Memoized so effects that depend on it don't refetch on every render.
+  const fetchHistory = useCallback(async () => {
     if (!user) return;
     try {
       const response = await api.get('/generate/history', {
         headers: { 'ngrok-skip-browser-warning': 'true', 'bypass-tunnel-reminder': 'true' }
       });
-      setHistory(response.data);
+      setHistory(response.data.items);
+      setHistoryCursor(response.data.next_cursor);
     } catch (error) {
       console.error("Could not fetch history", error);
     }
+  }, [user]);
+
+  // Older designs: appends the next page
+  const loadMoreHistory = async () => {
+    if (!user || !historyCursor) return;
+    try {
+      const response = await api.get('/generate/history', {
+        params: { cursor: historyCursor },
+        headers: { 'ngrok-skip-browser-warning': 'true', 'bypass-tunnel-reminder': 'true' }
+      });
+      setHistory((prev) => {
+        const seen = new Set(prev.map(i => i.id));
+        return [...prev, ...response.data.items.filter(i => !seen.has(i.id))];
+      });
+      setHistoryCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error("Could not load more history", error);
+    }
   };
 
   // --- 2. PAGE REGISTRATION (Crucial for ImageToImage) ---
@@ -94,7 +117,9 @@ export const DesignProvider = ({ children }) => {
         headers: headers
       });
 
-      completeGeneration(response.data, toastId);
+      // Backend queues the job and answers right away
+      localStorage.setItem('generating_job', response.data.job_id);
+      waitForJob(response.data.job_id, toastId);
 
     } catch (error) {
       console.error("Generation Error:", error);
@@ -109,62 +134,129 @@ export const DesignProvider = ({ children }) => {
       setCurrentPage(null);
       localStorage.removeItem('is_generating');
       localStorage.removeItem('generating_page');
+      localStorage.removeItem('generating_job');
       toast.dismiss(toastId);
     }
   };
 
+  // --- 4b. JOB EVENTS (pushed by the server, no polling) ---
+  const waitForJob = (jobId, toastId) => {
+    pendingJob.current = { jobId, toastId };
+  };
+
+  const handleJobEvent = (job) => {
+    const pending = pendingJob.current;
+    if (!pending || job.job_id !== pending.jobId) {
+      // A job from another tab: just keep the gallery current
+      if (job.status === 'done') fetchHistory();
+      return;
+    }
+
+    if (job.status === 'done') {
+      pendingJob.current = null;
+      completeGeneration({
+        id: job.design_id,
+        image_url: job.image_url,
+        image_path: job.image_url,
+        final_prompt: job.final_prompt,
+        prompt_preview: job.final_prompt,
+        created_at: job.finished_at
+      }, pending.toastId);
+      // Extra variations only show up in the gallery
+      if (job.variations && job.variations.length > 1) fetchHistory();
+    } else if (job.status === 'failed') {
+      pendingJob.current = null;
+      failGeneration(pending.toastId);
+    }
+  };
+  // The stream outlives renders: always dispatch to the latest handler
+  jobEventHandler.current = handleJobEvent;
+
+  // One status read, for a job that may have finished while the stream was down
+  const checkJob = async (jobId) => {
+    try {
+      const res = await api.get(`/generate/jobs/${jobId}`, {
+        headers: { 'ngrok-skip-browser-warning': 'true', 'bypass-tunnel-reminder': 'true' }
+      });
+      jobEventHandler.current(res.data);
+    } catch (err) {
+      const status = err.response?.status;
+      if ((status === 401 || status === 404) && pendingJob.current?.jobId === jobId) {
+        const { toastId } = pendingJob.current;
+        pendingJob.current = null;
+        failGeneration(toastId);
+      }
+    }
+  };
+
+  // Long-lived SSE connection to /generate/events (fetch, so the token stays in a header)
+  const openEventStream = async (controller) => {
+    const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+    while (!controller.signal.aborted) {
+      try {
+        const response = await fetch(`${API_BASE_URL}/generate/events`, {
+          headers: {
+            'Authorization': `Bearer ${localStorage.getItem('token')}`,
+            'ngrok-skip-browser-warning': 'true',
+            'bypass-tunnel-reminder': 'true'
+          },
+          signal: controller.signal
+        });
+        if (response.status === 401) return;
+        if (!response.ok) throw new Error(`Event stream failed (${response.status})`);
+
+        if (pendingJob.current) checkJob(pendingJob.current.jobId);
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        while (true) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += value;
+          const frames = buffer.split('\n\n');
+          buffer = frames.pop();
+          frames.forEach((frame) => {
+            const data = frame.split('\n').filter(l => l.startsWith('data: ')).map(l => l.slice(6)).join('\n');
+            if (data) jobEventHandler.current(JSON.parse(data));
+          });
+        }
+      } catch (err) {
+        if (controller.signal.aborted) return;
+        console.error("Event stream dropped", err);
+      }
+      // Reconnect after a short pause (server restart, tunnel hiccup)
+      await new Promise((resolve) => setTimeout(resolve, 5000));
+    }
+  };
+
+  const failGeneration = (toastId) => {
+    setIsGenerating(false);
+    setCurrentPage(null);
+    localStorage.removeItem('is_generating');
+    localStorage.removeItem('generating_page');
+    localStorage.removeItem('generating_job');
+    if (toastId) toast.dismiss(toastId);
+    toast.error('Generation Failed.');
+  };
+
   // --- 5. RECOVERY LOGIC ---
   const checkForPendingGeneration = async () => {
     if (!user) return;
     
     const isPending = localStorage.getItem('is_generating') === 'true';
+    const jobId = localStorage.getItem('generating_job');
     
-    if (isPending) {
-      console.log(`🔄 Resuming session...`);
+    if (isPending && jobId) {
+      console.log(`🔄 Resuming job ${jobId}...`);
       setIsGenerating(true);
       
       const toastId = toast.loading('Resuming checks for your design...');
-      
-      if (pollingInterval.current) clearInterval(pollingInterval.current);
-
-      pollingInterval.current = setInterval(async () => {
-        try {
-          if (!user) {
-             clearInterval(pollingInterval.current);
-             return;
-          }
-          const res = await api.get('/generate/history', {
-            headers: { 'ngrok-skip-browser-warning': 'true', 'bypass-tunnel-reminder': 'true' }
-          });
-          const latest = res.data[0];
-          
-          if (latest) {
-             const createdTime = new Date(latest.created_at).getTime();
-             const now = Date.now();
-             const diff = Math.abs(now - createdTime) / 1000;
-
-             if (diff < 3600) { 
-               clearInterval(pollingInterval.current);
-               completeGeneration(latest, toastId);
-             }
-          }
-        } catch (err) {
-          if (err.response && err.response.status === 401) {
-            clearInterval(pollingInterval.current);
-            setIsGenerating(false);
-            localStorage.removeItem('is_generating');
-          }
-        }
-      }, 3000); 
-
-      setTimeout(() => {
-        if (pollingInterval.current) clearInterval(pollingInterval.current);
-        if (localStorage.getItem('is_generating') === 'true') {
-           setIsGenerating(false);
-           localStorage.removeItem('is_generating');
-           toast.dismiss(toastId);
-        }
-      }, 90000); 
+      waitForJob(jobId, toastId);
+      checkJob(jobId);
+    } else if (isPending) {
+      setIsGenerating(false);
+      localStorage.removeItem('is_generating');
+      localStorage.removeItem('generating_page');
     }
   };
 
@@ -175,13 +267,21 @@ export const DesignProvider = ({ children }) => {
       checkForPendingGeneration();
     } else if (!hasToken) {
       setHistory([]);
+      setHistoryCursor(null);
       setLatestDesign(null);
       setIsGenerating(false);
       setCurrentPage(null);
-      if (pollingInterval.current) clearInterval(pollingInterval.current);
+      pendingJob.current = null;
     }
   }, [user]);
 
+  useEffect(() => {
+    if (!user) return;
+    const controller = new AbortController();
+    openEventStream(controller);
+    return () => controller.abort();
+  }, [user]);
+
   const completeGeneration = (design, toastId) => {
     setLatestDesign(design);
     setHistory((prev) => {
@@ -191,6 +291,7 @@ export const DesignProvider = ({ children }) => {
     setIsGenerating(false);
     localStorage.removeItem('is_generating');
     localStorage.removeItem('generating_page');
+    localStorage.removeItem('generating_job');
     if (toastId) toast.dismiss(toastId);
     toast.success('Design Ready!');
   };
@@ -205,7 +306,9 @@ export const DesignProvider = ({ children }) => {
       registerPage, // EXPORTED NOW
       unregisterPage, // EXPORTED NOW
       history, 
-      fetchHistory 
+      historyCursor,
+      fetchHistory,
+      loadMoreHistory
     }}>
       {children}
     </DesignContext.Provider>
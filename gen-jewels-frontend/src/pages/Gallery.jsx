@@ -1,11 +1,16 @@
 import { useEffect, useState } from 'react';
 import { useDesign } from '../context/DesignContext';
 import { useServer } from '../context/ServerContext'; // Imported to monitor backend status
+import api from '../services/api';
 
 export default function Gallery() {
-  const { history, fetchHistory } = useDesign();
+  const { history, historyCursor, fetchHistory, loadMoreHistory } = useDesign();
   const { isServerLive, isChecking } = useServer(); // Accesses the global heartbeat state
   const [selectedDesign, setSelectedDesign] = useState(null); // Controls the Details Modal
+  const [searchQuery, setSearchQuery] = useState('');
+  const [searchResults, setSearchResults] = useState(null); // null = browsing history
+  const [searchCursor, setSearchCursor] = useState(null);
+  const [similarDesigns, setSimilarDesigns] = useState(null); // "More like this" for the open design
 
   // --- 1. DYNAMIC BASE URL ---
   // Reads the tunnel URL from Netlify environment variables
@@ -18,6 +23,56 @@ export default function Gallery() {
     }
   }, [isServerLive, fetchHistory]);
 
+  // --- SEARCH (full-text over prompts and notes, best match first) ---
+  const runSearch = async (cursor = null) => {
+    const q = searchQuery.trim();
+    if (!q) {
+      setSearchResults(null);
+      setSearchCursor(null);
+      return;
+    }
+    try {
+      const response = await api.get('/generate/search', {
+        params: cursor ? { q, cursor } : { q },
+        headers: { 'ngrok-skip-browser-warning': 'true', 'bypass-tunnel-reminder': 'true' }
+      });
+      setSearchResults((prev) => (cursor ? [...(prev || []), ...response.data.items] : response.data.items));
+      setSearchCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error("Search failed", error);
+    }
+  };
+
+  // Visually closest existing designs: reuse one instead of rendering a near-duplicate
+  const loadSimilar = async (designId) => {
+    try {
+      const response = await api.get(`/generate/designs/${designId}/similar`, {
+        headers: { 'ngrok-skip-browser-warning': 'true', 'bypass-tunnel-reminder': 'true' }
+      });
+      setSimilarDesigns(response.data.items);
+    } catch (error) {
+      console.error("Could not fetch similar designs", error);
+    }
+  };
+
+  const designs = searchResults ?? history;
+  const nextCursor = searchResults ? searchCursor : historyCursor;
+  const loadMore = () => (searchResults ? runSearch(searchCursor) : loadMoreHistory());
+
+  // The grid only carries a prompt preview: load the full record when a card is opened
+  const openDesign = async (design) => {
+    setSelectedDesign(design);
+    setSimilarDesigns(null);
+    try {
+      const response = await api.get(`/generate/designs/${design.id}`, {
+        headers: { 'ngrok-skip-browser-warning': 'true', 'bypass-tunnel-reminder': 'true' }
+      });
+      setSelectedDesign((current) => (current && current.id === design.id ? response.data : current));
+    } catch (error) {
+      console.error("Could not fetch design details", error);
+    }
+  };
+
   // Helper: Format Date for the UI
   const formatDate = (dateString) => {
     if (!dateString) return '';
@@ -80,24 +135,49 @@ export default function Gallery() {
             <p className="text-gray-500 mt-1">Your personal catalog of AI-generated jewelry.</p>
           </div>
           <span className="bg-purple-100 text-purple-700 font-bold px-3 py-1 rounded-full text-sm">
-            {history.length} Items
+            {designs.length}{nextCursor ? '+' : ''} Items
           </span>
         </div>
+
+        {/* SEARCH BAR */}
+        <form
+          onSubmit={(e) => { e.preventDefault(); runSearch(); }}
+          className="flex gap-3 mb-8"
+        >
+          <input
+            type="search"
+            value={searchQuery}
+            onChange={(e) => {
+              setSearchQuery(e.target.value);
+              if (!e.target.value) setSearchResults(null); // Cleared: back to the full collection
+            }}
+            placeholder="Search your designs (e.g. peacock ruby, wedding)..."
+            className="flex-1 border border-gray-200 rounded-xl px-4 py-3 focus:outline-none focus:ring-2 focus:ring-purple-300"
+          />
+          <button
+            type="submit"
+            className="bg-gray-900 text-white font-bold py-3 px-6 rounded-xl hover:bg-gray-800 transition-colors"
+          >
+            Search
+          </button>
+        </form>
         
         {/* EMPTY STATE */}
-        {history.length === 0 ? (
+        {designs.length === 0 ? (
           <div className="text-center py-20 bg-white rounded-xl shadow-sm border border-gray-100">
             <p className="text-6xl mb-4">💎</p>
-            <p className="text-xl text-gray-500 font-medium">No designs found.</p>
+            <p className="text-xl text-gray-500 font-medium">
+              {searchResults ? 'No designs match your search.' : 'No designs found.'}
+            </p>
           </div>
         ) : (
           
           /* GRID LAYOUT */
           <div className="grid grid-cols-1 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4 gap-6">
-            {history.map((design, index) => (
+            {designs.map((design, index) => (
               <div 
-                key={index} 
-                onClick={() => setSelectedDesign(design)}
+                key={design.id ?? index} 
+                onClick={() => openDesign(design)}
                 className="group bg-white rounded-xl shadow-sm hover:shadow-xl transition-all duration-300 border border-gray-100 overflow-hidden cursor-pointer transform hover:-translate-y-1"
               >
                 {/* Thumbnail Image with Windows Path and Local Placeholder Fix */}
@@ -126,7 +206,7 @@ export default function Gallery() {
                     <span className="text-xs text-gray-400">{formatDate(design.created_at)}</span>
                   </div>
                   <p className="text-sm text-gray-500 line-clamp-2">
-                    {design.final_prompt || "No description available."}
+                    {design.prompt_preview || design.final_prompt || "No description available."}
                   </p>
                 </div>
               </div>
@@ -134,6 +214,18 @@ export default function Gallery() {
           </div>
         )}
 
+        {/* LOAD MORE (keyset pages of older designs) */}
+        {nextCursor && (
+          <div className="text-center mt-8">
+            <button
+              onClick={loadMore}
+              className="bg-gray-900 text-white font-bold py-3 px-8 rounded-xl hover:bg-gray-800 transition-colors shadow-lg"
+            >
+              Load More
+            </button>
+          </div>
+        )}
+
         {/* --- DETAILS MODAL (POPUP) --- */}
         {selectedDesign && (
           <div className="fixed inset-0 z-[110] flex items-center justify-center p-4 bg-black/80 backdrop-blur-sm transition-opacity" onClick={() => setSelectedDesign(null)}>
@@ -190,7 +282,7 @@ export default function Gallery() {
                 <div className="mb-8">
                   <h4 className="text-xs font-bold text-pink-500 uppercase mb-2">✨ AI Generated Description</h4>
                   <div className="bg-pink-50 p-4 rounded-lg border border-pink-100 text-gray-700 text-sm leading-relaxed max-h-48 overflow-y-auto">
-                    "{selectedDesign.final_prompt}"
+                    "{selectedDesign.final_prompt || selectedDesign.prompt_preview}"
                   </div>
                 </div>
 
@@ -207,11 +299,11 @@ export default function Gallery() {
                   </div>
                   <div>
                     <p className="text-gray-400 text-xs mb-1">Theme / Pattern</p>
-                    <p className="font-semibold text-gray-800">{selectedDesign.theme || 'Standard'}</p>
+                    <p className="font-semibold text-gray-800">{selectedDesign.gem_theme || 'Standard'}</p>
                   </div>
                   <div>
                     <p className="text-gray-400 text-xs mb-1">Size / Weight</p>
-                    <p className="font-semibold text-gray-800">{selectedDesign.size || 'Standard'}</p>
+                    <p className="font-semibold text-gray-800">{selectedDesign.size_category || 'Standard'}</p>
                   </div>
                   <div>
                     <p className="text-gray-400 text-xs mb-1">Finish</p>
@@ -226,6 +318,42 @@ export default function Gallery() {
                     </div>
                   )}
                 </div>
+
+                {/* MORE LIKE THIS */}
+                <div className="mt-8">
+                  <div className="flex justify-between items-center mb-3 border-b pb-2">
+                    <h4 className="text-xs font-bold text-gray-500 uppercase">More Like This</h4>
+                    {similarDesigns === null && (
+                      <button
+                        onClick={() => loadSimilar(selectedDesign.id)}
+                        className="text-xs font-bold text-purple-600 hover:text-purple-800"
+                      >
+                        Find similar
+                      </button>
+                    )}
+                  </div>
+                  {similarDesigns && similarDesigns.length === 0 && (
+                    <p className="text-sm text-gray-400">No similar designs yet.</p>
+                  )}
+                  {similarDesigns && similarDesigns.length > 0 && (
+                    <div className="grid grid-cols-4 gap-2">
+                      {similarDesigns.map((similar) => (
+                        <img
+                          key={similar.id}
+                          src={getImageUrl(similar.image_path) || PLACEHOLDER_IMAGE}
+                          alt={similar.jewelry_type}
+                          title={`${Math.round(similar.similarity * 100)}% similar`}
+                          onClick={() => openDesign(similar)}
+                          className="w-full h-20 object-cover rounded-lg cursor-pointer hover:ring-2 hover:ring-purple-400"
+                          onError={(e) => {
+                            e.target.onerror = null;
+                            e.target.src = PLACEHOLDER_IMAGE;
+                          }}
+                        />
+                      ))}
+                    </div>
+                  )}
+                </div>
               </div>
             </div>
           </div>